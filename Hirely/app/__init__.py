@@ -1,122 +1,121 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import text
-from sentence_transformers import SentenceTransformer
-import joblib
-import chromadb
 import os
 import sys
 import logging
 
+from app.utils.model_registry import ModelRegistry
+
 # Add the parent directory to the path so we can import from instance
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 db = SQLAlchemy()
-model = None
-kmeans_model = None
-chroma_client = None
-jobs_collection = None
 logger = logging.getLogger(__name__)
 
-def create_app():
-    app = Flask(__name__)
-    
-    # Load configuration from the Config class
-    from instance.config import Config
-    app.config.from_object(Config)
+# ML artifacts are loaded lazily, on first use, through this registry. Use the
+# get_* accessors below at request time instead of importing module globals.
+registry = ModelRegistry()
 
-    # ✅ Add upload folder config
-    app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), '..', 'uploads')
-    if not os.path.exists(app.config['UPLOAD_FOLDER']):
-        os.makedirs(app.config['UPLOAD_FOLDER'])
-    
-    # Initialize extensions
-    db.init_app(app)
-    
-    # Load ML models (with error handling)
-    global model, kmeans_model, chroma_client, jobs_collection
-    init_ok = False
-    try:
-        model = SentenceTransformer('all-MiniLM-L6-v2')
+PROJECT_ROOT = os.path.join(os.path.dirname(__file__), '..')
 
-        # Update paths to be relative to the project root
-        project_root = os.path.join(os.path.dirname(__file__), '..')
-        kmeans_model = joblib.load(os.path.join(project_root, 'data', 'kmeans_model.pkl'))
 
-        # Initialize ChromaDB (Persistent SQLite storage)
-        # Import chromadb here so we can optionally disable its telemetry
-        import chromadb
-        chroma_path = os.path.join(project_root, 'chroma_storage')
+def get_model():
+    """SentenceTransformer used for job and resume embeddings (or None)."""
+    return registry.get('sentence_model')
 
-        # By default disable Chroma telemetry to avoid telemetry.capture signature
-        # mismatches across chromadb releases. Set CHROMA_DISABLE_TELEMETRY=0 to
-        # opt back in if you need telemetry.
-        try:
-            if os.environ.get('CHROMA_DISABLE_TELEMETRY', '1') == '1':
-                patched = False
-                # Try several known locations for telemetry/capture
-                # Try to locate Posthog or other telemetry implementations and
-                # replace their capture implementations with permissive no-ops.
-                try:
-                    import importlib
-                    # Verbose flag (set CHROMA_VERBOSE=1 to enable telemetry debug prints)
-                    _chroma_verbose = os.environ.get('CHROMA_VERBOSE', '0') == '1'
-                    candidates = [
-                        'chromadb.telemetry',
-                        'chromadb.telemetry.product',
-                        'chromadb.telemetry.product.posthog',
-                        'chromadb.telemetry.product.posthog_posthog',
-                    ]
-                    for mod_name in candidates:
+
+def get_kmeans_model():
+    """
+    Job cluster model (or None): app.utils.centroids.Centroids, with predict().
+    Reloaded when another process replaced the clustering.
+    """
+    from app.utils.clustering import sync_clustering_version
+    sync_clustering_version()
+    return registry.get('kmeans_model')
+
+
+def get_chroma_client():
+    return registry.get('chroma_client')
+
+
+def get_jobs_collection():
+    return registry.get('jobs_collection')
+
+
+def get_applications_collection():
+    return registry.get('applications_collection')
+
+
+def _disable_chroma_telemetry():
+    # By default disable Chroma telemetry to avoid telemetry.capture signature
+    # mismatches across chromadb releases. Set CHROMA_DISABLE_TELEMETRY=0 to
+    # opt back in if you need telemetry.
+    try:
+        if os.environ.get('CHROMA_DISABLE_TELEMETRY', '1') == '1':
+            patched = False
+            # Try several known locations for telemetry/capture
+            # Try to locate Posthog or other telemetry implementations and
+            # replace their capture implementations with permissive no-ops.
+            try:
+                import importlib
+                # Verbose flag (set CHROMA_VERBOSE=1 to enable telemetry debug prints)
+                _chroma_verbose = os.environ.get('CHROMA_VERBOSE', '0') == '1'
+                candidates = [
+                    'chromadb.telemetry',
+                    'chromadb.telemetry.product',
+                    'chromadb.telemetry.product.posthog',
+                    'chromadb.telemetry.product.posthog_posthog',
+                ]
+                for mod_name in candidates:
+                    try:
+                        mod = importlib.import_module(mod_name)
+                    except Exception:
+                        continue
+
+                    # Patch module-level capture
+                    if hasattr(mod, 'capture'):
                         try:
-                            mod = importlib.import_module(mod_name)
+                            setattr(mod, 'capture', lambda *a, **kw: None)
+                            patched = True
+                            logger.debug('Patched capture in module: %s', mod_name)
+                        except Exception:
+                            pass
+
+                    # Patch client classes that implement capture
+                    for attr_name in dir(mod):
+                        try:
+                            attr = getattr(mod, attr_name)
                         except Exception:
                             continue
+                        # Heuristic: classes containing 'Telemetry' or 'Posthog'
+                        if isinstance(attr, type) and (('Telemetry' in attr.__name__) or ('Posthog' in attr.__name__) or ('Posthog' in attr_name)):
+                            if hasattr(attr, 'capture'):
+                                try:
+                                    setattr(attr, 'capture', lambda self, *a, **kw: None)
+                                    patched = True
+                                    logger.debug('Patched capture on class: %s.%s', mod_name, attr.__name__)
+                                except Exception:
+                                    pass
+            except Exception as _e:
+                logger.debug('Error while attempting aggressive telemetry patch: %s', _e)
 
-                        # Patch module-level capture
-                        if hasattr(mod, 'capture'):
-                            try:
-                                setattr(mod, 'capture', lambda *a, **kw: None)
-                                patched = True
-                                logger.debug('Patched capture in module: %s', mod_name)
-                            except Exception:
-                                pass
-
-                        # Patch client classes that implement capture
-                        for attr_name in dir(mod):
-                            try:
-                                attr = getattr(mod, attr_name)
-                            except Exception:
-                                continue
-                            # Heuristic: classes containing 'Telemetry' or 'Posthog'
-                            if isinstance(attr, type) and (('Telemetry' in attr.__name__) or ('Posthog' in attr.__name__) or ('Posthog' in attr_name)):
-                                if hasattr(attr, 'capture'):
-                                    try:
-                                        setattr(attr, 'capture', lambda self, *a, **kw: None)
-                                        patched = True
-                                        logger.debug('Patched capture on class: %s.%s', mod_name, attr.__name__)
-                                    except Exception:
-                                        pass
-                except Exception as _e:
-                    logger.debug('Error while attempting aggressive telemetry patch: %s', _e)
-
-                if patched:
-                    logger.debug('ChromaDB telemetry disabled (CHROMA_DISABLE_TELEMETRY=1)')
-                else:
-                    logger.debug('Could not locate chromadb telemetry to patch; telemetry errors may still appear')
-        except Exception as _tele_err:
-            # Non-fatal: continue and try to create the client anyway
-            logger.debug('Warning: could not patch chromadb telemetry: %s', _tele_err)
+            if patched:
+                logger.debug('ChromaDB telemetry disabled (CHROMA_DISABLE_TELEMETRY=1)')
+            else:
+                logger.debug('Could not locate chromadb telemetry to patch; telemetry errors may still appear')
+    except Exception as _tele_err:
+        # Non-fatal: continue and try to create the client anyway
+        logger.debug('Warning: could not patch chromadb telemetry: %s', _tele_err)
 
-        chroma_client = chromadb.PersistentClient(path=chroma_path)
-        jobs_collection = chroma_client.get_or_create_collection(name="jobs")
 
-        # Persist chroma_path into app config so post-init checks can create an
-        # independent client (avoids relying on module globals which may be
-        # overwritten in some import flows).
-        app.config['CHROMA_PATH'] = chroma_path
-        init_ok = True
+def _load_chroma_client(chroma_path):
+    # Import chromadb here so we can optionally disable its telemetry
+    import chromadb
+    _disable_chroma_telemetry()
 
+    try:
+        return chromadb.PersistentClient(path=chroma_path)
     except Exception as e:
         # Detect a common compatibility error: older Chroma DB schema missing 'collections.topic'
         err_str = str(e)
@@ -143,8 +142,8 @@ def create_app():
                         print(f"Backed up existing Chroma DB to: {backup} and removed the original file.")
                         # Retry initialization once
                         chroma_client = chromadb.PersistentClient(path=chroma_path)
-                        jobs_collection = chroma_client.get_or_create_collection(name="jobs")
                         print("ChromaDB reset and reinitialized successfully after auto-reset.")
+                        return chroma_client
                     else:
                         print("Expected chroma.sqlite3 file not found for auto-reset; nothing to do.")
                 else:
@@ -160,12 +159,88 @@ def create_app():
                 logger.debug('Posthog telemetry error encountered and ignored (telemetry disabled).')
             else:
                 print(f"Error loading models: {e}")
+        raise
 
-        # Set to None but allow app to run for testing
-        model = None
-        kmeans_model = None
-        chroma_client = None
-        jobs_collection = None
+
+def _register_model_loaders(app):
+    """Register how each ML artifact is built; nothing is loaded here."""
+    sentence_model_name = app.config.get('SENTENCE_MODEL_NAME', 'all-MiniLM-L6-v2')
+    kmeans_path = app.config.get('KMEANS_MODEL_PATH') or os.path.join(PROJECT_ROOT, 'data', 'kmeans_model.pkl')
+    # Re-clustering (app.utils.clustering) writes new centroids here
+    from app.utils.centroids import centroids_path_for
+    centroids_path = app.config.get('KMEANS_CENTROIDS_PATH') or centroids_path_for(kmeans_path)
+    app.config['KMEANS_CENTROIDS_PATH'] = centroids_path
+    chroma_path = app.config['CHROMA_PATH']
+
+    def load_sentence_model():
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(sentence_model_name)
+
+    def load_kmeans_model():
+        # Memory-mapped float32 centroids exported from the pickle; predict()
+        # matches KMeans.predict without sklearn on the request path
+        from app.utils.centroids import load_or_export
+        return load_or_export(kmeans_path, centroids_path)
+
+    def load_collection(name):
+        def load():
+            client = get_chroma_client()
+            if client is None:
+                raise RuntimeError('ChromaDB client unavailable')
+            return client.get_or_create_collection(name=name)
+        return load
+
+    # Artifacts are wrapped so their hot calls show up as spans in /metrics
+    from app.utils.instrumentation import timed
+    chroma_methods = ('add', 'upsert', 'update', 'delete', 'get', 'query', 'count')
+    registry.register('sentence_model', timed(load_sentence_model, 'model', ('encode',)))
+    registry.register('kmeans_model', timed(load_kmeans_model, 'kmeans', ('predict',)))
+    registry.register('chroma_client', lambda: _load_chroma_client(chroma_path))
+    registry.register('jobs_collection', timed(load_collection('jobs'), 'chroma.jobs', chroma_methods))
+    registry.register('applications_collection',
+                      timed(load_collection('applications'), 'chroma.applications', chroma_methods))
+
+
+def create_app():
+    app = Flask(__name__)
+    
+    # File uploads are streamed to disk and hashed as they arrive
+    from app.utils.uploads import UploadRequest
+    app.request_class = UploadRequest
+    
+    # Load configuration from the Config class
+    from instance.config import Config
+    app.config.from_object(Config)
+
+    # ✅ Add upload folder config
+    app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), '..', 'uploads')
+    if not os.path.exists(app.config['UPLOAD_FOLDER']):
+        os.makedirs(app.config['UPLOAD_FOLDER'])
+
+    # Persist chroma_path into app config so post-init checks can create an
+    # independent client
+    app.config.setdefault('CHROMA_PATH', os.path.join(PROJECT_ROOT, 'chroma_storage'))
+    
+    # Database backend and pool from the environment; explicit
+    # SQLALCHEMY_ENGINE_OPTIONS entries win over the DB_POOL_* defaults
+    from app.utils.database import apply_sqlite_pragmas, engine_options, normalize_database_uri
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+    
+    # Initialize extensions
+    db.init_app(app)
+    with app.app_context():
+        apply_sqlite_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS'))
+    
+    # ML models load on first use; MODEL_WARMUP optionally preloads them
+    _register_model_loaders(app)
+    warmup = app.config.get('MODEL_WARMUP', '')
+    if warmup:
+        names = None if warmup == 'all' else [n.strip() for n in warmup.split(',') if n.strip()]
+        registry.warm_up(names, background=app.config.get('MODEL_WARMUP_BACKGROUND', False))
     
     # Register blueprints
     from app.routes.auth import auth_bp
@@ -173,16 +248,55 @@ def create_app():
     from app.routes.applications import applications_bp
     from app.routes.shortlist import shortlist_bp
     from app.routes.matchmaking import matchmaking_bp
+    from app.routes.system import system_bp
     
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
     app.register_blueprint(applications_bp, url_prefix='/api/applications')
     app.register_blueprint(shortlist_bp, url_prefix='/api/shortlist')
     app.register_blueprint(matchmaking_bp, url_prefix='/api/matchmaking')
+    app.register_blueprint(system_bp, url_prefix='/api/system')
+    
+    # Text pipeline for BM25 (stored term counts depend on it)
+    from app.utils import tokenizer
+    tokenizer.configure(stemming=app.config.get('TOKENIZER_STEMMING', False))
+    
+    # Ranking response cache (in-process LRU, optional SQLite tier)
+    from app.utils import result_cache
+    result_cache.configure(
+        max_entries=app.config.get('RESULT_CACHE_SIZE', result_cache.DEFAULT_MAX_ENTRIES),
+        ttl=app.config.get('RESULT_CACHE_TTL', result_cache.DEFAULT_TTL_SECONDS),
+        path=app.config.get('RESULT_CACHE_PATH')
+    )
+    
+    # Request/span timing, GET /metrics and the opt-in request profiler
+    from app.utils import instrumentation, profiler
+    from app.utils.bm25_index import metrics as bm25_metrics
+    instrumentation.init_app(app)
+    instrumentation.register_collector(result_cache.metrics)
+    instrumentation.register_collector(bm25_metrics)
+    profiler.init_app(app)
     
     # Create database tables
     with app.app_context():
         db.create_all()
+        from app.utils.schema import upgrade_schema
+        upgrade_schema()
+        
+        # Persist term counts for rows written before them (or by another
+        # tokenizer configuration)
+        from app.utils.bm25_index import refresh_term_counts
+        refreshed = refresh_term_counts()
+        if refreshed:
+            logger.info('Stored term counts for %d documents', refreshed)
+
+        # Clustering the centroids and cluster indexes of this process follow
+        from app.utils.clustering import sync_clustering_version
+        sync_clustering_version()
+
+    # Start the background resume ingestion workers
+    from app.utils.ingestion import start_ingestion_workers
+    start_ingestion_workers(app)
 
     def _run_db_health_checks(app):
         """Return (sql_ok, chroma_ok, ncols) and print success message if both OK."""
@@ -197,9 +311,12 @@ def create_app():
             logger.debug('SQLAlchemy health check failed: %s', _sql_err)
 
         try:
+            # Only check Chroma when it is already loaded; the check must not
+            # defeat lazy loading
             chroma_path_cfg = app.config.get('CHROMA_PATH')
-            if chroma_path_cfg:
+            if chroma_path_cfg and registry.loaded('chroma_client'):
                 try:
+                    import chromadb
                     chk_client = chromadb.PersistentClient(path=chroma_path_cfg)
                     cols = chk_client.list_collections()
                     if isinstance(cols, (list, tuple)):
@@ -217,17 +334,6 @@ def create_app():
 
         return sql_ok, chroma_ok, ncols
 
-    # Post-initialization health checks: only run when init_ok is True
-    try:
-        if init_ok:
-            # Defer to the centralized _run_db_health_checks to avoid duplicate
-            # and noisy startup output; that helper will print a single concise
-            # success line when both DBs are OK.
-            pass
-    except Exception:
-        # avoid bubbling unexpected errors during final health checks
-        pass
-
     # Run final health checks and print a single concise success line if both OK.
     try:
         _run_db_health_checks(app)
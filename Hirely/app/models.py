@@ -1,7 +1,32 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import joinedload
 from datetime import datetime
+import json
+import numpy as np
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
+from app.utils.tokenizer import count_terms, tokenizer_version
+
+
+class TermCountsMixin:
+    """
+    BM25 term counts persisted when a document's text is written, so queries
+    never re-tokenize stored text. Counts made by a different tokenizer
+    pipeline (see app.utils.tokenizer) read as None until refreshed.
+    """
+    term_counts_json = db.Column('term_counts', db.Text)
+    tokenizer = db.Column(db.String(32))
+
+    @property
+    def term_counts(self):
+        if self.term_counts_json is None or self.tokenizer != tokenizer_version():
+            return None
+        return json.loads(self.term_counts_json)
+
+    @term_counts.setter
+    def term_counts(self, counts):
+        self.term_counts_json = json.dumps(counts, separators=(',', ':'))
+        self.tokenizer = tokenizer_version()
 
 
 class User(db.Model):
@@ -20,7 +45,7 @@ class User(db.Model):
     address = db.Column(db.Text)
 
     # 🔑 Security
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256))
 
     # 📄 Resume filename
     resume = db.Column(db.String(255))
@@ -32,7 +57,7 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # 🔗 Relationship
-    applications = db.relationship('Application', backref='applicant', lazy=True)
+    applications = db.relationship('Application', back_populates='applicant', lazy='select')
 
     # --- Helpers ---
     def set_password(self, password):
@@ -44,8 +69,12 @@ class User(db.Model):
     @property
     def full_name(self):
         """Return full name in 'Last, First Middle' format."""
-        middle = f" {self.middle_name}" if self.middle_name else ""
-        return f"{self.last_name}, {self.first_name}{middle}"
+        return self.format_full_name(self.last_name, self.first_name, self.middle_name)
+
+    @staticmethod
+    def format_full_name(last_name, first_name, middle_name=None):
+        middle = f" {middle_name}" if middle_name else ""
+        return f"{last_name}, {first_name}{middle}"
 
     def to_dict(self):
         return {
@@ -62,8 +91,12 @@ class User(db.Model):
         }
 
 
-class Job(db.Model):
+class Job(TermCountsMixin, db.Model):
     __tablename__ = 'jobs'
+    __table_args__ = (
+        # Active-job index sync and matchmaking filter on is_active
+        db.Index('ix_jobs_is_active', 'is_active'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     role = db.Column(db.String(100), nullable=False)
@@ -71,8 +104,31 @@ class Job(db.Model):
     cluster_id = db.Column(db.Integer)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Counts of the description alone: the shortlist ranks resumes with the
+    # description, while the job index holds role + description
+    description_counts_json = db.Column('description_term_counts', db.Text)
 
-    applications = db.relationship('Application', backref='job', lazy=True)
+    applications = db.relationship('Application', back_populates='job', lazy='select')
+
+    def count_text(self):
+        """
+        Persist the term counts of the indexed document (role + description)
+        and of the description.
+
+        Returns:
+            dict: the indexed document's counts
+        """
+        from app.utils.bm25_index import job_document
+
+        self.term_counts = count_terms(job_document(self.role, self.description))
+        self.description_counts_json = json.dumps(count_terms(self.description), separators=(',', ':'))
+        return self.term_counts
+
+    def shortlist_terms(self):
+        """Stored description counts, computed from the text only if they are stale."""
+        if self.description_counts_json is None or self.tokenizer != tokenizer_version():
+            return count_terms(self.description)
+        return json.loads(self.description_counts_json)
 
     def to_dict(self):
         return {
@@ -85,21 +141,135 @@ class Job(db.Model):
         }
 
 
-class Application(db.Model):
+class Application(TermCountsMixin, db.Model):
     __tablename__ = 'applications'
+    __table_args__ = (
+        # Cluster index sync: cluster_id + status='ready'
+        db.Index('ix_applications_cluster_status', 'cluster_id', 'status'),
+        # A user's applications, newest first (matchmaking, "my applications")
+        db.Index('ix_applications_user_submitted', 'user_id', 'submission_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False)
     cluster_id = db.Column(db.Integer)
-    resume_text = db.Column(db.Text, nullable=False)
     submission_date = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # 📄 Resume content lives once in resume_blobs; the inline column only
+    # holds text for applications created before content addressing
+    resume_sha256 = db.Column(db.String(64), db.ForeignKey('resume_blobs.sha256'))
+    legacy_resume_text = db.Column('resume_text', db.Text, nullable=False, default='')
+    resume_blob = db.relationship('ResumeBlob', lazy='select')
+
+    # 🔗 Relationships (lazy by default; see the eager-load options below)
+    applicant = db.relationship('User', back_populates='applications', lazy='select')
+    job = db.relationship('Job', back_populates='applications', lazy='select')
+
+    # ⏳ Ingestion state: 'pending' until a worker has extracted the resume,
+    # then 'ready' (or 'failed')
+    status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')
+
+    @property
+    def resume_text(self):
+        """Resume text, read from the shared blob when there is one."""
+        if self.resume_blob is not None:
+            return self.resume_blob.text
+        return self.legacy_resume_text
+
+    @resume_text.setter
+    def resume_text(self, value):
+        self.legacy_resume_text = value
+        self.term_counts = count_terms(value)
+
+    def resume_terms(self):
+        """Term counts of the resume (blob or inline), stored at write time."""
+        source = self.resume_blob if self.resume_blob is not None else self
+        counts = source.term_counts
+        return counts if counts is not None else count_terms(self.resume_text)
+
     def to_dict(self):
         return {
             "id": self.id,
             "user_id": self.user_id,
             "job_id": self.job_id,
             "cluster_id": self.cluster_id,
+            "status": self.status,
             "submission_date": self.submission_date.isoformat()
         }
+
+
+class ResumeBlob(TermCountsMixin, db.Model):
+    """Extracted resume content stored once per distinct upload (SHA-256 of the bytes)."""
+    __tablename__ = 'resume_blobs'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    text = db.Column(db.Text, nullable=False)
+    embedding = db.Column(db.LargeBinary)  # float32 sentence embedding
+    size_bytes = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @property
+    def vector(self):
+        if self.embedding is None:
+            return None
+        return np.frombuffer(self.embedding, dtype=np.float32)
+
+    @vector.setter
+    def vector(self, value):
+        self.embedding = np.asarray(value, dtype=np.float32).tobytes()
+
+
+class IngestionTask(db.Model):
+    """SQLite-backed work queue for resume ingestion (see app.utils.ingestion)."""
+    __tablename__ = 'ingestion_tasks'
+
+    id = db.Column(db.Integer, primary_key=True)
+    application_id = db.Column(db.Integer, db.ForeignKey('applications.id'), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    sha256 = db.Column(db.String(64))
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued/running/done/failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)   # lease of the worker running it
+    available_at = db.Column(db.DateTime)   # retry backoff: not claimed before
+
+    application = db.relationship(
+        'Application', backref=db.backref('ingestion_tasks', order_by='IngestionTask.id')
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "application_id": self.application_id,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class ClusteringState(db.Model):
+    """
+    Single row (id 1) whose version every re-clustering bumps, so that all
+    worker processes drop their centroids and cluster indexes, not just the
+    one that re-clustered (see app.utils.clustering.sync_clustering_version).
+    """
+    __tablename__ = 'clustering_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# 🚀 Eager-load options for the hot read paths. Pass them to .options() so a
+# listing costs one joined SELECT instead of one extra query per row.
+# (Shortlist and matchmaking read projected columns instead, see
+# app.utils.projections.)
+
+# "My applications" rows: the job each application was made for
+APPLICATION_WITH_JOB = (joinedload(Application.job),)
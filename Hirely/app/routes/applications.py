@@ -1,10 +1,19 @@
-from flask import Blueprint, request, jsonify, session
-from app.models import db, Application, Job
-from app.utils.pdf_processor import extract_text_from_pdf
+from flask import Blueprint, request, jsonify, session, current_app, url_for
+import logging
+import os
+from app.models import db, Application, IngestionTask, Job, User, APPLICATION_WITH_JOB
 from app.utils.decorators import login_required
+from app.utils.pagination import keyset_page, ndjson_response, page_args, page_headers, wants_ndjson
+from app.utils import ingestion
+from app.utils.ingestion import (
+    save_upload, find_blob, attach_blob, index_application,
+    enqueue, claim_task, process_task, DEFAULT_RETRY_BACKOFF
+)
 
 applications_bp = Blueprint('applications', __name__)
 
+logger = logging.getLogger(__name__)
+
 @applications_bp.route('/', methods=['POST'])
 @login_required
 def apply_for_job():
@@ -30,24 +39,57 @@ def apply_for_job():
         if resume_file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
         
-        # Extract text from PDF
-        resume_text = extract_text_from_pdf(resume_file)
+        # Persist the raw upload (hashed while it was received); text
+        # extraction, tokenization and embedding happen in the background
+        # ingestion workers
+        file_path, sha256 = save_upload(resume_file, current_app.config['UPLOAD_FOLDER'])
         
-        # Create application
         application = Application(
             user_id=user_id,
             job_id=job_id,
             cluster_id=job.cluster_id,
-            resume_text=resume_text
+            status='pending'
         )
-        
         db.session.add(application)
+        
+        # Same PDF seen before: reuse its extracted text, tokens and embedding
+        blob = find_blob(sha256)
+        if blob is not None:
+            os.remove(file_path)
+            attach_blob(application, blob)
+            db.session.commit()
+            # Committed as ready; an indexing problem must not turn that into a 500
+            try:
+                index_application(application)
+            except Exception as e:
+                logger.warning('Indexing of application %s failed: %s', application.id, e)
+            return jsonify({
+                'message': 'Application submitted successfully',
+                'application': application.to_dict()
+            }), 201
+        
+        # Otherwise queue the pending application
+        task = enqueue(application, file_path, sha256)
         db.session.commit()
         
+        if ingestion.worker_pool is None:
+            # No workers configured: ingest inline before answering
+            if claim_task(task.id):
+                process_task(task.id, current_app.config.get('INGEST_MAX_ATTEMPTS', 3),
+                             current_app.config.get('INGEST_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF))
+            db.session.refresh(application)
+            return jsonify({
+                'message': 'Application submitted successfully',
+                'application': application.to_dict()
+            }), 201
+        
+        ingestion.worker_pool.notify()
+        
         return jsonify({
-            'message': 'Application submitted successfully',
-            'application': application.to_dict()
-        }), 201
+            'message': 'Application accepted for processing',
+            'application_id': application.id,
+            'status_url': url_for('applications.get_application_status', application_id=application.id)
+        }), 202
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -61,15 +103,51 @@ def get_user_applications():
             return jsonify({'error': 'Authentication required'}), 401
             
         user_id = session['user_id']
-        applications = Application.query.filter_by(user_id=user_id).all()
+        try:
+            limit, after = page_args()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        applications = Application.query.options(
+            *APPLICATION_WITH_JOB
+        ).filter_by(user_id=user_id)
+        if wants_ndjson():
+            return ndjson_response(applications, Application.id, _with_job, after=after)
         
-        result = []
-        for app in applications:
-            app_data = app.to_dict()
-            app_data['job'] = app.job.to_dict()
-            result.append(app_data)
+        page, next_cursor = keyset_page(applications, Application.id, limit, after)
+        return jsonify([_with_job(app) for app in page]), 200, page_headers(next_cursor)
         
-        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _with_job(application):
+    app_data = application.to_dict()
+    app_data['job'] = application.job.to_dict()
+    return app_data
+
+@applications_bp.route('/<int:application_id>/status', methods=['GET'])
+@login_required
+def get_application_status(application_id):
+    try:
+        application = Application.query.get_or_404(application_id)
+        
+        # Applicants may only poll their own applications; admins may poll any
+        if application.user_id != session['user_id']:
+            user = User.query.get(session['user_id'])
+            if not user or not user.is_admin:
+                return jsonify({'error': 'Application not found'}), 404
+        
+        # Latest task only (a re-upload may have queued several)
+        task = IngestionTask.query.filter_by(
+            application_id=application.id
+        ).order_by(IngestionTask.id.desc()).first()
+        
+        return jsonify({
+            'application_id': application.id,
+            'status': application.status,
+            'attempts': task.attempts if task else 0,
+            'error': task.error if task else None
+        }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
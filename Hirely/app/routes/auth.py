@@ -3,6 +3,7 @@ from app.models import db, User
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from app.utils.decorators import login_required, admin_required
+from app.utils.uploads import store_upload
 import os
 
 auth_bp = Blueprint('auth', __name__)
@@ -45,7 +46,7 @@ def register():
         if resume:
             filename = secure_filename(resume.filename)
             upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            resume.save(upload_path)
+            store_upload(resume, upload_path)  # streamed to disk, never buffered whole
             resume_filename = filename  # store in DB if needed
 
         # ✅ Create and store the user
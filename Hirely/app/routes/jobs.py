@@ -1,16 +1,38 @@
 from flask import Blueprint, request, jsonify, current_app
+import click
+import json
+import logging
 from app.models import db, Job
-from app import model, kmeans_model, jobs_collection
+from app import get_model, get_kmeans_model, get_jobs_collection
 from app.utils.decorators import admin_required
+from app.utils.bm25_index import add_job_to_index, remove_job_from_index
+from app.utils.semantic import metadata, sync_metadata
+from app.utils.result_cache import JOBS_TAG, get_cache, job_tag
+from app.utils.pagination import keyset_page, ndjson_response, page_args, page_headers, wants_ndjson
+from app.utils.job_import import (
+    DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, detect_format, import_jobs, read_records, text_stream
+)
 
 jobs_bp = Blueprint('jobs', __name__)
 
+logger = logging.getLogger(__name__)
+
 @jobs_bp.route('/', methods=['GET'])
 def get_jobs():
     try:
+        try:
+            limit, after = page_args()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Get only active jobs (available to all authenticated users)
-        jobs = Job.query.filter_by(is_active=True).all()
-        return jsonify([job.to_dict() for job in jobs]), 200
+        jobs = Job.query.filter_by(is_active=True)
+        if wants_ndjson():
+            return ndjson_response(jobs, Job.id, Job.to_dict, after=after)
+        
+        # One page in id order; the next page's cursor is in the Link header
+        page, next_cursor = keyset_page(jobs, Job.id, limit, after)
+        return jsonify([job.to_dict() for job in page]), 200, page_headers(next_cursor)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -18,7 +40,8 @@ def get_jobs():
 @admin_required
 def add_job():
     try:
-        # Check if models are loaded
+        # Check if models are loaded (first use loads them)
+        model, kmeans_model, jobs_collection = get_model(), get_kmeans_model(), get_jobs_collection()
         if not all([model, kmeans_model, jobs_collection]):
             return jsonify({'error': 'System not fully initialized'}), 503
             
@@ -41,8 +64,9 @@ def add_job():
         # Predict cluster
         cluster_id = int(kmeans_model.predict(job_vector)[0])
         
-        # Save to database
+        # Save to database, with the term counts BM25 will use
         new_job = Job(role=role, description=description, cluster_id=cluster_id)
+        terms = new_job.count_text()
         db.session.add(new_job)
         db.session.commit()
         
@@ -50,9 +74,14 @@ def add_job():
         jobs_collection.add(
             ids=[str(new_job.id)],
             embeddings=job_vector.tolist(),
-            metadatas=[{"role": role, "cluster_id": cluster_id}]
+            metadatas=[{"role": role, "cluster_id": cluster_id, "is_active": True}]
         )
         
+        # Patch the cached matchmaking index instead of rebuilding it; cached
+        # matches may now miss the new job
+        add_job_to_index(new_job.id, terms)
+        get_cache().invalidate(JOBS_TAG)
+        
         return jsonify({
             'message': 'Job added successfully',
             'job': new_job.to_dict()
@@ -61,6 +90,75 @@ def add_job():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@jobs_bp.route('/bulk', methods=['POST'])
+@admin_required
+def bulk_import_jobs():
+    try:
+        if not all([get_model(), get_kmeans_model(), get_jobs_collection()]):
+            return jsonify({'error': 'System not fully initialized'}), 503
+        
+        batch_size = request.args.get('batch_size', DEFAULT_BATCH_SIZE, type=int)
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            return jsonify({'error': f'batch_size must be between 1 and {MAX_BATCH_SIZE}'}), 400
+        
+        # Accept a multipart upload ('file') or a raw JSONL/CSV request body
+        upload = request.files.get('file')
+        if upload is not None:
+            fmt = request.args.get('format') or detect_format(upload.filename, upload.content_type)
+            stream = upload.stream
+        else:
+            fmt = request.args.get('format') or detect_format(None, request.content_type)
+            stream = request.stream
+        
+        if fmt not in ('csv', 'jsonl'):
+            return jsonify({'error': 'format must be csv or jsonl'}), 400
+        
+        report = import_jobs(read_records(text_stream(stream), fmt), batch_size)
+        if 'error' in report:
+            # Batches before the error stay imported; tell the caller where it stopped
+            return jsonify({'error': report['error'], 'report': report}), 500
+        
+        return jsonify({
+            'message': f"Imported {report['imported']} jobs",
+            'report': report
+        }), 201
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='Input format (default: from the file extension).')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True,
+              type=click.IntRange(1, MAX_BATCH_SIZE),
+              help='Jobs per encode batch / transaction.')
+def import_jobs_command(path, fmt, batch_size):
+    """Bulk-import jobs from a JSONL or CSV file: flask jobs import PATH"""
+    if not all([get_model(), get_kmeans_model(), get_jobs_collection()]):
+        raise click.ClickException('System not fully initialized')
+    
+    with open(path, 'rb') as f:
+        report = import_jobs(read_records(text_stream(f), fmt or detect_format(path)), batch_size)
+    click.echo(json.dumps(report, indent=2))
+    if 'error' in report:
+        raise click.ClickException(f"Import stopped after line {report['last_line']}: {report['error']}")
+
+@jobs_bp.cli.command('backfill-vectors')
+def backfill_vectors_command():
+    """Copy each job's is_active flag into its Chroma metadata: flask jobs backfill-vectors
+
+    Vectors stored before the flag was kept in Chroma have no is_active key
+    and are skipped by the semantic matching filter until this runs.
+    """
+    jobs_collection = get_jobs_collection()
+    if jobs_collection is None:
+        raise click.ClickException('System not fully initialized')
+    
+    active = dict(db.session.query(Job.id, Job.is_active).all())
+    updated = sync_metadata(jobs_collection, 'is_active', active)
+    click.echo(f'Updated is_active on {updated} of {len(active)} job vectors')
+
 @jobs_bp.route('/<int:job_id>', methods=['DELETE'])
 @admin_required
 def delete_job(job_id):
@@ -68,6 +166,21 @@ def delete_job(job_id):
         job = Job.query.get_or_404(job_id)
         job.is_active = False
         db.session.commit()
+        remove_job_from_index(job.id)
+        get_cache().invalidate(JOBS_TAG, job_tag(job.id))
+        
+        # Keep the vector store's active filter in sync for semantic matching;
+        # the job is deactivated either way (flask jobs backfill-vectors
+        # repairs a failed update)
+        jobs_collection = get_jobs_collection()
+        if jobs_collection is not None:
+            try:
+                jobs_collection.update(
+                    ids=[str(job.id)],
+                    metadatas=[metadata(role=job.role, cluster_id=job.cluster_id, is_active=False)]
+                )
+            except Exception as e:
+                logger.warning('Chroma update for deleted job %s failed: %s', job.id, e)
         
         return jsonify({'message': 'Job deleted successfully'}), 200
     except Exception as e:
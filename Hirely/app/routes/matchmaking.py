@@ -1,56 +1,107 @@
 from flask import Blueprint, request, jsonify, session
-from app.models import db, Application, Job
-from rank_bm25 import BM25Okapi
-import numpy as np
+from app.models import db, Job
 from app.utils.decorators import login_required
+from app.utils.bm25_index import get_job_index
+from app.utils.ranking import MAX_TOP_K, rank, reciprocal_rank_fusion
+from app.utils.semantic import collection_signature, nearest, stored_embedding
+from app.utils.projections import job_match_rows, latest_resume_query
+from app.utils.result_cache import JOBS_TAG, cache_key, get_cache, user_tag
+from app import get_model, get_jobs_collection, get_applications_collection
 
 matchmaking_bp = Blueprint('matchmaking', __name__)
 
+MATCH_MODES = ('bm25', 'semantic', 'hybrid')
+
+# Candidates pulled from each ranker before hybrid fusion
+HYBRID_CANDIDATES = 50
+
+# Terms reported by the explain endpoint
+EXPLAIN_TERMS = 10
+
+
+def _match_signature(index, jobs_collection):
+    """What a ranking was computed from: the BM25 job index, the jobs collection or both."""
+    parts = []
+    if index is not None:
+        parts.append(index.signature)
+    if jobs_collection is not None:
+        parts.append(collection_signature(jobs_collection))
+    return '|'.join(parts)
+
 @matchmaking_bp.route('/', methods=['GET'])
 @login_required
 def get_job_matches():
     try:    
         user_id = session['user_id']
         
-        # Get user's most recent application
-        latest_application = Application.query.filter_by(
-            user_id=user_id
-        ).order_by(Application.submission_date.desc()).first()
-        
-        if not latest_application:
+        k = request.args.get('k', 3, type=int)
+        if k < 1:
+            return jsonify({'error': 'k must be a positive integer'}), 400
+        k = min(k, MAX_TOP_K)
+        
+        mode = request.args.get('mode', 'bm25')
+        if mode not in MATCH_MODES:
+            return jsonify({'error': f"mode must be one of {', '.join(MATCH_MODES)}"}), 400
+        model = jobs_collection = applications_collection = None
+        if mode != 'bm25':
+            model, jobs_collection = get_model(), get_jobs_collection()
+            applications_collection = get_applications_collection()
+            if not all([model, jobs_collection]):
+                return jsonify({'error': 'System not fully initialized'}), 503
+        
+        # Get user's most recent application (id and term counts only)
+        resume = latest_resume_query(user_id)
+        
+        if resume is None:
             return jsonify({'error': 'No applications found for this user'}), 404
-            
-        user_resume_text = latest_application.resume_text
-        
-        # Get all active jobs
-        jobs = Job.query.filter_by(is_active=True).all()
-        job_descriptions = [f"{job.role} {job.description}" for job in jobs]
         
-        # Create BM25 index for jobs
-        tokenized_corpus = [desc.split() for desc in job_descriptions]
-        bm25 = BM25Okapi(tokenized_corpus)
-        
-        # Tokenize query (user's resume)
-        tokenized_query = user_resume_text.split()
-        
-        # Get scores
-        doc_scores = bm25.get_scores(tokenized_query)
-        
-        # Get top 3 job matches
-        top_indices = np.argsort(doc_scores)[::-1][:3]
-        top_jobs = [jobs[i] for i in top_indices]
-        top_scores = [doc_scores[i] for i in top_indices]
-        
-        # Prepare response
+        # Same latest application and same active jobs: same ranking. The
+        # BM25 index over all active jobs is only synced when it ranks
+        index = get_job_index() if mode in ('bm25', 'hybrid') else None
+        signature = _match_signature(index, jobs_collection)
+        cache = get_cache()
+        key = cache_key('matches', resume.application_id, signature, mode, k)
+        cached = cache.get(key)
+        if cached is not None:
+            return jsonify(cached), 200
+        
+        n_candidates = max(k, HYBRID_CANDIDATES) if mode == 'hybrid' else k
+        rankings = []
+        
+        if mode in ('bm25', 'hybrid'):
+            # Score the resume against the cached index over all active jobs
+            rankings.append(rank(index, resume.terms, n_candidates))
+        
+        if mode in ('semantic', 'hybrid'):
+            # Reuse the vector stored at submission time; encode only if missing
+            resume_vector = None
+            if applications_collection is not None:
+                resume_vector = stored_embedding(applications_collection, resume.application_id)
+            if resume_vector is None:
+                resume_vector = model.encode([resume.text()])[0]
+            rankings.append(nearest(jobs_collection, resume_vector, n_candidates, where={'is_active': True}))
+        
+        ranked = rankings[0][:k] if len(rankings) == 1 else reciprocal_rank_fusion(rankings, k)
+        rows_by_id = job_match_rows([job_id for job_id, _ in ranked])
+        
+        # Prepare response (skipping vectors whose job was deactivated meanwhile)
         results = []
-        for job, score in zip(top_jobs, top_scores):
+        for job_id, score in ranked:
+            row = rows_by_id.get(job_id)
+            if row is None:
+                continue
             results.append({
-                'job_id': job.id,
-                'role': job.role,
+                'job_id': row.job_id,
+                'role': row.role,
                 'score': float(score),
-                'description_preview': job.description[:100] + '...' if len(job.description) > 100 else job.description
+                'mode': mode,
+                'description_preview': row.description_preview
             })
         
+        # Not cached if a job was added or removed while ranking
+        if _match_signature(index, jobs_collection) == signature:
+            cache.set(key, results, tags=(JOBS_TAG, user_tag(user_id)))
+        
         return jsonify(results), 200
         
     except Exception as e:
@@ -62,38 +113,28 @@ def explain_matchmaking(job_id):
     try:   
         user_id = session['user_id']
         
-        # Get user's most recent application
-        latest_application = Application.query.filter_by(
-            user_id=user_id
-        ).order_by(Application.submission_date.desc()).first()
+        # Get user's most recent application (term counts only)
+        resume = latest_resume_query(user_id)
         
-        if not latest_application:
+        if resume is None:
             return jsonify({'error': 'No applications found for this user'}), 404
-            
-        user_resume_text = latest_application.resume_text
         
         # Get the job
         job = Job.query.get_or_404(job_id)
-        job_description = f"{job.role} {job.description}"
-        
-        # Use BM25 to get matching terms
-        tokenized_corpus = [job_description.split()]
-        bm25 = BM25Okapi(tokenized_corpus)
-        tokenized_query = user_resume_text.split()
-        
-        # Get matching terms
-        matching_terms = []
-        for term in tokenized_query:
-            if term in bm25.doc_freqs and term in job_description.lower():
-                matching_terms.append(term)
         
-        # Limit to top 10 terms
-        matching_terms = list(set(matching_terms))[:10]
+        # Break the BM25 match score down by term, from the same index and
+        # query matchmaking ranks with (empty for a deactivated job)
+        contributions = get_job_index().explain(job.id, resume.terms, limit=None)
+        matching_terms = [term for term, _ in contributions[:EXPLAIN_TERMS]]
         
         return jsonify({
             'job_id': job.id,
             'job_role': job.role,
+            'score': sum(weight for _, weight in contributions),
             'matching_terms': matching_terms,
+            'term_weights': [
+                {'term': term, 'weight': weight} for term, weight in contributions[:EXPLAIN_TERMS]
+            ],
             'explanation': f"This job matches your profile because your resume contains relevant terms like {', '.join(matching_terms[:3])} that align with the job requirements."
         }), 200
         
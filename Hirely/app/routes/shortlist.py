@@ -1,56 +1,207 @@
 from flask import Blueprint, request, jsonify
-from app.models import db, Application, Job, User
-from rank_bm25 import BM25Okapi
-import numpy as np
+from app.models import db, Application, Job
 from app.utils.decorators import admin_required
+from app.utils.bm25_index import get_cluster_index, job_document, row_terms, stored_terms_columns
+from app.utils.ranking import MAX_TOP_K, rank, rank_many
+from app.utils.semantic import collection_signature, nearest, stored_embedding
+from app.utils.projections import shortlist_rows
+from app.utils.result_cache import cache_key, cluster_tag, get_cache, job_tag
+from app import get_model, get_jobs_collection, get_applications_collection
 
 shortlist_bp = Blueprint('shortlist', __name__)
 
+SHORTLIST_MODES = ('bm25', 'semantic')
+
+# Terms reported by the explain endpoint
+EXPLAIN_TERMS = 10
+
+# Upper bound for the number of jobs in one batch request
+MAX_BATCH_JOBS = 100
+
+
+def _shortlist_key(job_id, signature, mode, k):
+    return cache_key('shortlist', job_id, signature, mode, k)
+
+
+def _shortlist_results(ranked, rows_by_id):
+    """Response entries for ranked (application_id, score) pairs."""
+    results = []
+    for app_id, score in ranked:
+        row = rows_by_id.get(app_id)
+        if row is None:
+            continue
+        results.append({
+            'application_id': row.application_id,
+            'user_id': row.user_id,
+            'username': row.full_name,
+            'email': row.email,
+            'score': float(score),
+            'resume_preview': row.resume_preview
+        })
+    return results
+
 @shortlist_bp.route('/<int:job_id>', methods=['GET'])
 @admin_required
 def get_shortlist(job_id):
     try:
+        k = request.args.get('k', 5, type=int)
+        if k < 1:
+            return jsonify({'error': 'k must be a positive integer'}), 400
+        k = min(k, MAX_TOP_K)
+        
+        mode = request.args.get('mode', 'bm25')
+        if mode not in SHORTLIST_MODES:
+            return jsonify({'error': f"mode must be one of {', '.join(SHORTLIST_MODES)}"}), 400
+        if mode == 'semantic':
+            model, jobs_collection = get_model(), get_jobs_collection()
+            applications_collection = get_applications_collection()
+            if not all([model, jobs_collection, applications_collection]):
+                return jsonify({'error': 'System not fully initialized'}), 503
+        
         # Get the target job
         target_job = Job.query.get_or_404(job_id)
         
-        # Get all applications in the same cluster
-        applications = Application.query.filter_by(cluster_id=target_job.cluster_id).all()
+        if mode == 'semantic':
+            # Ranked by Chroma, so keyed by the applications collection
+            # instead of the BM25 index (which is never built here); newly
+            # indexed applications change the count and drop the cluster tag
+            index = None
+            signature = collection_signature(applications_collection)
+        else:
+            # Get the (incrementally maintained) BM25 index for the job's cluster;
+            # its signature changes whenever an application there becomes ready
+            index = get_cluster_index(target_job.cluster_id)
+            signature = index.signature
+        cache = get_cache()
+        key = _shortlist_key(target_job.id, signature, mode, k)
+        cached = cache.get(key)
+        if cached is not None:
+            return jsonify(cached), 200
+        
+        if mode == 'semantic':
+            # Nearest resumes to the job's stored vector, filtered to its cluster
+            job_vector = stored_embedding(jobs_collection, target_job.id)
+            if job_vector is None:
+                job_vector = model.encode([job_document(target_job.role, target_job.description)])[0]
+            where = {'cluster_id': target_job.cluster_id} if target_job.cluster_id is not None else None
+            ranked = nearest(applications_collection, job_vector, k, where=where)
+        else:
+            # Score the job description's stored terms against the cluster
+            # and keep the top k
+            ranked = rank(index, target_job.shortlist_terms(), k)
         
-        if not applications:
+        if not ranked:
             return jsonify({'message': 'No applications found for this job cluster'}), 404
         
-        # Prepare corpus for BM25
-        corpus = [app.resume_text for app in applications]
-        tokenized_corpus = [doc.split() for doc in corpus]
+        # Only the final top k are read back, as projected rows
+        rows_by_id = shortlist_rows([app_id for app_id, _ in ranked])
         
-        # Create BM25 index
-        bm25 = BM25Okapi(tokenized_corpus)
+        # Prepare response
+        results = _shortlist_results(ranked, rows_by_id)
         
-        # Tokenize query (job description)
-        tokenized_query = target_job.description.split()
+        # Not cached if an application was indexed while ranking
+        current = index.signature if index is not None else collection_signature(applications_collection)
+        if current == signature:
+            cache.set(key, results, tags=(job_tag(target_job.id), cluster_tag(target_job.cluster_id)))
         
-        # Get scores
-        doc_scores = bm25.get_scores(tokenized_query)
+        return jsonify(results), 200
         
-        # Get top 5 applications
-        top_indices = np.argsort(doc_scores)[::-1][:5]
-        top_applications = [applications[i] for i in top_indices]
-        top_scores = [doc_scores[i] for i in top_indices]
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@shortlist_bp.route('/batch', methods=['POST'])
+@admin_required
+def get_shortlists():
+    """
+    BM25 shortlists for many jobs in one call.
+
+    Body: {"job_ids": [1, 2, ...], "k": 5}. Jobs are grouped by cluster and
+    all job queries of a cluster are scored against its index in a single
+    sparse product, so the work grows with the number of distinct clusters.
+    Each entry of `shortlists` matches GET /<job_id> (an empty list when the
+    cluster has no applications); unknown ids are listed in `missing`.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        job_ids = data.get('job_ids')
+        if not isinstance(job_ids, list) or not job_ids:
+            return jsonify({'error': 'job_ids must be a non-empty list'}), 400
+        if not all(isinstance(job_id, int) and not isinstance(job_id, bool) for job_id in job_ids):
+            return jsonify({'error': 'job_ids must be integers'}), 400
+        job_ids = list(dict.fromkeys(job_ids))
+        if len(job_ids) > MAX_BATCH_JOBS:
+            return jsonify({'error': f'At most {MAX_BATCH_JOBS} jobs per batch'}), 400
         
-        # Prepare response
-        results = []
-        for app, score in zip(top_applications, top_scores):
-            user = User.query.get(app.user_id)
-            results.append({
-                'application_id': app.id,
-                'user_id': app.user_id,
-                'username': user.username,
-                'email': user.email,
-                'score': float(score),
-                'resume_preview': app.resume_text[:200] + '...' if len(app.resume_text) > 200 else app.resume_text
+        k = data.get('k', 5)
+        if not isinstance(k, int) or isinstance(k, bool) or k < 1:
+            return jsonify({'error': 'k must be a positive integer'}), 400
+        k = min(k, MAX_TOP_K)
+        
+        # One projected read for every requested job and its stored terms
+        jobs = {
+            row.id: row for row in db.session.query(
+                Job.id, Job.role, Job.cluster_id, *stored_terms_columns(
+                    Job.description_counts_json, Job.tokenizer, Job.description
+                )
+            ).filter(Job.id.in_(job_ids))
+        }
+        
+        by_cluster = {}
+        for job_id in job_ids:
+            if job_id in jobs:
+                by_cluster.setdefault(jobs[job_id].cluster_id, []).append(job_id)
+        
+        cache = get_cache()
+        ranked_by_job = {}
+        cached_by_job = {}
+        for cluster_id, cluster_job_ids in by_cluster.items():
+            index = get_cluster_index(cluster_id)
+            signature = index.signature
+            
+            # Jobs answered from the cache are not ranked again
+            pending = []
+            for job_id in cluster_job_ids:
+                cached = cache.get(_shortlist_key(job_id, signature, 'bm25', k))
+                if cached is not None:
+                    cached_by_job[job_id] = cached
+                else:
+                    pending.append(job_id)
+            if not pending:
+                continue
+            
+            queries = [row_terms(*jobs[job_id][3:]) for job_id in pending]
+            for job_id, ranked in zip(pending, rank_many(index, queries, k)):
+                ranked_by_job[job_id] = (ranked, signature, index)
+        
+        # Read back every shortlisted application at once
+        rows_by_id = shortlist_rows(sorted({
+            app_id for ranked, _, _ in ranked_by_job.values() for app_id, _ in ranked
+        }))
+        
+        shortlists = []
+        for job_id in job_ids:
+            if job_id not in jobs:
+                continue
+            job = jobs[job_id]
+            if job_id in cached_by_job:
+                results = cached_by_job[job_id]
+            else:
+                ranked, signature, index = ranked_by_job[job_id]
+                results = _shortlist_results(ranked, rows_by_id)
+                if results and index.signature == signature:
+                    cache.set(_shortlist_key(job_id, signature, 'bm25', k), results,
+                              tags=(job_tag(job_id), cluster_tag(job.cluster_id)))
+            shortlists.append({
+                'job_id': job_id,
+                'job_role': job.role,
+                'cluster_id': job.cluster_id,
+                'shortlist': results
             })
         
-        return jsonify(results), 200
+        return jsonify({
+            'shortlists': shortlists,
+            'missing': [job_id for job_id in job_ids if job_id not in jobs]
+        }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -59,28 +210,26 @@ def get_shortlist(job_id):
 @admin_required
 def explain_shortlist(application_id):
     try:
-        application = Application.query.get_or_404(application_id)
+        application = Application.query.with_entities(
+            Application.job_id, Application.cluster_id
+        ).filter_by(id=application_id).first_or_404()
         job = Job.query.get_or_404(application.job_id)
         
-        # Use BM25 to get term weights
-        tokenized_corpus = [application.resume_text.split()]
-        bm25 = BM25Okapi(tokenized_corpus)
-        tokenized_query = job.description.split()
-        
-        # Get top matching terms
-        top_terms = []
-        for term in tokenized_query:
-            if term in bm25.doc_freqs and term in application.resume_text.lower():
-                top_terms.append(term)
-        
-        # Limit to top 10 terms
-        top_terms = list(set(top_terms))[:10]
+        # Break the shortlist score down by term, from the same index and
+        # query the shortlist ranks with
+        index = get_cluster_index(application.cluster_id)
+        contributions = index.explain(application_id, job.shortlist_terms(), limit=None)
+        top_terms = [term for term, _ in contributions[:EXPLAIN_TERMS]]
         
         return jsonify({
             'application_id': application_id,
             'job_id': job.id,
             'job_role': job.role,
+            'score': sum(weight for _, weight in contributions),
             'matching_terms': top_terms,
+            'term_weights': [
+                {'term': term, 'weight': weight} for term, weight in contributions[:EXPLAIN_TERMS]
+            ],
             'explanation': f"This resume was selected because it contains relevant terms like {', '.join(top_terms[:3])} and more that match the job requirements."
         }), 200
         
@@ -0,0 +1,95 @@
+import click
+import json
+import numpy as np
+from flask import Blueprint, request, jsonify
+from app import registry
+from app.utils.centroids import load_centroids
+from app.utils.clustering import cluster_report, recluster_jobs
+from app.utils.decorators import admin_required
+from app.utils.result_cache import get_cache
+
+system_bp = Blueprint('system', __name__)
+
+@system_bp.route('/models', methods=['GET'])
+@admin_required
+def get_model_status():
+    # Load state and load timings of the lazily loaded ML artifacts
+    return jsonify(registry.stats()), 200
+
+@system_bp.route('/models/warmup', methods=['POST'])
+@admin_required
+def warm_up_models():
+    try:
+        data = request.get_json(silent=True) or {}
+        names = data.get('models')
+        registry.warm_up(names)
+        return jsonify(registry.stats()), 200
+    except KeyError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@system_bp.route('/clusters', methods=['GET'])
+@admin_required
+def get_cluster_balance():
+    # Jobs and ready applications per cluster, with balance statistics
+    try:
+        return jsonify(cluster_report()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@system_bp.route('/clusters/recluster', methods=['POST'])
+@admin_required
+def recluster():
+    try:
+        data = request.get_json(silent=True) or {}
+        options = {}
+        for name in ('k', 'k_min', 'k_max', 'sample_size', 'max_iter', 'seed'):
+            if data.get(name) is not None:
+                value = data[name]
+                if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                    return jsonify({'error': f'{name} must be a non-negative integer'}), 400
+                options[name] = value
+        report = recluster_jobs(dry_run=bool(data.get('dry_run', False)), **options)
+        return jsonify(report), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@system_bp.cli.command('install-centroids')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Only report the new cluster sizes.')
+def install_centroids_command(path, dry_run):
+    """Move jobs and applications to trained centroids and install them: flask system install-centroids PATH
+
+    PATH is a model written by training/train.py (data/models/kmeans-<version>.npy).
+    """
+    try:
+        report = recluster_jobs(centers=np.array(load_centroids(path).centers), dry_run=dry_run)
+    except (ValueError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+    click.echo(json.dumps(report, indent=2))
+    if not dry_run:
+        click.echo(f"Installed as clustering version {report['clustering_version']}; "
+                   'running workers switch to it on their next cluster lookup')
+
+@system_bp.route('/cache', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    # Hit rate and size of the matchmaking / shortlist result cache
+    try:
+        return jsonify(get_cache().stats()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@system_bp.route('/cache', methods=['DELETE'])
+@admin_required
+def clear_cache():
+    try:
+        get_cache().clear()
+        return jsonify({'message': 'Result cache cleared'}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
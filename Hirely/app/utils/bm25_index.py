@@ -0,0 +1,533 @@
+import json
+import threading
+from collections import Counter
+from collections.abc import Mapping
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import or_
+
+from app import db
+from app.utils import ranking
+from app.utils.instrumentation import span
+from app.utils.tokenizer import count_terms, tokenizer_version
+
+
+def _term_counts(terms):
+    """Accept either a token list or a stored term -> count mapping."""
+    return terms if isinstance(terms, Mapping) else Counter(terms)
+
+
+_MASK64 = (1 << 64) - 1
+
+# Terms no indexed document uses any more are dropped from the vocabulary
+# once they are at least this many and this share of it
+VOCAB_COMPACT_MIN = 1024
+VOCAB_COMPACT_RATIO = 0.5
+
+
+def _mix(doc_id):
+    # splitmix64 finalizer: spreads integer ids over 64 bits so that XOR-ing
+    # them gives an order-independent fingerprint of the document set
+    z = (hash(doc_id) + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+class BM25Index:
+    """
+    Incremental BM25 index that scores exactly like rank_bm25.BM25Okapi.
+
+    Every document is kept as a row of term ids and term frequencies over a
+    shared vocabulary, together with per-term document frequencies, so that a
+    query never has to re-tokenize the corpus. Documents and queries are
+    token lists or, as persisted by the models, term -> count mappings. Rows can be added and removed
+    in place; `version` is bumped on every change and `signature` identifies
+    the indexed set across processes. The CSR weight matrix used
+    for scoring (see app.utils.ranking) is refreshed lazily after a change and
+    a query is then a single sparse matrix-vector product.
+
+    The term-frequency CSR behind the weights is kept between changes: only
+    rows added since the last refresh are stacked from Python arrays, and
+    removals become one vectorized row selection, so a write followed by a
+    query costs a few numpy passes over the non-zeros, not a per-row rebuild.
+    The weights themselves depend on the average document length and are
+    recomputed from it on every refresh, which keeps scores exact.
+    """
+
+    def __init__(self, k1=1.5, b=0.75, epsilon=0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        self.vocab = {}         # term -> term id
+        self.terms = []         # term id -> term
+        self.df = []            # term id -> number of documents containing it
+        self.doc_ids = []       # row -> external document id
+        self._positions = {}    # external document id -> row
+        self.doc_len = []
+        self.doc_term_ids = []  # row -> np.ndarray of term ids (sorted)
+        self.doc_freqs = []     # row -> np.ndarray of matching frequencies
+        self.version = 0
+        self._digest = 0        # XOR of _mix(doc_id) over indexed documents
+
+        self._idf = None
+        self._weights = None
+        self._tf = None         # CSR term frequencies as of the last refresh
+        self._tf_rows = None    # row -> row of _tf (-1: added since); None while rows only grew
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._positions
+
+    def add_document(self, doc_id, terms):
+        """Append one tokenized document; no-op if doc_id is already indexed."""
+        with self.lock:
+            if doc_id in self._positions:
+                return
+            freqs = _term_counts(terms)
+            term_ids = np.empty(len(freqs), dtype=np.int32)
+            for i, term in enumerate(freqs):
+                term_id = self.vocab.get(term)
+                if term_id is None:
+                    term_id = self.vocab[term] = len(self.df)
+                    self.terms.append(term)
+                    self.df.append(0)
+                self.df[term_id] += 1
+                term_ids[i] = term_id
+
+            # Rows are kept sorted by term id so a term's weight in a
+            # document is a binary search (see explain)
+            counts = np.fromiter(freqs.values(), dtype=float, count=len(freqs))
+            order = np.argsort(term_ids, kind='stable')
+            self._positions[doc_id] = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self.doc_len.append(sum(freqs.values()))
+            self.doc_term_ids.append(term_ids[order])
+            self.doc_freqs.append(counts[order])
+            if self._tf_rows is not None:
+                self._tf_rows.append(-1)
+            self._digest ^= _mix(doc_id)
+            self._changed()
+
+    def remove_document(self, doc_id):
+        """Drop a document; the last row is moved into its place."""
+        with self.lock:
+            pos = self._positions.pop(doc_id, None)
+            if pos is None:
+                return
+            for term_id in self.doc_term_ids[pos]:
+                self.df[term_id] -= 1
+
+            last = len(self.doc_ids) - 1
+            if self._tf_rows is None:
+                cached = self._tf.shape[0] if self._tf is not None else 0
+                self._tf_rows = list(range(cached)) + [-1] * (len(self.doc_ids) - cached)
+            self._tf_rows[pos] = self._tf_rows[last]
+            self._tf_rows.pop()
+            if pos != last:
+                moved_id = self.doc_ids[last]
+                self.doc_ids[pos] = moved_id
+                self.doc_len[pos] = self.doc_len[last]
+                self.doc_term_ids[pos] = self.doc_term_ids[last]
+                self.doc_freqs[pos] = self.doc_freqs[last]
+                self._positions[moved_id] = pos
+            self.doc_ids.pop()
+            self.doc_len.pop()
+            self.doc_term_ids.pop()
+            self.doc_freqs.pop()
+            self._digest ^= _mix(doc_id)
+            self._changed()
+
+    def _changed(self):
+        self._idf = None
+        self._weights = None
+        self.version += 1
+
+    @property
+    def signature(self):
+        """
+        Identifies the indexed document set, independent of insertion order.
+
+        Indexed documents are immutable rows (a job or application text never
+        changes under its id), so two indexes with the same signature score
+        alike, in any worker process. Unlike `version`, it can key results
+        kept across processes (see app.utils.result_cache).
+        """
+        with self.lock:
+            return f'{tokenizer_version()}:{len(self.doc_ids)}:{self._digest:016x}'
+
+    @property
+    def idf(self):
+        """IDF per term id, with BM25Okapi's epsilon floor for negative values."""
+        with self.lock:
+            if self._idf is None:
+                self._idf = ranking.bm25_idf(self.df, len(self.doc_ids), self.epsilon)
+            return self._idf
+
+    @property
+    def weights(self):
+        """CSR matrix (documents x terms) of BM25 term weights."""
+        with self.lock:
+            if self._weights is None:
+                with span('bm25.build'):
+                    self._compact_vocab()
+                    self._weights = ranking.bm25_weights(
+                        self._term_frequencies(), self.doc_len, self.k1, self.b
+                    )
+            return self._weights
+
+    def _term_frequencies(self):
+        """Bring the cached term-frequency CSR in line with the current rows."""
+        n_terms = len(self.df)
+        cached = self._tf
+        if cached is None:
+            tf = ranking.csr_from_rows(self.doc_term_ids, self.doc_freqs, n_terms)
+        else:
+            if cached.shape[1] != n_terms:
+                cached = sparse.csr_matrix(
+                    (cached.data, cached.indices, cached.indptr), shape=(cached.shape[0], n_terms)
+                )
+            if self._tf_rows is None:
+                # Only appends since the last refresh
+                kept = cached
+                added = np.arange(cached.shape[0], len(self.doc_ids))
+                order = None
+            else:
+                rows = np.asarray(self._tf_rows, dtype=np.int64)
+                sources = rows[rows >= 0]
+                kept = cached[sources]
+                added = np.flatnonzero(rows < 0)
+                # Kept rows come first in the stacked matrix, then added rows
+                order = np.empty(len(rows), dtype=np.int64)
+                order[rows >= 0] = np.arange(len(sources))
+                order[added] = len(sources) + np.arange(len(added))
+            tf = kept
+            if len(added):
+                tf = sparse.vstack([kept, ranking.csr_from_rows(
+                    [self.doc_term_ids[row] for row in added],
+                    [self.doc_freqs[row] for row in added],
+                    n_terms,
+                )], format='csr')
+            if order is not None and not np.array_equal(order, np.arange(len(order))):
+                tf = tf[order]
+        self._tf = tf
+        self._tf_rows = None
+        return tf
+
+    def _compact_vocab(self):
+        """Drop terms whose documents were all removed, renumbering the rest."""
+        live = np.asarray(self.df) > 0
+        dead = len(live) - int(live.sum())
+        if dead < VOCAB_COMPACT_MIN or dead < VOCAB_COMPACT_RATIO * len(live):
+            return
+        # Term ids keep their relative order, so rows stay sorted
+        new_ids = np.cumsum(live) - 1
+        self.terms = [term for term, keep in zip(self.terms, live) if keep]
+        self.df = [count for count in self.df if count > 0]
+        self.vocab = {term: term_id for term_id, term in enumerate(self.terms)}
+        self.doc_term_ids = [new_ids[ids].astype(np.int32) for ids in self.doc_term_ids]
+        # The cached matrix uses the old ids; restack it from the rows
+        self._tf = None
+        self._tf_rows = None
+        self._idf = None
+
+    def term_ids(self, tokens):
+        """Map tokens to term ids, dropping out-of-vocabulary tokens."""
+        vocab = self.vocab
+        return [vocab[token] for token in tokens if token in vocab]
+
+    def explain(self, doc_id, query, limit=10):
+        """
+        Break one document's score for `query` into per-term contributions.
+
+        Uses the same weights as get_scores, so the contributions add up to
+        the document's score. Each query term costs a hash lookup in the
+        vocabulary and a binary search in the document's sorted row, so the
+        cost grows with the query, not with the document.
+
+        Args:
+            doc_id: an indexed document id
+            query: token list or term -> count mapping
+            limit: number of terms to return (None for all)
+
+        Returns:
+            list: (term, contribution) pairs, largest first (ties by term);
+            empty when doc_id is not indexed
+        """
+        with self.lock:
+            row = self._positions.get(doc_id)
+            if row is None:
+                return []
+            weights = self.weights
+            counts = _term_counts(query)
+            in_vocab = [term for term in counts if term in self.vocab]
+            start, end = weights.indptr[row], weights.indptr[row + 1]
+            if not in_vocab or start == end:
+                return []
+
+            term_ids = np.array(self.term_ids(in_vocab), dtype=np.int64)
+            query_counts = np.array([counts[term] for term in in_vocab], dtype=float)
+            columns = weights.indices[start:end]
+            found = np.minimum(np.searchsorted(columns, term_ids), len(columns) - 1)
+            present = columns[found] == term_ids
+
+            term_ids = term_ids[present]
+            contributions = (self.idf[term_ids] * query_counts[present]
+                             * weights.data[start:end][found[present]])
+            pairs = [(self.terms[t], float(c)) for t, c in zip(term_ids, contributions)]
+            pairs.sort(key=lambda pair: (-pair[1], pair[0]))
+            return pairs[:limit]
+
+    def get_scores(self, query):
+        """
+        Score every indexed document against a query (tokens or term counts).
+
+        Returns:
+            np.ndarray: scores aligned with self.doc_ids
+        """
+        with self.lock:
+            if not self.doc_ids:
+                return np.zeros(0)
+            # Refreshing the weights may renumber terms, so do it first
+            weights = self.weights
+            counts = _term_counts(query)
+            in_vocab = [term for term in counts if term in self.vocab]
+            vector = ranking.query_vector(
+                self.term_ids(in_vocab), self.idf, [counts[term] for term in in_vocab]
+            )
+            return weights @ vector
+
+    def get_scores_many(self, queries):
+        """
+        Score every indexed document against several queries in one sparse
+        product (instead of one get_scores pass per query).
+
+        Returns:
+            np.ndarray: (len(queries), len(self.doc_ids)) scores; row i
+            equals get_scores(queries[i])
+        """
+        with self.lock:
+            if not self.doc_ids or not queries:
+                return np.zeros((len(queries), len(self.doc_ids)))
+            weights = self.weights
+            term_ids, counts = [], []
+            for query in queries:
+                query_counts = _term_counts(query)
+                in_vocab = [term for term in query_counts if term in self.vocab]
+                term_ids.append(self.term_ids(in_vocab))
+                counts.append([query_counts[term] for term in in_vocab])
+            matrix = ranking.query_matrix(term_ids, counts, self.idf)
+            return (matrix @ weights.T).toarray()
+
+
+# cluster_id -> BM25Index over Application.resume_text
+_cluster_indexes = {}
+_registry_lock = threading.Lock()
+
+# BM25Index over "role description" of every active Job
+_job_index = BM25Index()
+
+# SQLite caps the number of bound parameters per statement
+_IN_CHUNK = 500
+
+
+def _get_or_create(cluster_id):
+    with _registry_lock:
+        index = _cluster_indexes.get(cluster_id)
+        if index is None:
+            index = _cluster_indexes[cluster_id] = BM25Index()
+        return index
+
+
+def _sync_index(index, id_column, criteria, rows_query, row_terms):
+    """
+    Bring `index` in line with the rows matching `criteria`.
+
+    A cheap COUNT/MAX probe detects rows committed or deactivated by other
+    workers; only the missing rows are fetched. `rows_query` must select the
+    id first; `row_terms` turns one of its rows into term counts.
+    """
+    count, max_id = db.session.query(
+        db.func.count(id_column), db.func.max(id_column)
+    ).filter(*criteria).one()
+    if count == len(index) and (max_id is None or max_id in index):
+        return
+
+    if len(index):
+        live_ids = {row[0] for row in db.session.query(id_column).filter(*criteria)}
+        for doc_id in [doc_id for doc_id in index.doc_ids if doc_id not in live_ids]:
+            index.remove_document(doc_id)
+        missing = sorted(doc_id for doc_id in live_ids if doc_id not in index)
+        rows = []
+        for start in range(0, len(missing), _IN_CHUNK):
+            chunk = missing[start:start + _IN_CHUNK]
+            rows.extend(rows_query.filter(id_column.in_(chunk)).all())
+    else:
+        rows = rows_query.filter(*criteria).all()
+
+    for row in sorted(rows, key=lambda row: row[0]):
+        index.add_document(row[0], row_terms(row))
+
+
+def stored_terms_columns(counts_column, tokenizer_column, text_column):
+    """
+    Two columns to select for a document: its persisted term counts and,
+    only when those are missing or came from another tokenizer pipeline, the
+    text to count instead. Pass the selected pair to row_terms().
+    """
+    stale = or_(counts_column.is_(None), tokenizer_column.is_(None), tokenizer_column != tokenizer_version())
+    return (
+        db.case((stale, db.null()), else_=counts_column),
+        db.case((stale, text_column), else_=db.null()),
+    )
+
+
+def resume_terms_columns():
+    """stored_terms_columns() for an application's resume (blob or inline)."""
+    from app.models import Application, ResumeBlob
+
+    inline = Application.resume_sha256.is_(None)
+    return stored_terms_columns(
+        db.case((inline, Application.term_counts_json), else_=ResumeBlob.term_counts_json),
+        db.case((inline, Application.tokenizer), else_=ResumeBlob.tokenizer),
+        db.func.coalesce(ResumeBlob.text, Application.legacy_resume_text),
+    )
+
+
+def row_terms(counts_json, text):
+    """Term counts from a stored_terms_columns() pair."""
+    if counts_json is not None:
+        return json.loads(counts_json)
+    return count_terms(text)
+
+
+def get_cluster_index(cluster_id):
+    """
+    Return the resume index for a cluster, caught up with the database (and
+    rebuilt if another process re-clustered since it was built).
+    """
+    from app.models import Application, ResumeBlob
+    from app.utils.clustering import sync_clustering_version
+
+    sync_clustering_version()
+    index = _get_or_create(cluster_id)
+    with index.lock, span('bm25.sync'):
+        _sync_index(
+            index,
+            Application.id,
+            [Application.cluster_id == cluster_id, Application.status == 'ready'],
+            db.session.query(Application.id, *resume_terms_columns()).outerjoin(
+                ResumeBlob, Application.resume_sha256 == ResumeBlob.sha256
+            ),
+            lambda row: row_terms(row[1], row[2]),
+        )
+    return index
+
+
+def add_to_cluster_index(cluster_id, application_id, terms):
+    """Patch an already-loaded cluster index after a new application commits."""
+    with _registry_lock:
+        index = _cluster_indexes.get(cluster_id)
+    if index is not None:
+        index.add_document(application_id, terms)
+
+
+def job_document(role, description):
+    """Text indexed for a job posting."""
+    return f"{role} {description}"
+
+
+def get_job_index():
+    """Return the active-job index, caught up with the database."""
+    from app.models import Job
+
+    with _job_index.lock, span('bm25.sync'):
+        _sync_index(
+            _job_index,
+            Job.id,
+            [Job.is_active == True],
+            db.session.query(Job.id, *stored_terms_columns(
+                Job.term_counts_json, Job.tokenizer, Job.role + ' ' + Job.description
+            )),
+            lambda row: row_terms(row[1], row[2]),
+        )
+    return _job_index
+
+
+def add_job_to_index(job_id, terms):
+    """Patch the job index after a job is committed."""
+    if len(_job_index):
+        _job_index.add_document(job_id, terms)
+
+
+def remove_job_from_index(job_id):
+    """Patch the job index after jobs.delete_job deactivates a posting."""
+    _job_index.remove_document(job_id)
+
+
+def metrics():
+    """Documents per in-memory index, for /metrics."""
+    with _registry_lock:
+        indexes = [(f'cluster:{cluster_id}', index) for cluster_id, index in _cluster_indexes.items()]
+    indexes.append(('jobs', _job_index))
+    return [('hirely_bm25_documents', 'gauge', 'Documents in each in-memory BM25 index.',
+             [({'index': name}, len(index)) for name, index in indexes])]
+
+
+def reset_cluster_indexes():
+    """Drop the resume indexes; they rebuild on demand (after re-clustering)."""
+    with _registry_lock:
+        _cluster_indexes.clear()
+
+
+def reset_indexes():
+    """Drop every in-memory index (tests, or after the database is swapped out)."""
+    global _job_index
+    with _registry_lock:
+        _cluster_indexes.clear()
+        _job_index = BM25Index()
+
+
+def refresh_term_counts(batch_size=_IN_CHUNK):
+    """
+    Persist term counts for documents stored without them, or by another
+    tokenizer pipeline (called by create_app). After this, index syncs and
+    queries read counts only.
+
+    Returns:
+        int: number of rows updated
+    """
+    from app.models import Application, Job, ResumeBlob
+
+    version = tokenizer_version()
+
+    def stale(model, *missing):
+        return or_(model.tokenizer.is_(None), model.tokenizer != version, *missing)
+
+    def counted(text_of):
+        def refresh(row):
+            row.term_counts = count_terms(text_of(row))
+        return refresh
+
+    sources = [
+        (Job, [stale(Job, Job.description_counts_json.is_(None))], Job.count_text),
+        (ResumeBlob, [stale(ResumeBlob)], counted(lambda blob: blob.text)),
+        (Application, [stale(Application), Application.resume_sha256.is_(None)],
+         counted(lambda app: app.legacy_resume_text)),
+    ]
+    updated = 0
+    for model, criteria, refresh in sources:
+        while True:
+            rows = model.query.filter(*criteria).limit(batch_size).all()
+            if not rows:
+                break
+            for row in rows:
+                refresh(row)
+            db.session.commit()
+            updated += len(rows)
+    return updated
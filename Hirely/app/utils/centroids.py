@@ -0,0 +1,161 @@
+"""
+Nearest-centroid cluster assignment without sklearn on the request path.
+
+The k-means pickle is only needed once: its cluster_centers_ are exported to
+a float32 .npy file next to it, which every worker then memory-maps (the OS
+shares the pages between processes). Assignment is one matrix product and an
+argmin over the whole batch, so a single job, a bulk import batch and a
+resume lookup all take the same code path and agree with KMeans.predict.
+"""
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CENTROIDS_DTYPE = np.float32
+
+
+class Centroids:
+    """
+    Cluster centers with KMeans.predict semantics.
+
+    argmin_j ||x - c_j||^2 == argmin_j (||c_j||^2 - 2 x.c_j), so only the
+    centers' squared norms are precomputed; ties go to the lowest cluster id,
+    as in sklearn.
+    """
+
+    def __init__(self, centers):
+        if not isinstance(centers, np.ndarray):
+            centers = np.asarray(centers)
+        if centers.ndim != 2 or not len(centers):
+            raise ValueError(f'Expected a non-empty (n_clusters, dim) array, got shape {centers.shape}')
+        self.centers = centers
+        self._sq_norms = np.einsum('ij,ij->i', centers, centers, dtype=np.float64).astype(centers.dtype)
+
+    @property
+    def n_clusters(self):
+        return self.centers.shape[0]
+
+    @property
+    def dim(self):
+        return self.centers.shape[1]
+
+    def distances(self, vectors):
+        """Squared distances minus ||x||^2, shape (n_vectors, n_clusters)."""
+        vectors = np.asarray(vectors, dtype=self.centers.dtype)
+        if vectors.ndim == 1:
+            vectors = vectors[np.newaxis, :]
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f'Vectors have {vectors.shape[1]} dimensions, centroids {self.dim}')
+        return self._sq_norms - 2.0 * (vectors @ self.centers.T)
+
+    def predict(self, vectors):
+        """Cluster id of each row of `vectors` (a 1-D vector is one row)."""
+        return np.argmin(self.distances(vectors), axis=1)
+
+
+def export_centroids(kmeans_model, path):
+    """Write a fitted KMeans' centers to `path` as float32 .npy."""
+    return save_centroids(kmeans_model.cluster_centers_, path)
+
+
+def _atomic_write(path, write):
+    """
+    Call write(f) on a fresh temporary file next to `path`, then move it over
+    `path`. Every writer gets its own temporary file, so concurrent workers
+    never interleave their bytes; the last rename wins.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def save_centroids(centers, path):
+    """Write (n_clusters, dim) centers to `path` as float32 .npy, atomically."""
+    centers = np.ascontiguousarray(centers, dtype=CENTROIDS_DTYPE)
+    _atomic_write(path, lambda f: np.save(f, centers))
+    return centers
+
+
+def load_centroids(path):
+    """Memory-map exported centroids read-only."""
+    return Centroids(np.load(path, mmap_mode='r'))
+
+
+def centroids_path_for(model_path):
+    """Default export location: data/kmeans_model.pkl -> data/kmeans_model.centroids.npy"""
+    return os.path.splitext(model_path)[0] + '.centroids.npy'
+
+
+def _source_path(centroids_path):
+    """Sidecar recording which pickle the centroids at `centroids_path` follow."""
+    return centroids_path + '.source.json'
+
+
+def _fingerprint(model_path):
+    from app.utils.ingestion import file_sha256
+
+    return {'size': os.path.getsize(model_path), 'sha256': file_sha256(model_path)}
+
+
+def _read_source(centroids_path):
+    try:
+        with open(_source_path(centroids_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_source(centroids_path, fingerprint):
+    _atomic_write(_source_path(centroids_path), lambda f: f.write(json.dumps(fingerprint).encode()))
+
+
+def load_or_export(model_path, centroids_path=None):
+    """
+    Centroids for the k-means pickle at `model_path`.
+
+    The .npy export is reused until the pickle's contents change, as
+    recorded (size and SHA-256) in a sidecar next to the export; then the
+    pickle is loaded (the only sklearn import) and exported again.
+    Modification times are not compared, so copying an older pickle into
+    place is noticed, and centroids written by re-clustering or training
+    are kept as long as the pickle stays the same. An export without a
+    sidecar is adopted as current.
+
+    Args:
+        model_path: joblib pickle of a fitted sklearn KMeans
+        centroids_path: export location (default: next to the pickle)
+
+    Returns:
+        Centroids: memory-mapped float32 centers
+    """
+    centroids_path = centroids_path or centroids_path_for(model_path)
+    exported = os.path.exists(centroids_path)
+    if exported and not os.path.exists(model_path):
+        return load_centroids(centroids_path)
+
+    fingerprint = _fingerprint(model_path)
+    if exported:
+        source = _read_source(centroids_path)
+        if source is None:
+            _write_source(centroids_path, fingerprint)
+        if source is None or source == fingerprint:
+            return load_centroids(centroids_path)
+
+    import joblib
+    kmeans_model = joblib.load(model_path)
+    export_centroids(kmeans_model, centroids_path)
+    _write_source(centroids_path, fingerprint)
+    logger.info('Exported %d k-means centroids to %s', kmeans_model.cluster_centers_.shape[0], centroids_path)
+    return load_centroids(centroids_path)
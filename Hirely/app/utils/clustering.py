@@ -0,0 +1,501 @@
+"""
+Re-clustering of the live jobs from the embeddings already stored in Chroma.
+
+The offline notebook fits KMeans once on a static CSV; as jobs are added the
+clusters drift apart in size and shortlists end up scanning a few huge
+clusters. recluster_jobs() refits the centroids with mini-batch k-means
+(Sculley's update rule, as in sklearn's MiniBatchKMeans) without
+re-encoding anything, picks k by a silhouette score estimated on a bounded
+sample, and moves every job and application to its new cluster.
+
+Everything here is plain NumPy on top of app.utils.centroids, so neither a
+refit nor the request path needs sklearn.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from app import db
+from app.utils.centroids import CENTROIDS_DTYPE, Centroids, save_centroids
+from app.utils.semantic import sync_metadata
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1024
+DEFAULT_MAX_ITER = 100
+DEFAULT_TOLERANCE = 1e-4
+
+# Points used by the silhouette estimate; its cost is O(sample^2 * dim)
+SILHOUETTE_SAMPLE = 2000
+
+# k-means++ runs on this many batches' worth of points (sklearn's init_size)
+INIT_BATCHES = 3
+
+# Candidate k range when none is given (the notebook searched 2..19)
+DEFAULT_K_MIN = 2
+DEFAULT_K_MAX = 20
+
+# Chroma page size when reading stored embeddings / writing metadata
+CHROMA_PAGE_SIZE = 1000
+
+# Clustering version this process's centroids and cluster indexes belong to
+_seen_version = None
+_version_lock = threading.Lock()
+
+# Rows per executemany UPDATE
+UPDATE_BATCH_SIZE = 1000
+
+
+def kmeans_plus_plus(vectors, k, rng):
+    """k-means++ seeding: each next center is drawn proportionally to D(x)^2."""
+    n = len(vectors)
+    centers = np.empty((k, vectors.shape[1]), dtype=CENTROIDS_DTYPE)
+    centers[0] = vectors[rng.integers(n)]
+    closest = ((vectors - centers[0]) ** 2).sum(axis=1)
+    for i in range(1, k):
+        total = closest.sum()
+        pick = rng.choice(n, p=closest / total) if total > 0 else rng.integers(n)
+        centers[i] = vectors[pick]
+        closest = np.minimum(closest, ((vectors - centers[i]) ** 2).sum(axis=1))
+    return centers
+
+
+def minibatch_kmeans(vectors, k, batch_size=DEFAULT_BATCH_SIZE, max_iter=DEFAULT_MAX_ITER,
+                     tol=DEFAULT_TOLERANCE, init=None, seed=0):
+    """
+    Fit k centers with mini-batch k-means.
+
+    k-means++ seeding runs on a random subset of INIT_BATCHES * batch_size
+    points. Each step assigns a random batch to the nearest centers and moves every
+    center to the running mean of all points it has been assigned so far
+    (per-center learning rate 1/count). Passing the current centers as
+    `init` continues the existing model online, which keeps cluster ids
+    stable where the data has not moved.
+
+    Args:
+        vectors: (n, dim) array of embeddings
+        k: number of clusters (at most n)
+        batch_size: points per update step
+        max_iter: maximum number of update steps
+        tol: stop once the centers move less than this (mean squared shift)
+        init: optional (k, dim) starting centers; k-means++ otherwise
+        seed: random seed
+
+    Returns:
+        np.ndarray: (k, dim) float32 centers
+    """
+    vectors = np.asarray(vectors, dtype=CENTROIDS_DTYPE)
+    n = len(vectors)
+    if not 1 <= k <= n:
+        raise ValueError(f'k must be between 1 and the number of vectors ({n}), got {k}')
+    rng = np.random.default_rng(seed)
+    if init is not None:
+        centers = np.array(init, dtype=CENTROIDS_DTYPE)
+        if centers.shape != (k, vectors.shape[1]):
+            raise ValueError(f'init has shape {centers.shape}, expected {(k, vectors.shape[1])}')
+    else:
+        seeds = vectors
+        if n > INIT_BATCHES * batch_size:
+            seeds = vectors[np.sort(rng.choice(n, size=INIT_BATCHES * batch_size, replace=False))]
+        centers = kmeans_plus_plus(seeds, k, rng)
+
+    counts = np.zeros(k, dtype=np.float64)
+    batch_size = min(batch_size, n)
+    for _ in range(max_iter):
+        batch = vectors[rng.choice(n, size=batch_size, replace=False)]
+        labels = Centroids(centers).predict(batch)
+        sums = np.zeros_like(centers, dtype=np.float64)
+        np.add.at(sums, labels, batch)
+        batch_counts = np.bincount(labels, minlength=k)
+        hit = batch_counts > 0
+        counts[hit] += batch_counts[hit]
+
+        previous = centers.copy()
+        # new = (old * old_count + batch_sum) / new_count
+        step = (sums[hit] - batch_counts[hit, None] * centers[hit]) / counts[hit, None]
+        centers[hit] += step.astype(CENTROIDS_DTYPE)
+        if np.mean((centers - previous) ** 2) < tol * tol:
+            break
+    return centers
+
+
+def assign(centers, vectors, chunk_size=10000):
+    """Nearest-center labels for every vector, in bounded-memory chunks."""
+    centroids = Centroids(centers)
+    if not len(vectors):
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate([
+        centroids.predict(vectors[start:start + chunk_size])
+        for start in range(0, len(vectors), chunk_size)
+    ])
+
+
+def inertia(centers, vectors, chunk_size=10000):
+    """Sum of squared distances from every vector to its nearest center."""
+    centroids = Centroids(centers)
+    total = 0.0
+    for start in range(0, len(vectors), chunk_size):
+        chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float64)
+        total += float(centroids.distances(chunk).min(axis=1).sum() + (chunk ** 2).sum())
+    return total
+
+
+def silhouette_estimate(vectors, labels, sample_size=SILHOUETTE_SAMPLE, seed=0):
+    """
+    Mean silhouette coefficient over a uniform sample of at most
+    `sample_size` points (exact when there are fewer points).
+
+    Singletons score 0, as in sklearn's silhouette_score.
+    """
+    labels = np.asarray(labels)
+    if len(vectors) > sample_size:
+        rows = np.sort(np.random.default_rng(seed).choice(len(vectors), size=sample_size, replace=False))
+        vectors, labels = vectors[rows], labels[rows]
+    vectors = np.asarray(vectors, dtype=np.float64)
+    clusters, labels = np.unique(labels, return_inverse=True)
+    if len(clusters) < 2:
+        return 0.0
+
+    sq_norms = (vectors ** 2).sum(axis=1)
+    distances = np.sqrt(np.maximum(sq_norms[:, None] + sq_norms[None, :] - 2.0 * vectors @ vectors.T, 0.0))
+    np.fill_diagonal(distances, 0.0)
+
+    members = np.zeros((len(vectors), len(clusters)))
+    members[np.arange(len(vectors)), labels] = 1.0
+    sizes = members.sum(axis=0)
+    totals = distances @ members                      # summed distance to each cluster
+
+    own = np.arange(len(vectors)), labels
+    own_size = sizes[labels]
+    a = np.where(own_size > 1, totals[own] / np.maximum(own_size - 1, 1), 0.0)
+    mean_other = totals / sizes
+    mean_other[own] = np.inf
+    b = mean_other.min(axis=1)
+    scores = np.where(own_size > 1, (b - a) / np.maximum(np.maximum(a, b), 1e-12), 0.0)
+    return float(scores.mean())
+
+
+def balance(labels, k):
+    """
+    Cluster size balance for `labels` over k clusters.
+
+    Returns:
+        dict: sizes, min/max/mean/std, coefficient of variation, the
+        largest cluster relative to the mean and the number of empty
+        clusters
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    return size_balance(np.bincount(labels, minlength=k) if len(labels) else np.zeros(k, dtype=np.int64))
+
+
+def size_balance(sizes):
+    """balance() from the cluster sizes themselves."""
+    sizes = np.asarray(sizes, dtype=np.int64)
+    k = len(sizes)
+    mean = float(sizes.mean()) if k else 0.0
+    std = float(sizes.std()) if k else 0.0
+    return {
+        'clusters': int(k),
+        'sizes': [int(size) for size in sizes],
+        'min': int(sizes.min()) if k else 0,
+        'max': int(sizes.max()) if k else 0,
+        'mean': round(mean, 2),
+        'std': round(std, 2),
+        'cv': round(std / mean, 3) if mean else 0.0,
+        'max_to_mean': round(float(sizes.max()) / mean, 3) if mean else 0.0,
+        'empty': int((sizes == 0).sum()),
+    }
+
+
+def choose_k(vectors, candidates, sample_size=SILHOUETTE_SAMPLE, seed=0, init=None, **fit_kwargs):
+    """
+    Fit every candidate k and keep the best silhouette estimate.
+
+    `init` (the current centers) warm-starts the candidate with the same k.
+
+    Returns:
+        tuple: (best k, its centers, {k: silhouette})
+    """
+    scores = {}
+    best = None
+    for k in candidates:
+        start = init if init is not None and init.shape == (k, vectors.shape[1]) else None
+        centers = minibatch_kmeans(vectors, k, init=start, seed=seed, **fit_kwargs)
+        scores[k] = round(silhouette_estimate(vectors, assign(centers, vectors), sample_size, seed), 4)
+        if best is None or scores[k] > scores[best[0]]:
+            best = (k, centers)
+    return best[0], best[1], scores
+
+
+def stored_vectors(collection, page_size=CHROMA_PAGE_SIZE):
+    """
+    Every (id, embedding, metadata) in a Chroma collection, paged.
+
+    Returns:
+        tuple: (list of int ids, (n, dim) float32 array, list of metadata dicts)
+    """
+    def pages():
+        offset = 0
+        while True:
+            page = collection.get(include=['embeddings', 'metadatas'], limit=page_size, offset=offset)
+            if not page.get('ids'):
+                return
+            yield page
+            offset += len(page['ids'])
+    return _collect(pages())
+
+
+def stored_vectors_for(collection, doc_ids, page_size=CHROMA_PAGE_SIZE):
+    """Like stored_vectors(), for the given ids only (missing ids are skipped)."""
+    ids = [str(doc_id) for doc_id in doc_ids]
+    return _collect(
+        collection.get(ids=ids[start:start + page_size], include=['embeddings', 'metadatas'])
+        for start in range(0, len(ids), page_size)
+    )
+
+
+def _collect(pages):
+    ids, vectors, metadatas = [], [], []
+    for page in pages:
+        page_ids = page.get('ids') or []
+        ids.extend(int(doc_id) for doc_id in page_ids)
+        vectors.extend(page['embeddings'])
+        page_metadatas = page.get('metadatas')
+        metadatas.extend(page_metadatas if page_metadatas is not None else [{}] * len(page_ids))
+    if not ids:
+        return [], np.empty((0, 0), dtype=CENTROIDS_DTYPE), []
+    return ids, np.asarray(vectors, dtype=CENTROIDS_DTYPE).reshape(len(ids), -1), metadatas
+
+
+def cluster_report():
+    """Jobs and ready applications per cluster, from the database."""
+    from app.models import Application, Job
+
+    jobs = dict(db.session.query(Job.cluster_id, db.func.count(Job.id)).group_by(Job.cluster_id).all())
+    applications = dict(
+        db.session.query(Application.cluster_id, db.func.count(Application.id))
+        .filter(Application.status == 'ready').group_by(Application.cluster_id).all()
+    )
+    cluster_ids = [cluster_id for cluster_id in set(jobs) | set(applications) if cluster_id is not None]
+    k = max(cluster_ids) + 1 if cluster_ids else 0
+    return {
+        'jobs': size_balance([jobs.get(cluster_id, 0) for cluster_id in range(k)]),
+        'applications': size_balance([applications.get(cluster_id, 0) for cluster_id in range(k)]),
+        'unclustered_jobs': jobs.get(None, 0),
+    }
+
+
+def _bulk_update(model, rows):
+    for start in range(0, len(rows), UPDATE_BATCH_SIZE):
+        db.session.execute(db.update(model), rows[start:start + UPDATE_BATCH_SIZE])
+
+
+def _moved_applications():
+    """(application id, job's cluster id) for applications out of line with their job."""
+    from app.models import Application, Job
+
+    return db.session.query(Application.id, Job.cluster_id).join(
+        Job, Application.job_id == Job.id
+    ).filter(Application.cluster_id.is_distinct_from(Job.cluster_id)).all()
+
+
+def _sync_application_clusters():
+    """Give every application its job's cluster; returns how many moved."""
+    from app.models import Application
+
+    moved = _moved_applications()
+    _bulk_update(Application, [{'id': app_id, 'cluster_id': cluster_id} for app_id, cluster_id in moved])
+    return len(moved)
+
+
+def clustering_version():
+    """Version of the stored clustering; bumped by every re-clustering."""
+    from app.models import ClusteringState
+
+    return db.session.query(ClusteringState.version).filter_by(id=1).scalar() or 0
+
+
+def bump_clustering_version():
+    """Record that the clustering was replaced (commits). Returns the new version."""
+    from app.models import ClusteringState
+
+    bumped = ClusteringState.query.filter_by(id=1).update(
+        {'version': ClusteringState.version + 1, 'updated_at': datetime.utcnow()},
+        synchronize_session=False
+    )
+    if not bumped:
+        db.session.add(ClusteringState(id=1, version=1))
+    db.session.commit()
+    return clustering_version()
+
+
+def _drop_cluster_state(version):
+    """Forget this process's centroids and cluster indexes, now at `version`."""
+    global _seen_version
+    from app import registry
+    from app.utils.bm25_index import reset_cluster_indexes
+
+    with _version_lock:
+        _seen_version = version
+    registry.reset('kmeans_model')
+    reset_cluster_indexes()
+
+
+def sync_clustering_version():
+    """
+    Drop this process's centroids and cluster indexes if the clustering was
+    replaced since they were loaded, by recluster_jobs in another worker or
+    `flask system install-centroids`. One primary-key read; called by
+    get_kmeans_model() and get_cluster_index(). The first call of a process
+    only records the version (create_app makes it at startup).
+    """
+    global _seen_version
+
+    version = clustering_version()
+    with _version_lock:
+        if _seen_version is None or _seen_version == version:
+            _seen_version = version
+            return
+    logger.info('Clustering replaced (version %d); reloading centroids and cluster indexes', version)
+    _drop_cluster_state(version)
+
+
+def recluster_jobs(k=None, k_min=DEFAULT_K_MIN, k_max=DEFAULT_K_MAX, sample_size=SILHOUETTE_SAMPLE,
+                   batch_size=DEFAULT_BATCH_SIZE, max_iter=DEFAULT_MAX_ITER, seed=0, dry_run=False,
+                   centers=None):
+    """
+    Refit the job clusters and move jobs and applications to them.
+
+    Job embeddings are read back from the jobs collection (nothing is
+    re-encoded). With `k` unset, every k in [k_min, k_max] is fitted and the
+    best silhouette estimate wins; the current centroids warm-start the fit
+    with their own k. The new cluster ids of jobs and applications are
+    written in one database transaction; Chroma metadata is then brought in
+    line with the database (any drift left by an earlier failed run is
+    repaired too), the new centroids replace the exported ones and the
+    cluster indexes and cached results are dropped. Other worker processes
+    notice the new clustering version on their next cluster assignment or
+    shortlist and drop their centroids and cluster indexes too.
+
+    With `centers` (e.g. a model from training/train.py) nothing is fitted:
+    jobs and applications are moved to the given centroids, which are then
+    installed the same way.
+
+    Args:
+        k: number of clusters, or None to choose one
+        k_min, k_max: candidate range when choosing k
+        sample_size: points in the silhouette estimate
+        batch_size, max_iter: mini-batch k-means settings
+        seed: random seed (sampling and k-means++)
+        dry_run: only fit and report, change nothing
+        centers: (k, dim) centroids to assign with instead of fitting
+
+    Returns:
+        dict: chosen k, silhouette scores, balance before and after, and
+        the number of jobs / applications / Chroma entries updated
+    """
+    from flask import current_app
+    from app import get_applications_collection, get_jobs_collection, get_kmeans_model
+    from app.models import Application, Job
+    from app.utils.result_cache import get_cache
+
+    started = time.perf_counter()
+    jobs_collection = get_jobs_collection()
+    if jobs_collection is None:
+        raise RuntimeError('Jobs collection unavailable')
+    job_ids, vectors, _ = stored_vectors(jobs_collection)
+    if len(job_ids) < 2:
+        raise ValueError('Need at least 2 embedded jobs to re-cluster')
+
+    if centers is not None:
+        centers = np.asarray(centers)
+        if centers.ndim != 2 or centers.shape[1] != vectors.shape[1] or len(centers) < 2:
+            raise ValueError(f'Centroids of shape {centers.shape} do not fit '
+                             f'{vectors.shape[1]}-dimensional job embeddings')
+        best_k = len(centers)
+        scores = {best_k: round(silhouette_estimate(vectors, assign(centers, vectors), sample_size, seed), 4)}
+    else:
+        current = get_kmeans_model()
+        init = np.asarray(getattr(current, 'centers', None)) if current is not None else None
+        candidates = [k] if k is not None else list(range(max(k_min, 2), min(k_max, len(job_ids) - 1) + 1))
+        if not candidates:
+            raise ValueError(f'No k to try for {len(job_ids)} jobs between {k_min} and {k_max}')
+        best_k, centers, scores = choose_k(
+            vectors, candidates, sample_size=sample_size, seed=seed, init=init,
+            batch_size=batch_size, max_iter=max_iter
+        )
+    labels = assign(centers, vectors)
+    assignments = dict(zip(job_ids, (int(label) for label in labels)))
+
+    report = {
+        'k': best_k,
+        'silhouette': scores,
+        'jobs_embedded': len(job_ids),
+        'before': cluster_report(),
+        'dry_run': dry_run,
+    }
+    if dry_run:
+        report['after'] = {'jobs': balance(labels, best_k)}
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        return report
+
+    # One transaction for both tables: readers see the old or the new
+    # clustering, never a mix
+    try:
+        current_ids = dict(db.session.query(Job.id, Job.cluster_id).all())
+        # Jobs added since the embeddings were read
+        late = [job_id for job_id in current_ids if job_id not in assignments]
+        if late:
+            late_ids, late_vectors, _ = stored_vectors_for(jobs_collection, late)
+            if late_ids:
+                assignments.update(zip(late_ids, (int(label) for label in assign(centers, late_vectors))))
+        changed = [
+            {'id': job_id, 'cluster_id': cluster_id} for job_id, cluster_id in assignments.items()
+            if job_id in current_ids and current_ids[job_id] != cluster_id
+        ]
+        _bulk_update(Job, changed)
+        applications_moved = _sync_application_clusters()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Applications written from a stale job row while we committed
+    applications_moved += _sync_application_clusters()
+    db.session.commit()
+
+    # New assignments go through the exported centroids from now on, in
+    # every worker once the version is bumped
+    save_centroids(centers, current_app.config['KMEANS_CENTROIDS_PATH'])
+    version = bump_clustering_version()
+    _drop_cluster_state(version)
+    get_cache().clear()
+
+    chroma_updates = {'jobs': 0, 'applications': 0}
+    job_clusters = dict(db.session.query(Job.id, Job.cluster_id).all())
+    chroma_updates['jobs'] = sync_metadata(jobs_collection, 'cluster_id', job_clusters, CHROMA_PAGE_SIZE)
+    applications_collection = get_applications_collection()
+    if applications_collection is not None:
+        application_clusters = dict(
+            db.session.query(Application.id, Application.cluster_id).filter(Application.status == 'ready').all()
+        )
+        chroma_updates['applications'] = sync_metadata(
+            applications_collection, 'cluster_id', application_clusters, CHROMA_PAGE_SIZE
+        )
+
+    report.update({
+        'after': cluster_report(),
+        'clustering_version': version,
+        'jobs_moved': len(changed),
+        # Jobs with no stored embedding keep their old cluster id
+        'jobs_not_embedded': sum(1 for job_id in current_ids if job_id not in assignments),
+        'applications_moved': applications_moved,
+        'chroma_updated': chroma_updates,
+        'seconds': round(time.perf_counter() - started, 3),
+    })
+    logger.info('Re-clustered %d jobs into %d clusters (%d jobs, %d applications moved)',
+                len(job_ids), best_k, len(changed), applications_moved)
+    return report
@@ -0,0 +1,70 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def normalize_database_uri(uri):
+    """
+    Pin PostgreSQL URIs without an explicit driver (including the legacy
+    postgres:// scheme still handed out by some hosts) to psycopg2, the
+    driver listed in requirements.txt.
+    """
+    for scheme in ('postgres://', 'postgresql://'):
+        if uri.startswith(scheme):
+            return 'postgresql+psycopg2://' + uri[len(scheme):]
+    return uri
+
+
+def engine_options(uri, config):
+    """
+    SQLAlchemy engine options for `uri` built from the DB_POOL_* settings.
+
+    Server databases get a bounded QueuePool with pre-ping and recycling so
+    idle connections dropped by the server are replaced. SQLite files get
+    the pool size only; in-memory SQLite is left to Flask-SQLAlchemy, which
+    shares one connection through a StaticPool.
+
+    Args:
+        uri: SQLALCHEMY_DATABASE_URI
+        config: app.config (or any mapping with the DB_POOL_* keys)
+
+    Returns:
+        dict: value for SQLALCHEMY_ENGINE_OPTIONS
+    """
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            return {}
+        return {
+            'pool_size': config.get('DB_POOL_SIZE', 5),
+            'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        }
+    return {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+    }
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """
+    Run `PRAGMA name=value` for each entry of `pragmas` on every new
+    connection the engine opens. Does nothing for other databases.
+
+    Args:
+        engine: SQLAlchemy engine (db.engine)
+        pragmas: dict such as Config.SQLITE_PRAGMAS
+    """
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
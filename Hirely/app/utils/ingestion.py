@@ -0,0 +1,400 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the first retry of a failed task; doubled for each attempt
+DEFAULT_RETRY_BACKOFF = 5.0
+
+
+def save_upload(file, upload_folder):
+    """
+    Persist a raw resume upload for the ingestion workers.
+
+    The bytes are streamed to disk and hashed on the way (see
+    app.utils.uploads), never buffered whole in memory or read back.
+
+    Returns:
+        tuple: (path, SHA-256 of the upload)
+    """
+    from app.utils.uploads import store_upload
+
+    ingest_dir = os.path.join(upload_folder, 'ingest')
+    os.makedirs(ingest_dir, exist_ok=True)
+    return store_upload(file, os.path.join(ingest_dir, f'{uuid.uuid4().hex}.pdf'))
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Content address of an upload: SHA-256 of its bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_blob(sha256):
+    """Already-extracted resume content for this upload hash, if any."""
+    from app.models import ResumeBlob
+
+    return db.session.get(ResumeBlob, sha256) if sha256 else None
+
+
+def attach_blob(application, blob):
+    """Point an application at shared resume content and mark it ready."""
+    application.resume_blob = blob
+    application.legacy_resume_text = ''
+    application.status = 'ready'
+
+
+def index_application(application):
+    """
+    Add a ready application to the BM25 index and the applications collection.
+
+    Term counts and the embedding come from the shared blob, so duplicate uploads
+    are never re-tokenized or re-encoded.
+    """
+    from app.utils.bm25_index import add_to_cluster_index
+    from app.utils.result_cache import cluster_tag, get_cache, user_tag
+    from app.utils.semantic import metadata
+    from app import get_model, get_applications_collection
+
+    model = get_model()
+    applications_collection = get_applications_collection()
+    blob = application.resume_blob
+    add_to_cluster_index(application.cluster_id, application.id, application.resume_terms())
+    # The applicant's matches now come from this (latest ready) resume, and
+    # shortlists of the cluster may include it
+    get_cache().invalidate(user_tag(application.user_id), cluster_tag(application.cluster_id))
+
+    if model is not None and applications_collection is not None:
+        vector = blob.vector
+        if vector is None:
+            vector = model.encode([blob.text])[0]
+            blob.vector = vector
+            db.session.commit()
+        applications_collection.add(
+            ids=[str(application.id)],
+            embeddings=[vector.tolist()],
+            metadatas=[metadata(
+                job_id=application.job_id,
+                cluster_id=application.cluster_id,
+                user_id=application.user_id
+            )]
+        )
+
+
+def enqueue(application, file_path, sha256=None):
+    """Queue a pending application for background ingestion (caller commits)."""
+    from app.models import IngestionTask
+
+    task = IngestionTask(application=application, file_path=file_path, sha256=sha256)
+    db.session.add(task)
+    return task
+
+
+def claim_task(task_id):
+    """
+    Atomically move a queued task to 'running'.
+
+    The conditional UPDATE is what makes the claim safe across threads and
+    worker processes sharing the same database.
+
+    Returns:
+        bool: True if this caller now owns the task
+    """
+    from app.models import IngestionTask
+
+    now = datetime.utcnow()
+    claimed = IngestionTask.query.filter_by(id=task_id, status='queued').update(
+        {'status': 'running', 'started_at': now, 'heartbeat_at': now,
+         'attempts': IngestionTask.attempts + 1},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return bool(claimed)
+
+
+def claim_next_task():
+    """
+    Claim the oldest queued task whose retry backoff has elapsed; returns its
+    id, or None if there is nothing to do yet.
+    """
+    from app.models import IngestionTask
+
+    candidate = db.session.query(IngestionTask.id).filter(
+        IngestionTask.status == 'queued',
+        or_(IngestionTask.available_at.is_(None), IngestionTask.available_at <= datetime.utcnow())
+    ).order_by(IngestionTask.id).first()
+    if candidate is None:
+        return None
+    return candidate.id if claim_task(candidate.id) else None
+
+
+def retry_delay(attempts, backoff=DEFAULT_RETRY_BACKOFF):
+    """Seconds to wait before retrying a task that failed `attempts` times."""
+    return backoff * 2 ** max(attempts - 1, 0)
+
+
+def _discard_upload(path):
+    """Remove a queued upload that is no longer needed."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def process_task(task_id, max_attempts=3, backoff=DEFAULT_RETRY_BACKOFF):
+    """
+    Run text extraction, tokenization and embedding for one claimed task.
+
+    Failures are retried until max_attempts, each after an exponentially
+    growing delay (see retry_delay), after which the application is marked
+    'failed'. The raw upload is removed once ingestion succeeds or fails
+    for good.
+    """
+    from flask import current_app
+    from app.models import IngestionTask, ResumeBlob
+    from app.utils.pdf_processor import extract_text_from_pdf
+    from app.utils.tokenizer import count_terms
+
+    task = db.session.get(IngestionTask, task_id)
+    application = task.application
+    try:
+        sha256 = task.sha256 or file_sha256(task.file_path)
+        blob = find_blob(sha256)
+        if blob is None:
+            resume_text = extract_text_from_pdf(
+                task.file_path,
+                max_pages=current_app.config.get('PDF_MAX_PAGES', 100),
+                timeout=current_app.config.get('PDF_TIMEOUT_SECONDS', 30.0)
+            )
+            blob = ResumeBlob(
+                sha256=sha256,
+                text=resume_text,
+                size_bytes=os.path.getsize(task.file_path)
+            )
+            blob.term_counts = count_terms(resume_text)
+            db.session.add(blob)
+
+        attach_blob(application, blob)
+        task.status = 'done'
+        task.error = None
+        task.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        # Includes losing a race to insert the same blob; the retry reuses it
+        db.session.rollback()
+        logger.warning('Ingestion of application %s failed: %s', task.application_id, e)
+        task.error = str(e)
+        failed = task.attempts >= max_attempts
+        if failed:
+            task.status = 'failed'
+            task.finished_at = datetime.utcnow()
+            application.status = 'failed'
+        else:
+            task.status = 'queued'
+            task.available_at = datetime.utcnow() + timedelta(seconds=retry_delay(task.attempts, backoff))
+        db.session.commit()
+        if failed:
+            _discard_upload(task.file_path)
+        return
+
+    # The application is committed as ready; indexing problems below are
+    # logged but never re-queue the task
+    try:
+        index_application(application)
+    except Exception as e:
+        logger.warning('Indexing of application %s failed: %s', application.id, e)
+
+    _discard_upload(task.file_path)
+
+
+def heartbeat(task_ids):
+    """Renew the lease of tasks this process is still running."""
+    from app.models import IngestionTask
+
+    if not task_ids:
+        return 0
+    renewed = IngestionTask.query.filter(
+        IngestionTask.id.in_(list(task_ids)), IngestionTask.status == 'running'
+    ).update({'heartbeat_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    return renewed
+
+
+def requeue_stale_tasks(stale_seconds, max_attempts=3, backoff=DEFAULT_RETRY_BACKOFF):
+    """
+    Hand tasks whose lease expired (their worker crashed or was killed) back
+    to the queue. Safe to run from any number of processes at once.
+
+    An expired lease counts as a failed attempt: a document that kills its
+    worker (out of memory, a crashing parser) is retried after the usual
+    backoff and marked 'failed', its upload removed, once it used up
+    max_attempts.
+
+    Returns:
+        int: number of expired tasks re-queued or failed
+    """
+    from app.models import Application, IngestionTask
+
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=stale_seconds)
+    lease = db.func.coalesce(IngestionTask.heartbeat_at, IngestionTask.started_at)
+    expired = db.session.query(
+        IngestionTask.id, IngestionTask.application_id, IngestionTask.attempts, IngestionTask.file_path
+    ).filter(IngestionTask.status == 'running', lease < cutoff).all()
+
+    requeued = []
+    failed = []
+    for task_id, application_id, attempts, file_path in expired:
+        error = f'Worker lost (no heartbeat for {stale_seconds}s)'
+        if attempts >= max_attempts:
+            values = {'status': 'failed', 'error': error, 'finished_at': now}
+        else:
+            values = {'status': 'queued', 'error': error,
+                      'available_at': now + timedelta(seconds=retry_delay(attempts, backoff))}
+        # Conditional, so only one monitor moves a given task
+        moved = IngestionTask.query.filter(
+            IngestionTask.id == task_id, IngestionTask.status == 'running', lease < cutoff
+        ).update(values, synchronize_session=False)
+        if not moved:
+            continue
+        if values['status'] == 'failed':
+            Application.query.filter_by(id=application_id).update(
+                {'status': 'failed'}, synchronize_session=False
+            )
+            failed.append(file_path)
+        else:
+            requeued.append(task_id)
+    db.session.commit()
+
+    for file_path in failed:
+        _discard_upload(file_path)
+    if requeued:
+        logger.warning('Re-queued %d stale ingestion task(s)', len(requeued))
+    if failed:
+        logger.warning('Failed %d stale ingestion task(s) after %d attempts', len(failed), max_attempts)
+    return len(requeued) + len(failed)
+
+
+class IngestionWorkerPool:
+    """
+    Daemon threads that drain the ingestion_tasks queue.
+
+    A monitor thread renews the lease (heartbeat_at) of the tasks running
+    here every stale_seconds / 3 and re-queues tasks whose lease expired, so
+    work lost by a crashed process is picked up without a restart.
+    """
+
+    def __init__(self, app, workers=2, poll_interval=1.0, max_attempts=3,
+                 stale_seconds=600, backoff=DEFAULT_RETRY_BACKOFF):
+        self.app = app
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.stale_seconds = stale_seconds
+        self.backoff = backoff
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._running = set()
+        self._running_lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'ingest-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        monitor = threading.Thread(target=self._monitor, name='ingest-monitor', daemon=True)
+        monitor.start()
+        self._threads.append(monitor)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def notify(self):
+        """Wake idle workers right away instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            task_id = None
+            with self.app.app_context():
+                try:
+                    task_id = claim_next_task()
+                    if task_id is not None:
+                        with self._running_lock:
+                            self._running.add(task_id)
+                        process_task(task_id, self.max_attempts, self.backoff)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning('Ingestion worker error: %s', e)
+                finally:
+                    with self._running_lock:
+                        self._running.discard(task_id)
+                    db.session.remove()
+            if task_id is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def maintain(self):
+        """One monitor pass: renew our leases, then re-queue expired ones."""
+        with self._running_lock:
+            running = set(self._running)
+        with self.app.app_context():
+            try:
+                heartbeat(running)
+                if requeue_stale_tasks(self.stale_seconds, self.max_attempts, self.backoff):
+                    self.notify()
+            except Exception as e:
+                db.session.rollback()
+                logger.warning('Ingestion monitor error: %s', e)
+            finally:
+                db.session.remove()
+
+    def _monitor(self):
+        interval = max(self.stale_seconds / 3, self.poll_interval)
+        while not self._stop.is_set():
+            self.maintain()
+            self._stop.wait(interval)
+
+
+# Set by start_ingestion_workers(); None when uploads are processed inline
+worker_pool = None
+
+
+def start_ingestion_workers(app):
+    """Start the worker pool configured by INGEST_WORKERS (called by create_app)."""
+    global worker_pool
+    workers = app.config.get('INGEST_WORKERS', 0)
+    if workers <= 0 or worker_pool is not None:
+        return worker_pool
+    if multiprocessing.parent_process() is not None:
+        # A spawned helper (e.g. a PDF extraction worker) re-importing the
+        # entry script: only the main process drains the queue
+        return None
+
+    # The pool's monitor re-queues stale tasks right away and then periodically
+    worker_pool = IngestionWorkerPool(
+        app,
+        workers=workers,
+        poll_interval=app.config.get('INGEST_POLL_INTERVAL', 1.0),
+        max_attempts=app.config.get('INGEST_MAX_ATTEMPTS', 3),
+        stale_seconds=app.config.get('INGEST_STALE_SECONDS', 600),
+        backoff=app.config.get('INGEST_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF),
+    )
+    worker_pool.start()
+    return worker_pool
@@ -0,0 +1,251 @@
+"""
+Request timing, hot-path spans and a Prometheus /metrics endpoint.
+
+init_app() (called by create_app) installs:
+  - per-request timing by endpoint, method and status
+  - a span around every SQL statement (engine events)
+  - spans around model encode, k-means predict and Chroma calls (the
+    registry wraps the loaded artifacts with timed())
+  - a span around JSON serialization of responses
+
+Code on the ranking paths adds its own spans with `with span('bm25.score'):`.
+Every span feeds the hirely_span_seconds histogram. Inside a request its
+time is also added to a per-request breakdown, which is returned in a
+Server-Timing header and logged for slow or failing requests.
+
+GET /metrics serves everything in the Prometheus text format, together
+with the gauges/counters of registered collectors (e.g. the result cache).
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+logger = logging.getLogger(__name__)
+
+# Prometheus' default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set (Prometheus semantics)."""
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}   # labels tuple -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-2] + [values[-1]]):
+                yield f'{self.name}_bucket', key + (('le', _format_value(float(bound))),), count
+            yield f'{self.name}_sum', key, values[-2]
+            yield f'{self.name}_count', key, values[-1]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        lines += [f'{name}{_format_labels(labels)} {_format_value(value)}'
+                  for name, labels, value in self.samples()]
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+REQUEST_SECONDS = Histogram('hirely_request_seconds', 'HTTP request latency by endpoint.')
+SPAN_SECONDS = Histogram('hirely_span_seconds', 'Time spent in instrumented hot-path spans.')
+
+# Callables returning [(name, type, help, [(labels dict, value), ...]), ...]
+_collectors = []
+
+
+def register_collector(collect):
+    """Add metrics computed at scrape time (gauges/counters kept elsewhere)."""
+    if collect not in _collectors:
+        _collectors.append(collect)
+
+
+def _record(name, seconds):
+    SPAN_SECONDS.observe(seconds, span=name)
+    if has_request_context():
+        spans = g.setdefault('spans', {})
+        spans[name] = spans.get(name, 0.0) + seconds
+
+
+@contextmanager
+def span(name):
+    """Time a block as span `name` (histogram + per-request breakdown)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - started)
+
+
+class _Timed:
+    """Proxy timing selected methods of a wrapped object as spans."""
+
+    def __init__(self, target, prefix, methods):
+        self._target = target
+        self._prefix = prefix
+        self._methods = frozenset(methods)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name not in self._methods or not callable(attr):
+            return attr
+        span_name = f'{self._prefix}.{name}'
+
+        def timed_call(*args, **kwargs):
+            with span(span_name):
+                return attr(*args, **kwargs)
+        return timed_call
+
+
+def timed(loader, prefix, methods):
+    """Wrap a registry loader so the artifact's `methods` are timed as spans."""
+    def load():
+        target = loader()
+        return None if target is None else _Timed(target, prefix, methods)
+    return load
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default JSON provider with serialization timed as the 'serialize' span."""
+
+    def dumps(self, obj, **kwargs):
+        with span('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
+# The start time lives on the statement's execution context, so a statement
+# that fails leaves nothing behind on the (pooled) connection
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._hirely_query_started = time.perf_counter()
+
+
+def _record_query(context):
+    started = getattr(context, '_hirely_query_started', None)
+    if started is not None:
+        del context._hirely_query_started
+        _record('db', time.perf_counter() - started)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_query(context)
+
+
+def _handle_error(exception_context):
+    # Failed statements count towards 'db' as well
+    _record_query(exception_context.execution_context)
+
+
+def instrument_engine(engine):
+    """Time every SQL statement executed on `engine` as the 'db' span."""
+    from sqlalchemy import event
+
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _handle_error)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    lines = REQUEST_SECONDS.render() + SPAN_SECONDS.render()
+    for collect in _collectors:
+        try:
+            metrics = collect()
+        except Exception as e:
+            logger.warning('Metrics collector %r failed: %s', collect, e)
+            continue
+        for name, metric_type, help_text, samples in metrics:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _server_timing(spans, total):
+    entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in spans.items()]
+    return ', '.join(entries + [f'total;dur={total * 1000:.2f}'])
+
+
+def init_app(app):
+    """Install request timing, engine/serialization spans and GET /metrics."""
+    from app import db
+
+    slow_seconds = app.config.get('SLOW_REQUEST_SECONDS', 1.0)
+    server_timing = app.config.get('SERVER_TIMING', True)
+
+    app.json = TimedJSONProvider(app)
+    with app.app_context():
+        instrument_engine(db.engine)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_SECONDS.observe(total, endpoint=endpoint, method=request.method,
+                                status=str(response.status_code))
+        spans = g.get('spans', {})
+        if server_timing:
+            response.headers['Server-Timing'] = _server_timing(spans, total)
+        # Routes turn exceptions into plain 500 responses; keep the timing
+        if response.status_code >= 500 or total >= slow_seconds:
+            logger.warning(
+                '%s %s -> %d in %.1fms (%s)', request.method, request.path, response.status_code,
+                total * 1000,
+                ', '.join(f'{name}={seconds * 1000:.1f}ms' for name, seconds in spans.items()) or 'no spans'
+            )
+        return response
+
+    if app.config.get('METRICS_ENABLED', True):
+        app.add_url_rule('/metrics', 'metrics', lambda: Response(render_metrics(), mimetype=PROMETHEUS_MIMETYPE))
@@ -0,0 +1,180 @@
+import csv
+import io
+import json
+import logging
+import time
+from itertools import islice
+
+from app import db
+from app.utils.bm25_index import add_job_to_index, job_document
+from app.utils.result_cache import JOBS_TAG, get_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 64
+
+# Upper bound for batch_size: one batch is encoded and held in memory at once
+MAX_BATCH_SIZE = 1024
+
+# Accepted column names, including the ones used by the training CSV
+ROLE_KEYS = ('role', 'Role')
+DESCRIPTION_KEYS = ('description', 'Description', 'job_description', 'Job_Description')
+
+
+def _first(record, keys):
+    for key in keys:
+        value = record.get(key)
+        if value:
+            return str(value).strip()
+    return None
+
+
+def read_records(stream, fmt):
+    """
+    Yield (line number, role, description, error) from a JSONL or CSV text
+    stream. Malformed rows carry an error message instead of stopping the
+    import.
+    """
+    if fmt == 'csv':
+        for line_no, record in enumerate(csv.DictReader(stream), start=2):
+            yield line_no, _first(record, ROLE_KEYS), _first(record, DESCRIPTION_KEYS), None
+        return
+
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, None, f'invalid JSON: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, None, 'expected a JSON object'
+            continue
+        yield line_no, _first(record, ROLE_KEYS), _first(record, DESCRIPTION_KEYS), None
+
+
+def detect_format(filename, content_type=None):
+    """'csv' or 'jsonl' from a file name or content type."""
+    name = (filename or '').lower()
+    if name.endswith('.csv') or (content_type or '').startswith('text/csv'):
+        return 'csv'
+    return 'jsonl'
+
+
+def text_stream(binary_stream):
+    """Decode an uploaded file lazily instead of reading it into memory."""
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+
+
+def import_jobs(records, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Insert jobs in batches: one encode call, one k-means predict, one SQL
+    transaction and one Chroma add per batch.
+
+    Batches committed before an error (e.g. undecodable input halfway
+    through the file) are kept, and the report says where the import
+    stopped. A failed Chroma add does not undo its committed batch: those
+    job ids are listed under 'vector_errors'.
+
+    Args:
+        records: iterable of (line number, role, description, error)
+        batch_size: rows per SentenceTransformer batch / transaction
+
+    Returns:
+        dict: counts, rejected rows and throughput; if the import stopped
+        early, also 'error' and 'last_line' (the last line handled)
+    """
+    from app import get_model, get_kmeans_model, get_jobs_collection
+    from app.models import Job
+
+    model, kmeans_model, jobs_collection = get_model(), get_kmeans_model(), get_jobs_collection()
+
+    imported = 0
+    batches = 0
+    rejected = []
+    vector_errors = []
+    last_line = None
+    error = None
+    started = time.perf_counter()
+    encode_seconds = 0.0
+
+    records = iter(records)
+    try:
+        while True:
+            chunk = list(islice(records, batch_size))
+            if not chunk:
+                break
+
+            valid = []
+            for line_no, role, description, row_error in chunk:
+                if row_error is None and not (role and description):
+                    row_error = 'missing role or description'
+                if row_error is None:
+                    valid.append((role, description))
+                else:
+                    rejected.append({'line': line_no, 'error': row_error})
+            if not valid:
+                last_line = chunk[-1][0]
+                continue
+
+            t0 = time.perf_counter()
+            vectors = model.encode(
+                [job_document(role, description) for role, description in valid],
+                batch_size=batch_size
+            )
+            encode_seconds += time.perf_counter() - t0
+            cluster_ids = [int(c) for c in kmeans_model.predict(vectors)]
+
+            jobs = []
+            terms = []
+            for (role, description), cluster_id in zip(valid, cluster_ids):
+                job = Job(role=role, description=description, cluster_id=cluster_id)
+                terms.append(job.count_text())
+                jobs.append(job)
+            db.session.add_all(jobs)
+            db.session.flush()
+            # Capture values before commit expires the instances
+            rows = [(job.id, job.role, job.description, job.cluster_id) for job in jobs]
+            db.session.commit()
+            imported += len(jobs)
+            batches += 1
+            last_line = chunk[-1][0]
+
+            # The batch is committed; a vector store failure is reported, not raised
+            try:
+                jobs_collection.add(
+                    ids=[str(job_id) for job_id, _, _, _ in rows],
+                    embeddings=vectors.tolist(),
+                    metadatas=[
+                        {"role": role, "cluster_id": cluster_id, "is_active": True}
+                        for _, role, _, cluster_id in rows
+                    ]
+                )
+            except Exception as e:
+                logger.warning('Chroma add failed for %d imported jobs: %s', len(rows), e)
+                vector_errors.append({'job_ids': [job_id for job_id, _, _, _ in rows], 'error': str(e)})
+            for (job_id, _, _, _), job_terms in zip(rows, terms):
+                add_job_to_index(job_id, job_terms)
+            get_cache().invalidate(JOBS_TAG)
+    except Exception as e:
+        # Undecodable input, a failed encode or insert: keep what was committed
+        db.session.rollback()
+        logger.warning('Job import stopped after line %s: %s', last_line, e)
+        error = str(e)
+
+    elapsed = time.perf_counter() - started
+    report = {
+        'imported': imported,
+        'rejected': rejected,
+        'vector_errors': vector_errors,
+        'batches': batches,
+        'batch_size': batch_size,
+        'seconds': round(elapsed, 3),
+        'encode_seconds': round(encode_seconds, 3),
+        'jobs_per_second': round(imported / elapsed, 1) if elapsed > 0 else None
+    }
+    if error is not None:
+        report.update(error=error, last_line=last_line)
+    return report
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds before a failed load is retried; doubled after each further
+# failure, up to MAX_RETRY_SECONDS
+RETRY_SECONDS = 30.0
+MAX_RETRY_SECONDS = 600.0
+
+
+class ModelRegistry:
+    """
+    Lazily loaded, process-wide ML artifacts.
+
+    Each artifact is registered with a zero-argument loader and built on the
+    first get(). Loading is guarded by a per-artifact lock so concurrent
+    requests never load the same model twice, while unrelated artifacts can
+    load in parallel. A failed load is remembered (and get() returns None) so
+    the app keeps serving endpoints that do not need the artifact, and is
+    retried by the first get() after a backoff (see RETRY_SECONDS);
+    warm_up() and reset() retry right away.
+    """
+
+    def __init__(self, retry_seconds=RETRY_SECONDS, max_retry_seconds=MAX_RETRY_SECONDS):
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._loaders = {}
+        self._values = {}
+        self._locks = {}
+        self._errors = {}
+        self._timings = {}
+        self._failures = {}     # name -> consecutive failed loads
+        self._retry_at = {}     # name -> time.monotonic() of the next attempt
+
+    def register(self, name, loader):
+        self._loaders[name] = loader
+        self._locks.setdefault(name, threading.Lock())
+        self._forget(name)
+
+    def _forget(self, name):
+        self._values.pop(name, None)
+        self._errors.pop(name, None)
+        self._timings.pop(name, None)
+        self._failures.pop(name, None)
+        self._retry_at.pop(name, None)
+
+    def loaded(self, name):
+        return name in self._values
+
+    def get(self, name):
+        if name in self._values:
+            return self._values[name]
+        if name not in self._loaders:
+            raise KeyError(f'No model registered as {name!r}')
+
+        with self._locks[name]:
+            if name in self._values:
+                return self._values[name]
+            if name in self._errors and time.monotonic() < self._retry_at[name]:
+                return None
+
+            started = time.perf_counter()
+            try:
+                value = self._loaders[name]()
+            except Exception as e:
+                failures = self._failures[name] = self._failures.get(name, 0) + 1
+                delay = min(self.retry_seconds * 2 ** (failures - 1), self.max_retry_seconds)
+                self._errors[name] = str(e)
+                self._retry_at[name] = time.monotonic() + delay
+                self._timings[name] = time.perf_counter() - started
+                logger.error('Loading %s failed (retry in %.0fs): %s', name, delay, e)
+                return None
+            self._timings[name] = time.perf_counter() - started
+            self._errors.pop(name, None)
+            self._failures.pop(name, None)
+            self._retry_at.pop(name, None)
+            self._values[name] = value
+            logger.info('Loaded %s in %.2fs', name, self._timings[name])
+            return value
+
+    def reset(self, name=None):
+        """Forget a loaded (or failed) artifact so the next get() reloads it."""
+        names = [name] if name else list(self._loaders)
+        for n in names:
+            with self._locks[n]:
+                self._forget(n)
+
+    def warm_up(self, names=None, background=False):
+        """
+        Load artifacts ahead of the first request, optionally in a thread.
+        Artifacts whose last load failed are retried without waiting for
+        their backoff.
+        """
+        names = list(names or self._loaders)
+
+        def _load_all():
+            for name in names:
+                if name in self._retry_at:
+                    with self._locks[name]:
+                        if name in self._retry_at:
+                            self._retry_at[name] = 0.0
+                self.get(name)
+
+        if background:
+            thread = threading.Thread(target=_load_all, name='model-warmup', daemon=True)
+            thread.start()
+            return thread
+        _load_all()
+        return None
+
+    def stats(self):
+        """Load state and timing (seconds) for every registered artifact."""
+        return {
+            name: {
+                'loaded': name in self._values,
+                'load_seconds': round(self._timings[name], 3) if name in self._timings else None,
+                'error': self._errors.get(name),
+                'failures': self._failures.get(name, 0)
+            }
+            for name in self._loaders
+        }
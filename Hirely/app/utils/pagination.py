@@ -0,0 +1,123 @@
+"""
+Keyset (cursor) pagination and NDJSON streaming for the listing endpoints.
+
+Pages are read with `WHERE id > :last_id ORDER BY id LIMIT n + 1` instead
+of OFFSET, so every page costs the same index range scan however deep the
+client has paged, and rows inserted meanwhile never shift a page. The
+cursor handed to the client is opaque (URL-safe base64 of the last id).
+
+With ?format=ndjson (or `Accept: application/x-ndjson`) the whole listing
+is streamed instead, one JSON object per line, read with yield_per so the
+database driver uses a server-side cursor where it has one and memory
+stays bounded by the batch size.
+"""
+import base64
+import binascii
+import json
+from urllib.parse import urlencode
+
+from flask import Response, request, stream_with_context
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Rows fetched per round trip while streaming
+STREAM_BATCH_SIZE = 500
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(json.dumps([last_id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Last id seen by the client; raises ValueError for a malformed cursor."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        last_id, = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise ValueError('Invalid cursor')
+    return last_id
+
+
+def page_args(default_limit=DEFAULT_PAGE_SIZE):
+    """
+    Read `limit` and `cursor` from the query string.
+
+    Returns:
+        tuple: (limit, last id or None)
+
+    Raises:
+        ValueError: for a limit that is not a positive integer or a malformed
+        cursor
+    """
+    limit = request.args.get('limit')
+    try:
+        limit = int(limit) if limit is not None else default_limit
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    cursor = request.args.get('cursor')
+    return min(limit, MAX_PAGE_SIZE), decode_cursor(cursor) if cursor else None
+
+
+def wants_ndjson():
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def keyset_page(query, id_column, limit, after=None):
+    """
+    One page of `query` in id order, starting after id `after`.
+
+    Returns:
+        tuple: (rows, cursor for the next page or None on the last page)
+    """
+    if after is not None:
+        query = query.filter(id_column > after)
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].id)
+
+
+def page_headers(next_cursor):
+    """`Link: <...>; rel="next"` and X-Next-Cursor for a paginated response."""
+    if next_cursor is None:
+        return {}
+    args = request.args.to_dict()
+    args['cursor'] = next_cursor
+    return {
+        'Link': f'<{request.base_url}?{urlencode(args)}>; rel="next"',
+        'X-Next-Cursor': next_cursor
+    }
+
+
+def ndjson_response(query, id_column, serialize, after=None, batch_size=STREAM_BATCH_SIZE):
+    """
+    Stream every row of `query` (after id `after`) as NDJSON.
+
+    The query runs while the response is being sent, inside the request
+    context, with yield_per(batch_size): only one batch of rows is held in
+    memory at a time.
+    """
+    if after is not None:
+        query = query.filter(id_column > after)
+    query = query.order_by(id_column).yield_per(batch_size)
+
+    def generate():
+        try:
+            for row in query:
+                yield json.dumps(serialize(row)) + '\n'
+        finally:
+            # The request's session may already have been removed by the
+            # time the body is sent; end the stream's transaction ourselves
+            query.session.close()
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
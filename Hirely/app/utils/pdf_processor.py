@@ -1,21 +1,261 @@
 import PyPDF2
-import io
+import mmap
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout, wait
 
-def extract_text_from_pdf(file):
+# Per-document budgets so a huge or malicious PDF cannot monopolize a worker
+MAX_PAGES = 100
+TIMEOUT_SECONDS = 30.0
+
+# Files up to this size are parsed in the calling process: a spawn round
+# trip costs more than extracting them, and their parse is bounded by their
+# size. Larger files are parsed (page count included) only inside the pool.
+INLINE_MAX_BYTES = 256 * 1024
+
+# Documents with at least this many pages are split into one page range per
+# parallel worker; smaller ones are extracted by the worker that counted them
+PARALLEL_MIN_PAGES = 16
+PARALLEL_WORKERS = min(4, os.cpu_count() or 1)
+
+# At least two pool workers so that one stuck document does not queue every
+# other one behind it
+POOL_WORKERS = max(PARALLEL_WORKERS, 2)
+
+# Spawned (not forked) workers: the app forks from a process running
+# ingestion threads and holding database connections
+_MP_CONTEXT = multiprocessing.get_context('spawn')
+
+# Seconds between checks while a retired pool waits for other documents
+REAP_POLL_SECONDS = 1.0
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class _ExtractionPool:
+    """The shared process pool, plus the futures still pending on it."""
+
+    def __init__(self):
+        self.executor = ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=_MP_CONTEXT)
+        self.pending = set()
+        self.abandoned = set()
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        future = self.executor.submit(fn, *args)
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self._settled)
+        return future
+
+    def _settled(self, future):
+        with self.lock:
+            self.pending.discard(future)
+            self.abandoned.discard(future)
+
+    def abandon(self, futures):
+        """
+        Give up on one document's futures after its budget ran out.
+
+        Queued ones are cancelled. If some are still running (a worker may be
+        stuck on a page), the pool is retired: new documents get a fresh one,
+        and its workers are killed once every other document's work on it has
+        finished, so other threads' extractions are never cut short.
+        """
+        for future in futures:
+            future.cancel()
+        with self.lock:
+            self.abandoned.update(future for future in futures if not future.done())
+            stuck = bool(self.abandoned)
+        if stuck:
+            _retire(self)
+
+    def reap(self):
+        while True:
+            with self.lock:
+                others = self.pending - self.abandoned
+            if not others:
+                break
+            wait(others, timeout=REAP_POLL_SECONDS)
+        processes = list((getattr(self.executor, '_processes', None) or {}).values())
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _ExtractionPool()
+        return _pool
+
+
+def _retire(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is not pool:
+            return
+        _pool = None
+    threading.Thread(target=pool.reap, name='pdf-pool-reaper', daemon=True).start()
+
+
+def _extract_pages(reader, start, stop, deadline):
+    texts = []
+    for number in range(start, stop):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"PDF text extraction exceeded its time budget at page {number + 1}")
+        texts.append(reader.pages[number].extract_text())
+    return texts
+
+
+@contextmanager
+def _mapped(path):
+    """
+    Read-only memory map of the file at path.
+
+    The parser reads the PDF through the map, so its bytes are served from
+    the OS page cache as needed instead of being copied into the process.
+    """
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def _page_count(reader, max_pages):
+    n_pages = len(reader.pages)
+    if n_pages > max_pages:
+        raise ValueError(f"PDF has {n_pages} pages; the limit is {max_pages}")
+    return n_pages
+
+
+def _extract_document(path, max_pages, split_pages, deadline_seconds):
+    """
+    Process-pool entry point: count the pages of the PDF at path and, unless
+    it has at least `split_pages` pages (None: never split), extract them.
+
+    Returns:
+        tuple: (page count, page texts or None if the document is to be split)
+    """
+    deadline = time.monotonic() + deadline_seconds
+    with _mapped(path) as stream:
+        reader = PyPDF2.PdfReader(stream)
+        n_pages = _page_count(reader, max_pages)
+        if split_pages is not None and n_pages >= split_pages:
+            return n_pages, None
+        return n_pages, _extract_pages(reader, 0, n_pages, deadline)
+
+
+def _extract_page_range(path, start, stop, deadline_seconds):
+    """Process-pool entry point: extract pages [start, stop) of the PDF at path."""
+    deadline = time.monotonic() + deadline_seconds
+    with _mapped(path) as stream:
+        return _extract_pages(PyPDF2.PdfReader(stream), start, stop, deadline)
+
+
+def _source_path(file):
+    """Filesystem path behind `file`, if the PDF already lives on disk."""
+    if isinstance(file, (str, os.PathLike)):
+        return os.fspath(file)
+    name = getattr(file, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    return None
+
+
+@contextmanager
+def _on_disk(file):
+    """Path of the PDF, spooling a stream that is not a file to a temporary one."""
+    path = _source_path(file)
+    if path is not None:
+        yield path
+        return
+    stream = getattr(file, 'stream', file)
+    stream.seek(0)
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            shutil.copyfileobj(stream, out)
+        yield path
+    finally:
+        os.remove(path)
+
+
+def extract_text_from_pdf(file, max_pages=MAX_PAGES, timeout=TIMEOUT_SECONDS,
+                          parallel_min_pages=PARALLEL_MIN_PAGES, inline_max_bytes=INLINE_MAX_BYTES):
     """
     Extract text from a PDF file
-    
+
+    The PDF is parsed on disk through a read-only memory map (a stream that
+    is not backed by a file is first spooled to a temporary one), never
+    copied into a bytes buffer, and page texts are joined once at the end.
+    Files of up to `inline_max_bytes` are extracted in this process, with
+    the deadline checked between pages. Larger ones are parsed only by the
+    spawned process pool, page count included, so the time budget holds
+    even when parsing or a single page never finishes: the caller stops
+    waiting at the deadline. Documents with at least `parallel_min_pages`
+    pages are split into page ranges across the pool.
+
     Args:
-        file: FileStorage object from Flask request
-    
+        file: FileStorage object from Flask request, open binary file or path
+        max_pages: reject documents with more pages than this
+        timeout: seconds allowed for the whole document
+        parallel_min_pages: page count from which the document is split
+        inline_max_bytes: largest file extracted without the pool
+
     Returns:
         str: Extracted text from the PDF
     """
     try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file.read()))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
+        deadline = time.monotonic() + timeout
+        with _on_disk(file) as path:
+            if os.path.getsize(path) <= inline_max_bytes:
+                with _mapped(path) as stream:
+                    reader = PyPDF2.PdfReader(stream)
+                    texts = _extract_pages(reader, 0, _page_count(reader, max_pages), deadline)
+            else:
+                texts = _extract_in_pool(path, max_pages, parallel_min_pages, deadline)
+
+        return ''.join(text + "\n" for text in texts)
     except Exception as e:
-        raise ValueError(f"Error processing PDF: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Error processing PDF: {str(e)}")
+
+
+def _collect(pool, futures, deadline):
+    """Results of `futures` in order; all of them are given up on at the deadline."""
+    try:
+        return [future.result(timeout=max(deadline - time.monotonic(), 0)) for future in futures]
+    except FuturesTimeout:
+        pool.abandon(futures)
+        raise TimeoutError("PDF text extraction exceeded its time budget")
+    except BaseException:
+        # A failed range: drop the rest of the document (running ranges stop
+        # at their own deadline)
+        for future in futures:
+            future.cancel()
+        raise
+
+
+def _extract_in_pool(path, max_pages, parallel_min_pages, deadline):
+    pool = _get_pool()
+    split_pages = parallel_min_pages if PARALLEL_WORKERS > 1 else None
+    [(n_pages, texts)] = _collect(pool, [
+        pool.submit(_extract_document, path, max_pages, split_pages, max(deadline - time.monotonic(), 0))
+    ], deadline)
+    if texts is not None:
+        return texts
+
+    # One range per worker: each range parses the document again
+    chunk = max(-(-n_pages // PARALLEL_WORKERS), 1)
+    futures = [
+        pool.submit(_extract_page_range, path, start, min(start + chunk, n_pages),
+                    max(deadline - time.monotonic(), 0))
+        for start in range(0, n_pages, chunk)
+    ]
+    return [text for texts in _collect(pool, futures, deadline) for text in texts]
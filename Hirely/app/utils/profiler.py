@@ -0,0 +1,133 @@
+"""
+Opt-in sampling profiler for individual requests.
+
+With PROFILE_REQUESTS > 0 (the fraction of requests to profile) a single
+daemon thread samples the Python stack of every request thread being
+profiled, every PROFILE_INTERVAL_MS, through sys._current_frames(). Nothing
+is traced or hooked, so an unprofiled request pays nothing and a profiled
+one only the sampling thread's GIL time.
+
+Each profiled request is written to PROFILE_DIR as a "folded stacks" file
+(`frame;frame;frame count` per line), the input format of flamegraph.pl and
+speedscope, and its file name is returned in the X-Profile header.
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import count
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def fold(frame):
+    """Root-first `a;b;c` rendering of a stack."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    """Samples the stacks of registered threads from one background thread."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._profiles = {}     # thread ident -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self, ident=None):
+        """Begin sampling thread `ident` (default: the calling thread)."""
+        ident = ident or threading.get_ident()
+        with self._lock:
+            self._profiles[ident] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, ident=None):
+        """Stop sampling `ident`; returns its Counter of folded stacks."""
+        ident = ident or threading.get_ident()
+        with self._lock:
+            return self._profiles.pop(ident, Counter())
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                idents = list(self._profiles)
+            if not idents:
+                # Idle until the next profiled request
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for ident in idents:
+                    frame = frames.get(ident)
+                    profile = self._profiles.get(ident)
+                    if frame is not None and profile is not None and ident != me:
+                        profile[fold(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+def write_folded(profile, path):
+    with open(path, 'w') as f:
+        for stack, samples in profile.most_common():
+            f.write(f'{stack} {samples}\n')
+
+
+def init_app(app):
+    """Profile a PROFILE_REQUESTS fraction of requests (no-op when 0)."""
+    rate = float(app.config.get('PROFILE_REQUESTS', 0) or 0)
+    if rate <= 0:
+        return None
+
+    directory = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    sampler = StackSampler(interval=app.config.get('PROFILE_INTERVAL_MS', 5) / 1000.0)
+    sequence = count(1)
+
+    @app.before_request
+    def start_profile():
+        if request.endpoint != 'metrics' and random.random() < rate:
+            g.profiling = True
+            sampler.start()
+
+    @app.after_request
+    def write_profile(response):
+        if not g.pop('profiling', False):
+            return response
+        profile = sampler.stop()
+        name = '{}-{}-{}-{}.folded'.format(
+            time.strftime('%Y%m%dT%H%M%S'), request.endpoint or 'unmatched', os.getpid(), next(sequence)
+        )
+        try:
+            write_folded(profile, os.path.join(directory, name))
+            response.headers['X-Profile'] = name
+        except OSError as e:
+            logger.warning('Could not write profile %s: %s', name, e)
+        return response
+
+    @app.teardown_request
+    def abandon_profile(exc):
+        # after_request is skipped for unhandled exceptions
+        if g.pop('profiling', False):
+            sampler.stop()
+
+    return sampler
@@ -0,0 +1,129 @@
+"""
+Column-projected reads for the ranking endpoints.
+
+Ranking only needs ids and token statistics (held by the BM25 indexes), and
+the responses only show a short preview of the resume / job description. The
+helpers here select exactly those columns, with the preview cut in SQL, so no
+ranked row is hydrated as an ORM entity or read as a whole Text column.
+"""
+from app import db
+from app.models import Application, Job, ResumeBlob, User
+from app.utils.bm25_index import resume_terms_columns, row_terms
+
+SHORTLIST_PREVIEW_CHARS = 200
+MATCH_PREVIEW_CHARS = 100
+
+
+def _preview_column(column, limit):
+    # One character past the limit tells us whether to add an ellipsis
+    return db.func.substr(column, 1, limit + 1)
+
+
+def _preview(text, limit):
+    text = text or ''
+    return text[:limit] + '...' if len(text) > limit else text
+
+
+def _resume_text_column():
+    return db.func.coalesce(ResumeBlob.text, Application.legacy_resume_text)
+
+
+class ShortlistRow:
+    """One shortlisted application: ids, applicant contact and resume preview."""
+    __slots__ = ('application_id', 'user_id', 'full_name', 'email', 'resume_preview')
+
+    def __init__(self, application_id, user_id, full_name, email, resume_preview):
+        self.application_id = application_id
+        self.user_id = user_id
+        self.full_name = full_name
+        self.email = email
+        self.resume_preview = resume_preview
+
+
+class JobMatchRow:
+    """One matched job: id, role and description preview."""
+    __slots__ = ('job_id', 'role', 'description_preview')
+
+    def __init__(self, job_id, role, description_preview):
+        self.job_id = job_id
+        self.role = role
+        self.description_preview = description_preview
+
+
+class ResumeQuery:
+    """The resume a matchmaking call ranks with: its id and BM25 term counts."""
+    __slots__ = ('application_id', 'terms')
+
+    def __init__(self, application_id, terms):
+        self.application_id = application_id
+        self.terms = terms
+
+    def text(self):
+        """Full resume text, fetched only when it has to be encoded."""
+        return db.session.query(_resume_text_column()).select_from(Application).outerjoin(
+            ResumeBlob, Application.resume_sha256 == ResumeBlob.sha256
+        ).filter(Application.id == self.application_id).scalar()
+
+
+def shortlist_rows(application_ids):
+    """
+    ShortlistRow for each id, keyed by application id (one query).
+
+    Args:
+        application_ids: ids of the final top-k applications
+
+    Returns:
+        dict: application id -> ShortlistRow
+    """
+    if not application_ids:
+        return {}
+    rows = db.session.query(
+        Application.id, Application.user_id,
+        User.last_name, User.first_name, User.middle_name, User.email,
+        _preview_column(_resume_text_column(), SHORTLIST_PREVIEW_CHARS)
+    ).join(User, Application.user_id == User.id).outerjoin(
+        ResumeBlob, Application.resume_sha256 == ResumeBlob.sha256
+    ).filter(Application.id.in_(application_ids))
+
+    return {
+        app_id: ShortlistRow(
+            app_id, user_id, User.format_full_name(last_name, first_name, middle_name),
+            email, _preview(preview, SHORTLIST_PREVIEW_CHARS)
+        )
+        for app_id, user_id, last_name, first_name, middle_name, email, preview in rows
+    }
+
+
+def job_match_rows(job_ids):
+    """JobMatchRow for each still-active id, keyed by job id (one query)."""
+    if not job_ids:
+        return {}
+    rows = db.session.query(
+        Job.id, Job.role, _preview_column(Job.description, MATCH_PREVIEW_CHARS)
+    ).filter(Job.id.in_(job_ids), Job.is_active == True)
+
+    return {
+        job_id: JobMatchRow(job_id, role, _preview(preview, MATCH_PREVIEW_CHARS))
+        for job_id, role, preview in rows
+    }
+
+
+def latest_resume_query(user_id):
+    """
+    ResumeQuery for the user's most recent ready application, or None.
+
+    Stored term counts are used as-is; the text is only selected (and
+    tokenized here) when no current counts were stored.
+    """
+    row = db.session.query(
+        Application.id, *resume_terms_columns()
+    ).outerjoin(
+        ResumeBlob, Application.resume_sha256 == ResumeBlob.sha256
+    ).filter(
+        Application.user_id == user_id, Application.status == 'ready'
+    ).order_by(Application.submission_date.desc()).first()
+
+    if row is None:
+        return None
+    application_id, counts_json, resume_text = row
+    return ResumeQuery(application_id, row_terms(counts_json, resume_text))
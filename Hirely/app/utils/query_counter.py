@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    """Records the SQL statements executed on an engine while active."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine):
+    """
+    Count SQL statements issued inside the block.
+
+        with count_queries(db.engine) as counter:
+            client.get('/api/shortlist/1')
+        assert counter.count <= 4
+    """
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter._before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter._before_cursor_execute)
+
+
+@contextmanager
+def assert_max_queries(engine, limit):
+    """Fail if the block issues more than `limit` SQL statements."""
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        listing = '\n'.join(f'  {i + 1}. {sql}' for i, sql in enumerate(counter.statements))
+        raise AssertionError(f'Expected at most {limit} queries, got {counter.count}:\n{listing}')
@@ -0,0 +1,146 @@
+import numpy as np
+from scipy import sparse
+
+from app.utils.instrumentation import span
+
+# Upper bound for the `k` request parameter of the ranking endpoints
+MAX_TOP_K = 100
+
+
+def bm25_idf(df, corpus_size, epsilon=0.25):
+    """
+    Vectorized BM25Okapi IDF for a document-frequency array.
+
+    Terms whose document frequency dropped to zero (all their documents were
+    removed) get an IDF of 0 and do not take part in the epsilon average, so
+    the result matches a BM25Okapi built over the live corpus.
+    """
+    df = np.asarray(df, dtype=float)
+    idf = np.zeros(len(df))
+    present = df > 0
+    if not present.any():
+        return idf
+    idf[present] = np.log(corpus_size - df[present] + 0.5) - np.log(df[present] + 0.5)
+    eps = epsilon * idf[present].mean()
+    idf[present & (idf < 0)] = eps
+    return idf
+
+
+def bm25_weights(tf_matrix, doc_len, k1=1.5, b=0.75):
+    """
+    Turn a CSR term-frequency matrix into per-(document, term) BM25 weights.
+
+    Only the stored non-zeros are touched, so this is O(nnz); the result
+    shares its index arrays with `tf_matrix`.
+    """
+    doc_len = np.asarray(doc_len, dtype=float)
+    avgdl = doc_len.mean() if len(doc_len) else 0.0
+    norm = k1 * (1 - b + b * doc_len / avgdl) if avgdl else np.full(len(doc_len), k1)
+    row_norm = np.repeat(norm, np.diff(tf_matrix.indptr))
+    tf = tf_matrix.data
+    return sparse.csr_matrix(
+        (tf * (k1 + 1) / (tf + row_norm), tf_matrix.indices, tf_matrix.indptr), shape=tf_matrix.shape
+    )
+
+
+def query_vector(term_ids, idf, counts=None):
+    """
+    Dense query vector: idf(term) times its number of occurrences.
+
+    `term_ids` may repeat a term, or list each term once with its number of
+    occurrences in `counts`.
+    """
+    counts = np.bincount(
+        np.asarray(term_ids, dtype=np.int64), weights=counts, minlength=len(idf)
+    )
+    return counts[:len(idf)] * idf
+
+
+def query_matrix(queries_term_ids, queries_counts, idf):
+    """
+    Sparse (queries x terms) matrix of query vectors, one row per query.
+
+    Row i holds idf(term) times the count of each term of query i, so
+    `weights @ query_matrix(...).T` scores every query in one product.
+    """
+    matrix = csr_from_rows(
+        [np.asarray(ids, dtype=np.int64) for ids in queries_term_ids],
+        [np.asarray(counts, dtype=float) for counts in queries_counts],
+        len(idf)
+    )
+    matrix.sum_duplicates()
+    return matrix.multiply(idf).tocsr()
+
+
+def csr_from_rows(row_term_ids, row_freqs, n_terms):
+    """Stack per-document (term ids, frequencies) arrays into a CSR matrix."""
+    indptr = np.zeros(len(row_term_ids) + 1, dtype=np.int64)
+    if row_term_ids:
+        np.cumsum([len(ids) for ids in row_term_ids], out=indptr[1:])
+        indices = np.concatenate(row_term_ids)
+        data = np.concatenate(row_freqs)
+    else:
+        indices = np.zeros(0, dtype=np.int32)
+        data = np.zeros(0)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(row_term_ids), n_terms))
+
+
+def top_k(scores, k):
+    """
+    Indices of the k highest scores, best first.
+
+    Uses np.argpartition so only the selected k entries are sorted.
+    """
+    scores = np.asarray(scores)
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, kind='stable')
+    selected = np.argpartition(-scores, k - 1)[:k]
+    return selected[np.argsort(-scores[selected], kind='stable')]
+
+
+def rank(index, query, k):
+    """
+    Score a BM25Index against a query (tokens or term counts) and return the
+    top k.
+
+    Returns:
+        list: (doc_id, score) pairs, best first
+    """
+    with index.lock, span('bm25.score'):
+        scores = index.get_scores(query)
+        return [(index.doc_ids[i], float(scores[i])) for i in top_k(scores, k)]
+
+
+def rank_many(index, queries, k):
+    """
+    rank() for several queries against the same index, scored together.
+
+    Returns:
+        list: one best-first list of (doc_id, score) pairs per query
+    """
+    with index.lock, span('bm25.score'):
+        scores = index.get_scores_many(queries)
+        return [
+            [(index.doc_ids[i], float(row[i])) for i in top_k(row, k)]
+            for row in scores
+        ]
+
+
+def reciprocal_rank_fusion(rankings, k, offset=60):
+    """
+    Fuse several best-first rankings with Reciprocal Rank Fusion.
+
+    Each ranking is a list of (doc_id, score); only the order is used, so
+    BM25 scores and cosine similarities can be combined without rescaling.
+
+    Returns:
+        list: top k (doc_id, fused score) pairs, best first
+    """
+    fused = {}
+    for ranking in rankings:
+        for position, (doc_id, _) in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (offset + position + 1)
+    return sorted(fused.items(), key=lambda item: (-item[1], item[0]))[:k]
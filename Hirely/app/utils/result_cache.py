@@ -0,0 +1,339 @@
+"""
+Cache of finished ranking responses (matchmaking and shortlists).
+
+Results are cached per input: matchmaking by the user's latest application,
+shortlists by job, each together with the signature of the BM25 index they
+were ranked from (see BM25Index.signature). A new or deactivated job, or a
+new ready application, changes that signature, so a stale entry can never
+be served, even to a worker process that did not see the write itself.
+
+On top of that, the routes that change the inputs (add_job, delete_job,
+apply_for_job and resume ingestion) drop the affected entries by tag, so
+dead results do not sit in the cache until they age out.
+
+Two tiers:
+  - an in-process LRU with a TTL (always on unless RESULT_CACHE_SIZE is 0)
+  - an optional SQLite file (RESULT_CACHE_PATH) shared by worker processes
+    and kept across restarts; its hits are promoted into the LRU
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Part of every key; bump when the cached response format changes so a
+# persistent tier written by an older release is never read back
+CACHE_FORMAT = 1
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL_SECONDS = 300
+
+# Expired rows of the persistent tier are deleted by a write at most this
+# often (reads skip them; stats and /metrics never write)
+PURGE_INTERVAL_SECONDS = 60
+
+
+def cache_key(*parts):
+    """Stable text key (also used as the persistent tier's primary key)."""
+    return json.dumps([CACHE_FORMAT, *parts], separators=(',', ':'))
+
+
+class SQLiteTier:
+    """Persistent second tier: key -> JSON value, expiry and tags in SQLite."""
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache_entries ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache_tags ('
+            'tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))'
+        )
+
+    def get(self, key, now):
+        row = self._conn.execute(
+            'SELECT value, expires_at FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            self.delete([key])
+            return None
+        tags = [tag for tag, in self._conn.execute(
+            'SELECT tag FROM cache_tags WHERE key = ?', (key,)
+        )]
+        return json.loads(row[0]), row[1], tags
+
+    def set(self, key, value, expires_at, tags):
+        with self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), expires_at)
+            )
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)',
+                [(tag, key) for tag in tags]
+            )
+
+    def delete(self, keys):
+        with self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            for key in keys:
+                self._conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+                self._conn.execute('DELETE FROM cache_tags WHERE key = ?', (key,))
+
+    def invalidate(self, tags):
+        placeholders = ', '.join('?' * len(tags))
+        with self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            removed = self._conn.execute(
+                f'DELETE FROM cache_entries WHERE key IN '
+                f'(SELECT key FROM cache_tags WHERE tag IN ({placeholders}))', tags
+            ).rowcount
+            self._conn.execute(
+                'DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache_entries)'
+            )
+        return removed
+
+    def purge_expired(self, now):
+        with self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (now,))
+            self._conn.execute(
+                'DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache_entries)'
+            )
+
+    def clear(self):
+        with self._conn:
+            self._conn.execute('BEGIN IMMEDIATE')
+            self._conn.execute('DELETE FROM cache_entries')
+            self._conn.execute('DELETE FROM cache_tags')
+
+    def size(self, now):
+        """Entries not expired at `now` (read-only)."""
+        return self._conn.execute(
+            'SELECT COUNT(*) FROM cache_entries WHERE expires_at > ?', (now,)
+        ).fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class ResultCache:
+    """
+    Thread-safe LRU with a TTL and tag-based invalidation, optionally backed
+    by a SQLiteTier. Values must be JSON-serializable when a persistent tier
+    is configured.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS, path=None,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persistent = SQLiteTier(path) if path else None
+        # The persistent tier outlives the process, so it expires on wall time
+        self._clock = clock
+        self._entries = OrderedDict()   # key -> (expires_at, value, tags)
+        self._tags = {}                 # tag -> set of keys
+        self._lock = threading.Lock()
+        self._next_purge = 0.0          # wall time of the next persistent purge
+        self._counters = dict.fromkeys(
+            ('hits', 'persistent_hits', 'misses', 'sets', 'evictions', 'expirations',
+             'invalidations', 'persistent_errors'), 0
+        )
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key):
+        """Cached value for `key`, or None on a miss."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return entry[1]
+                self._drop(key)
+                self._counters['expirations'] += 1
+
+            if self.persistent is not None:
+                try:
+                    found = self.persistent.get(key, time.time())
+                except sqlite3.Error as e:
+                    self._persistent_failed(e)
+                    found = None
+                if found is not None:
+                    value, expires_at, tags = found
+                    remaining = expires_at - time.time()
+                    self._store(key, value, self._clock() + remaining, tags)
+                    self._counters['persistent_hits'] += 1
+                    return value
+
+            self._counters['misses'] += 1
+            return None
+
+    def set(self, key, value, tags=()):
+        """Cache `value`; `tags` name the inputs whose change invalidates it."""
+        if not self.enabled:
+            return
+        tags = tuple(tags)
+        with self._lock:
+            self._store(key, value, self._clock() + self.ttl, tags)
+            self._counters['sets'] += 1
+            if self.persistent is not None:
+                now = time.time()
+                try:
+                    self.persistent.set(key, value, now + self.ttl, tags)
+                    if now >= self._next_purge:
+                        self._next_purge = now + PURGE_INTERVAL_SECONDS
+                        self.persistent.purge_expired(now)
+                except sqlite3.Error as e:
+                    self._persistent_failed(e)
+
+    def invalidate(self, *tags):
+        """
+        Drop every entry carrying one of `tags`, in both tiers.
+
+        Returns:
+            int: entries removed from the in-process tier
+        """
+        if not self.enabled or not tags:
+            return 0
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self._tags.get(tag, ()))
+            for key in keys:
+                self._drop(key)
+            self._counters['invalidations'] += len(keys)
+            if self.persistent is not None:
+                try:
+                    self.persistent.invalidate(list(tags))
+                except sqlite3.Error as e:
+                    self._persistent_failed(e)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            if self.persistent is not None:
+                try:
+                    self.persistent.clear()
+                except sqlite3.Error as e:
+                    self._persistent_failed(e)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Hit rate, sizes and event counters, for sizing the cache."""
+        with self._lock:
+            counters = dict(self._counters)
+            lookups = counters['hits'] + counters['persistent_hits'] + counters['misses']
+            stats = {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hit_rate': (counters['hits'] + counters['persistent_hits']) / lookups if lookups else 0.0,
+                **counters,
+                'persistent': None,
+            }
+            if self.persistent is not None:
+                try:
+                    size = self.persistent.size(time.time())
+                except sqlite3.Error as e:
+                    self._persistent_failed(e)
+                    size = None
+                stats['persistent'] = {'path': self.persistent.path, 'size': size}
+            return stats
+
+    def _store(self, key, value, expires_at, tags):
+        if key in self._entries:
+            tags = tuple(set(tags) | set(self._entries[key][2]))
+        self._entries[key] = (expires_at, value, tags)
+        self._entries.move_to_end(key)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self._counters['evictions'] += 1
+
+    def _drop(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _persistent_failed(self, error):
+        # The persistent tier is an optimization: a locked or broken file
+        # degrades to the in-process tier instead of failing the request
+        self._counters['persistent_errors'] += 1
+        logger.warning('Result cache persistent tier error: %s', error)
+
+
+# Replaced by configure() from create_app
+_cache = ResultCache()
+
+
+def configure(max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS, path=None):
+    """Install the process-wide result cache (called by create_app)."""
+    global _cache
+    previous = _cache
+    _cache = ResultCache(max_entries=max_entries, ttl=ttl, path=path)
+    if previous.persistent is not None:
+        previous.persistent.close()
+    return _cache
+
+
+def get_cache():
+    return _cache
+
+
+def metrics():
+    """Result cache counters and size, for /metrics."""
+    stats = _cache.stats()
+    counters = ('hits', 'persistent_hits', 'misses', 'evictions', 'expirations', 'invalidations')
+    return [
+        ('hirely_result_cache_entries', 'gauge', 'Entries in the in-process result cache.',
+         [({}, stats['size'])]),
+        ('hirely_result_cache_events_total', 'counter', 'Result cache lookups and removals by kind.',
+         [({'event': name}, stats[name]) for name in counters]),
+    ]
+
+
+# Tags name the inputs a cached result was computed from. Every matchmaking
+# result depends on the set of active jobs
+JOBS_TAG = 'jobs'
+
+
+def job_tag(job_id):
+    return f'job:{job_id}'
+
+
+def user_tag(user_id):
+    return f'user:{user_id}'
+
+
+def cluster_tag(cluster_id):
+    return f'cluster:{cluster_id}'
@@ -0,0 +1,52 @@
+import logging
+
+from sqlalchemy import inspect, text
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Columns added after the first release. db.create_all() only creates missing
+# tables, so databases created by an older version are patched in place.
+# (table, column, column DDL)
+ADDED_COLUMNS = [
+    ('applications', 'status', "VARCHAR(20) NOT NULL DEFAULT 'ready'"),
+    ('applications', 'resume_sha256', 'VARCHAR(64) REFERENCES resume_blobs (sha256)'),
+    ('ingestion_tasks', 'sha256', 'VARCHAR(64)'),
+    ('jobs', 'term_counts', 'TEXT'),
+    ('jobs', 'tokenizer', 'VARCHAR(32)'),
+    ('applications', 'term_counts', 'TEXT'),
+    ('applications', 'tokenizer', 'VARCHAR(32)'),
+    ('resume_blobs', 'term_counts', 'TEXT'),
+    ('resume_blobs', 'tokenizer', 'VARCHAR(32)'),
+    ('ingestion_tasks', 'heartbeat_at', 'TIMESTAMP'),
+    ('ingestion_tasks', 'available_at', 'TIMESTAMP'),
+    ('jobs', 'description_term_counts', 'TEXT'),
+]
+
+
+def upgrade_schema():
+    """
+    Add any missing columns from ADDED_COLUMNS, then any index declared on
+    the models (__table_args__) that an existing database does not have yet.
+    """
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    with db.engine.begin() as conn:
+        for table, column, ddl in ADDED_COLUMNS:
+            if table not in tables:
+                continue
+            existing = {col['name'] for col in inspector.get_columns(table)}
+            if column in existing:
+                continue
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+            logger.info('Added column %s.%s', table, column)
+        for table in db.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                index.create(conn)
+                logger.info('Created index %s', index.name)
@@ -0,0 +1,90 @@
+def nearest(collection, embedding, n_results, where=None):
+    """
+    Approximate nearest-neighbour lookup against a Chroma collection.
+
+    Embeddings come from all-MiniLM-L6-v2, which returns unit vectors, so the
+    squared L2 distance Chroma reports converts directly to cosine similarity.
+
+    Args:
+        collection: Chroma collection to search
+        embedding: 1-D vector (list or np.ndarray)
+        n_results: maximum number of neighbours
+        where: optional Chroma metadata filter
+
+    Returns:
+        list: (id as int, cosine similarity) pairs, most similar first
+    """
+    n_results = min(n_results, collection.count())
+    if n_results < 1:
+        return []
+
+    embedding = embedding.tolist() if hasattr(embedding, 'tolist') else list(embedding)
+    kwargs = {'query_embeddings': [embedding], 'n_results': n_results}
+    if where:
+        kwargs['where'] = where
+    result = collection.query(**kwargs)
+
+    ids = result['ids'][0]
+    distances = result['distances'][0]
+    return [(int(doc_id), 1.0 - float(dist) / 2.0) for doc_id, dist in zip(ids, distances)]
+
+
+def stored_embedding(collection, doc_id):
+    """Return the vector stored for doc_id in a Chroma collection, or None."""
+    result = collection.get(ids=[str(doc_id)], include=['embeddings'])
+    embeddings = result.get('embeddings')
+    if embeddings is None or len(embeddings) == 0:
+        return None
+    return embeddings[0]
+
+
+def collection_signature(collection):
+    """
+    Cache key part for rankings done by Chroma: changes when vectors are
+    added or deleted. Metadata changes (a deactivated job, a re-clustered
+    application) are covered by the result cache's invalidation tags.
+    """
+    return f'chroma:{collection.count()}'
+
+
+def metadata(**fields):
+    """Chroma metadata dict; Chroma rejects None values, so they are dropped."""
+    return {key: value for key, value in fields.items() if value is not None}
+
+
+def sync_metadata(collection, key, wanted, page_size=1000):
+    """
+    Set metadata `key` to `wanted[id]` wherever a Chroma collection disagrees.
+
+    Metadata is rewritten whole (other keys kept) so the result does not
+    depend on whether the Chroma version merges metadata on update(). A
+    None value removes the key; ids missing from the collection are skipped.
+
+    Args:
+        collection: Chroma collection to update
+        key: metadata key
+        wanted: mapping of int id -> value
+        page_size: ids read and written per Chroma call
+
+    Returns:
+        int: number of vectors whose metadata was rewritten
+    """
+    ids = [str(doc_id) for doc_id in wanted]
+    changed = 0
+    for start in range(0, len(ids), page_size):
+        page = collection.get(ids=ids[start:start + page_size], include=['metadatas'])
+        update_ids, update_metadatas = [], []
+        for doc_id, meta in zip(page.get('ids') or [], page.get('metadatas') or []):
+            value = wanted[int(doc_id)]
+            meta = dict(meta or {})
+            if meta.get(key) != value:
+                if value is None:
+                    meta.pop(key, None)
+                else:
+                    meta[key] = value
+                update_ids.append(doc_id)
+                update_metadatas.append(meta)
+        if update_ids:
+            collection.update(ids=update_ids, metadatas=update_metadatas)
+            changed += len(update_ids)
+    return changed
@@ -0,0 +1,107 @@
+"""
+Text normalization shared by every BM25 call site.
+
+Text is lowercased and split with one compiled pattern that keeps technical
+terms together (c++, c#, node.js, 3.5, e-commerce) and drops punctuation.
+English stopwords are removed and, when enabled with configure(), a light
+suffix stemmer folds plurals and -ing/-ed forms.
+
+Indexed documents store the output of count_terms() together with
+tokenizer_version(), so a change of settings is detected and the stored
+counts are rebuilt (see bm25_index.refresh_term_counts) instead of being
+mixed with counts from a different pipeline.
+"""
+import re
+from collections import Counter
+
+from app.utils.instrumentation import span
+
+# Bump when the pattern, stopwords or stemmer change: stored counts made by
+# an older pipeline are then recomputed
+PIPELINE_VERSION = 're1'
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[+#]+|(?:[.\-][a-z0-9]+)+)?")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been
+before being below between both but by can could did do does doing down during
+each etc few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just me more most my myself no
+nor not of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when
+where which while who whom why will with would you your yours yourself
+yourselves
+""".split())
+
+_stemming = False
+
+
+def configure(stemming=False):
+    """Switch stemming on or off for the whole process (called by create_app)."""
+    global _stemming
+    _stemming = bool(stemming)
+
+
+def tokenizer_version():
+    """Identifies the active pipeline; stored with every persisted term count."""
+    return PIPELINE_VERSION + ('+stem' if _stemming else '')
+
+
+def _short_cvc(token):
+    # consonant-vowel-consonant stems such as car(e) or cod(e)
+    vowels = 'aeiou'
+    return (len(token) == 3 and token[0] not in vowels and token[1] in vowels
+            and token[2] not in vowels + 'wxy')
+
+
+def stem(token):
+    """
+    Light English suffix stemmer (plurals, -ing, -ed, final e).
+
+    Tokens with digits or symbols, and short words, are kept as they are.
+    """
+    if not token.isalpha() or len(token) <= 3:
+        return token
+    if token.endswith('ies') and len(token) > 4:
+        token = token[:-3] + 'y'
+    elif token.endswith('sses'):
+        token = token[:-2]
+    elif token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        token = token[:-1]
+
+    for suffix in ('ing', 'ed'):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            if token[-1] == token[-2] and token[-1] not in 'lsz':
+                token = token[:-1]         # running -> run
+            elif _short_cvc(token):
+                token += 'e'               # caring -> care
+            break
+
+    if len(token) > 4 and token.endswith('e'):
+        token = token[:-1]                 # manage / managing -> manag
+    return token
+
+
+def tokenize(text):
+    """
+    Normalize `text` into BM25 tokens.
+
+    Args:
+        text: raw resume or job text (None is treated as empty)
+
+    Returns:
+        list: lowercased tokens without punctuation or stopwords
+    """
+    tokens = [t for t in TOKEN_PATTERN.findall((text or '').lower()) if t not in STOPWORDS]
+    if _stemming:
+        tokens = [stem(t) for t in tokens]
+    return tokens
+
+
+def count_terms(text):
+    """Term -> occurrence count for `text`; the form persisted per document."""
+    with span('tokenize'):
+        return dict(Counter(tokenize(text)))
+
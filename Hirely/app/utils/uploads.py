@@ -0,0 +1,103 @@
+"""
+Bounded-memory handling of uploaded files.
+
+UploadRequest (installed as the app's request_class) makes the multipart
+parser write every uploaded file straight to a staging file next to
+UPLOAD_FOLDER, in the parser's chunks, updating a SHA-256 digest as the
+bytes arrive. Nothing is spooled in memory first, whatever the file size.
+
+store_upload() then moves the staged file to its final name (a rename on
+the same filesystem, no copy) and returns the digest computed on the way
+in, so the upload is never read back just to hash it. Staged files that no
+route claims are deleted when the request is closed.
+"""
+import hashlib
+import os
+import tempfile
+
+from flask import Request, current_app
+
+# Copy buffer for uploads that did not come through UploadRequest
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+STAGING_DIR = 'incoming'
+
+
+class HashingUploadFile:
+    """
+    Writable staging file that hashes what is written to it.
+
+    Werkzeug writes the upload sequentially and then rewinds it for reading,
+    so the digest covers exactly the received bytes.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.name = tempfile.mkstemp(suffix='.part', dir=directory)
+        self._file = os.fdopen(fd, 'w+b')
+        self._digest = hashlib.sha256()
+        self.size = 0
+        self.claimed = False
+
+    def write(self, data):
+        self._digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    def claim(self, destination):
+        """Move the staged bytes to `destination`; returns (path, sha256)."""
+        self._file.close()
+        os.replace(self.name, destination)
+        self.claimed = True
+        return destination, self.sha256
+
+    def close(self):
+        self._file.close()
+        if not self.claimed:
+            try:
+                os.remove(self.name)
+            except OSError:
+                pass
+
+    def __getattr__(self, name):
+        # read, readline, seek, tell, ... of the underlying file
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """Request whose file uploads are staged on disk by HashingUploadFile."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return HashingUploadFile(os.path.join(current_app.config['UPLOAD_FOLDER'], STAGING_DIR))
+
+
+def store_upload(file, destination):
+    """
+    Persist an uploaded file at `destination` and return its SHA-256.
+
+    Files staged by UploadRequest are renamed into place. Anything else (a
+    FileStorage over another stream) is copied in UPLOAD_CHUNK_SIZE pieces
+    and hashed while it is written, so memory stays bounded either way.
+
+    Args:
+        file: FileStorage from request.files
+        destination: path of the stored file
+
+    Returns:
+        tuple: (path, hex SHA-256 of the bytes)
+    """
+    stream = file.stream
+    if isinstance(stream, HashingUploadFile) and not stream.claimed:
+        return stream.claim(destination)
+
+    digest = hashlib.sha256()
+    with open(destination, 'wb') as out:
+        for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            out.write(chunk)
+    return destination, digest.hexdigest()
@@ -0,0 +1 @@
+"""Benchmark harness (see benchmarks.bench)."""
@@ -0,0 +1,439 @@
+"""
+Benchmark harness for the ranking, ingestion and startup hot paths.
+
+Seeds a synthetic corpus (see benchmarks.synthetic) into a scratch database,
+then drives the endpoints through the Flask test client and the underlying
+functions directly, reporting p50/p95/p99 latency, throughput and peak RSS
+per benchmark. Results are written as JSON so runs can be compared:
+
+    python -m benchmarks.bench run --scale 10000 --output before.json
+    ... change something ...
+    python -m benchmarks.bench run --scale 10000 --output after.json
+    python -m benchmarks.bench compare before.json after.json
+
+Run from the Hirely directory. The ML models are not loaded: every
+benchmark uses the BM25 paths, so timings do not depend on a GPU or on
+downloaded artifacts. The result cache is off unless --cache is given, so
+repeated requests measure ranking rather than cache hits. With --workdir
+the seeded SQLite file is kept and reused by later runs of the same scale
+and seed (seeding 1M applications takes a while).
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+PROJECT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.synthetic import Corpus, resume_pdf, seed_database  # noqa: E402
+
+BENCHMARKS = ('startup', 'index_build', 'shortlist', 'shortlist_batch', 'matchmaking',
+              'jobs_page', 'extract_pdf', 'ingest')
+
+MODEL_NAMES = ('sentence_model', 'kmeans_model', 'chroma_client',
+               'jobs_collection', 'applications_collection')
+
+# Jobs per /api/shortlist/batch request
+BATCH_JOBS = 25
+
+# Distinct logged-in clients cycled through by the per-user benchmarks
+CLIENTS = 50
+
+RESULT_FORMAT = 1
+
+
+def current_rss():
+    """Resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # No procfs: fall back to the high-water mark (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PeakRSS:
+    """Samples the process RSS in a background thread while active."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.baseline = self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.baseline = self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def summarize(latencies, wall_seconds, rss, errors=0):
+    """Latency percentiles (ms), throughput and memory for one benchmark."""
+    ms = np.asarray(latencies, dtype=float) * 1000
+    return {
+        'iterations': len(ms),
+        'errors': errors,
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'mean_ms': float(ms.mean()),
+        'max_ms': float(ms.max()),
+        'throughput_per_s': len(ms) / wall_seconds if wall_seconds else 0.0,
+        'rss_peak_mb': rss.peak / 2 ** 20,
+        'rss_growth_mb': (rss.peak - rss.baseline) / 2 ** 20,
+    }
+
+
+def measure(call, iterations, warmup=0):
+    """
+    Time `call(i)` for i in range(iterations) after `warmup` untimed calls.
+
+    `call` returns an HTTP status code (>= 400 counts as an error) or None.
+    """
+    for i in range(warmup):
+        call(i)
+    latencies, errors = [], 0
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        for i in range(iterations):
+            t0 = time.perf_counter()
+            status = call(i)
+            latencies.append(time.perf_counter() - t0)
+            if status is not None and status >= 400:
+                errors += 1
+        wall = time.perf_counter() - started
+    return summarize(latencies, wall, rss, errors)
+
+
+@contextmanager
+def bench_app(database_uri, upload_folder, cache_size=0):
+    """create_app() on the benchmark database, ML models stubbed out."""
+    from instance.config import Config
+    from app.utils.bm25_index import reset_indexes
+
+    overrides = {
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'INGEST_WORKERS': 0,
+        'MODEL_WARMUP': '',
+        'RESULT_CACHE_SIZE': cache_size,
+        'RESULT_CACHE_PATH': None,
+    }
+    saved = {name: getattr(Config, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(Config, name, value)
+    try:
+        from app import create_app, db, registry
+        reset_indexes()
+        app = create_app()
+        app.config.update(UPLOAD_FOLDER=upload_folder)
+        for name in MODEL_NAMES:
+            registry.register(name, lambda: None)
+        try:
+            yield app
+        finally:
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+    finally:
+        for name, value in saved.items():
+            setattr(Config, name, value)
+        reset_indexes()
+
+
+def _logged_in(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    return client
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _prepare_database(args, database_uri, workdir, log):
+    """Seed the database, or reuse a matching seeded one from --workdir."""
+    from app import db
+
+    seed_meta = {'scale': args.scale, 'seed': args.seed, 'clusters': args.clusters}
+    meta_path = os.path.join(workdir, 'seed.json')
+    if args.database_url is None and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            stored = json.load(f)
+        if stored['params'] == seed_meta:
+            log(f"Reusing seeded database in {workdir}")
+            return stored['dataset']
+
+    with bench_app(database_uri, workdir) as app:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            started = time.perf_counter()
+            dataset = seed_database(
+                args.scale, clusters=args.clusters, seed=args.seed,
+                progress=lambda done, total: log(f'  seeded {done}/{total} applications')
+            )
+            log(f"Seeded {args.scale} applications in {time.perf_counter() - started:.1f}s")
+    if args.database_url is None:
+        with open(meta_path, 'w') as f:
+            json.dump({'params': seed_meta, 'dataset': dataset}, f)
+    return dataset
+
+
+def _remove_applications_after(application_id):
+    """Drop what the ingest benchmark added, so a reused database stays as seeded."""
+    from app import db
+    from app.models import Application, IngestionTask, ResumeBlob
+
+    added = db.session.query(Application.id).filter(Application.id > application_id)
+    blobs = db.session.query(Application.resume_sha256).filter(
+        Application.id > application_id, Application.resume_sha256.isnot(None)
+    )
+    IngestionTask.query.filter(IngestionTask.application_id.in_(added)).delete(synchronize_session=False)
+    blob_ids = [row.resume_sha256 for row in blobs]
+    Application.query.filter(Application.id > application_id).delete(synchronize_session=False)
+    if blob_ids:
+        ResumeBlob.query.filter(ResumeBlob.sha256.in_(blob_ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def run(args, log=print):
+    """Run the selected benchmarks and return the JSON-ready report."""
+    from app import db
+    from app.models import Application
+    from app.utils.bm25_index import get_cluster_index, get_job_index, reset_indexes
+    from app.utils.pdf_processor import extract_text_from_pdf
+
+    selected = args.benchmarks or list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='hirely-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    database_uri = args.database_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    dataset = _prepare_database(args, database_uri, workdir, log)
+
+    rng = random.Random(args.seed)
+    job_ids, user_ids = dataset['job_ids'], dataset['user_ids']
+    results = {}
+
+    if 'startup' in selected:
+        log('startup')
+        runs = max(args.iterations // 50, 3)
+
+        def start(_):
+            with bench_app(database_uri, workdir):
+                pass
+        results['startup'] = measure(start, runs)
+
+    with bench_app(database_uri, workdir, cache_size=args.cache) as app:
+        with app.app_context():
+            clusters = [row.cluster_id for row in db.session.query(Application.cluster_id).distinct()]
+
+        if 'index_build' in selected:
+            log('index_build')
+
+            def build(_):
+                reset_indexes()
+                with app.app_context():
+                    for cluster_id in clusters:
+                        get_cluster_index(cluster_id)
+                    get_job_index()
+            results['index_build'] = measure(build, max(args.iterations // 50, 3))
+
+        # Warm indexes for the request benchmarks
+        with app.app_context():
+            for cluster_id in clusters:
+                get_cluster_index(cluster_id)
+            get_job_index()
+
+        admin = _logged_in(app, dataset['admin_id'])
+        users = [_logged_in(app, user_id) for user_id in rng.sample(user_ids, min(CLIENTS, len(user_ids)))]
+        picks = [rng.choice(job_ids) for _ in range(args.iterations)]
+
+        if 'shortlist' in selected:
+            log('shortlist')
+            results['shortlist'] = measure(
+                lambda i: admin.get(f'/api/shortlist/{picks[i]}?k={args.k}').status_code,
+                args.iterations, args.warmup
+            )
+
+        if 'shortlist_batch' in selected:
+            log('shortlist_batch')
+            batches = [rng.sample(job_ids, min(BATCH_JOBS, len(job_ids)))
+                       for _ in range(max(args.iterations // 10, 5))]
+            results['shortlist_batch'] = measure(
+                lambda i: admin.post('/api/shortlist/batch',
+                                     json={'job_ids': batches[i], 'k': args.k}).status_code,
+                len(batches), min(args.warmup, len(batches))
+            )
+            results['shortlist_batch']['jobs_per_request'] = len(batches[0])
+
+        if 'matchmaking' in selected:
+            log('matchmaking')
+            results['matchmaking'] = measure(
+                lambda i: users[i % len(users)].get(f'/api/matchmaking/?k={args.k}').status_code,
+                args.iterations, args.warmup
+            )
+
+        if 'jobs_page' in selected:
+            log('jobs_page')
+            client = app.test_client()
+            results['jobs_page'] = measure(
+                lambda i: client.get('/api/jobs/?limit=100').status_code,
+                args.iterations, args.warmup
+            )
+
+        corpus = Corpus(args.seed + 1)
+        if 'extract_pdf' in selected:
+            log('extract_pdf')
+            pdf_path = os.path.join(workdir, 'bench-resume.pdf')
+            with open(pdf_path, 'wb') as f:
+                f.write(resume_pdf(corpus, pages=args.pdf_pages))
+            results['extract_pdf'] = measure(
+                lambda i: extract_text_from_pdf(pdf_path, max_pages=max(args.pdf_pages, 100)) and None,
+                max(args.iterations // 5, 5), 1
+            )
+            results['extract_pdf']['pages'] = args.pdf_pages
+
+        if 'ingest' in selected:
+            # Last: it adds applications (removed again afterwards)
+            log('ingest')
+            ingest_runs = max(args.iterations // 10, 5)
+            pdfs = [resume_pdf(corpus, pages=args.pdf_pages) for _ in range(ingest_runs)]
+
+            def apply(i):
+                return users[i % len(users)].post('/api/applications/', data={
+                    'job_id': str(picks[i % len(picks)]),
+                    'resume': (io.BytesIO(pdfs[i]), 'resume.pdf')
+                }, content_type='multipart/form-data').status_code
+            with app.app_context():
+                last_seeded = db.session.query(db.func.max(Application.id)).scalar()
+            results['ingest'] = measure(apply, ingest_runs)
+            with app.app_context():
+                _remove_applications_after(last_seeded)
+
+    return {
+        'format': RESULT_FORMAT,
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': 'sqlite' if args.database_url is None else args.database_url.split(':', 1)[0],
+            'scale': args.scale,
+            'jobs': dataset['jobs'],
+            'users': dataset['users'],
+            'clusters': args.clusters,
+            'seed': args.seed,
+            'iterations': args.iterations,
+            'k': args.k,
+            'cache': args.cache,
+        },
+        'results': results,
+    }
+
+
+COMPARED_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_per_s', 'rss_peak_mb')
+
+
+def compare(before, after):
+    """
+    Rows of (benchmark, metric, before, after, change %) for benchmarks
+    present in both reports.
+    """
+    rows = []
+    for name, old in before['results'].items():
+        new = after['results'].get(name)
+        if new is None:
+            continue
+        for metric in COMPARED_METRICS:
+            change = (new[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            rows.append((name, metric, old[metric], new[metric], change))
+    return rows
+
+
+def _print_report(report):
+    print(f"{'benchmark':<16}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'peak MB':>10}")
+    for name, stats in report['results'].items():
+        print(f"{name:<16}{stats['iterations']:>6}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+              f"{stats['p99_ms']:>10.2f}{stats['throughput_per_s']:>10.1f}{stats['rss_peak_mb']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench', description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='seed a corpus and run benchmarks')
+    run_parser.add_argument('--scale', type=int, default=1000, help='number of applications (1k to 1M)')
+    run_parser.add_argument('--clusters', type=int, default=20)
+    run_parser.add_argument('--iterations', type=int, default=200, help='requests per endpoint benchmark')
+    run_parser.add_argument('--warmup', type=int, default=10)
+    run_parser.add_argument('--k', type=int, default=10)
+    run_parser.add_argument('--pdf-pages', type=int, default=2)
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--cache', type=int, default=0,
+                            help='RESULT_CACHE_SIZE during the run (0 measures uncached ranking)')
+    run_parser.add_argument('--benchmarks', nargs='+', metavar='NAME',
+                            help=f"subset of: {', '.join(BENCHMARKS)}")
+    run_parser.add_argument('--workdir', help='keep (and reuse) the seeded database here')
+    run_parser.add_argument('--database-url',
+                            help='benchmark another database instead (its tables are dropped and re-seeded)')
+    run_parser.add_argument('--output', help='write the JSON report here')
+
+    compare_parser = commands.add_parser('compare', help='compare two JSON reports')
+    compare_parser.add_argument('before')
+    compare_parser.add_argument('after')
+
+    args = parser.parse_args(argv)
+    if args.command == 'compare':
+        with open(args.before) as f:
+            before = json.load(f)
+        with open(args.after) as f:
+            after = json.load(f)
+        print(f"{'benchmark':<16}{'metric':<18}{'before':>12}{'after':>12}{'change':>10}")
+        for name, metric, old, new, change in compare(before, after):
+            print(f"{name:<16}{metric:<18}{old:>12.2f}{new:>12.2f}{change:>+9.1f}%")
+        return 0
+
+    report = run(args, log=lambda message: print(message, file=sys.stderr))
+    _print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
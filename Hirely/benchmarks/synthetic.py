@@ -0,0 +1,182 @@
+"""
+Synthetic jobs, resumes and PDFs for the benchmarks.
+
+Texts are drawn from a fixed technical vocabulary plus a long tail of
+generated words with Zipf-like frequencies, so BM25 sees a realistic mix of
+common and rare terms. Everything is driven by a seeded random.Random: the
+same seed and scale always produce the same corpus.
+"""
+import json
+import random
+from datetime import datetime
+
+from app import db
+from app.models import Application, Job, User
+from app.utils.tokenizer import count_terms, tokenizer_version
+
+SKILLS = (
+    "python java javascript typescript c++ c# go rust sql postgresql mysql sqlite "
+    "flask django react node.js docker kubernetes aws azure gcp terraform linux git "
+    "machine learning data analysis pandas numpy excel tableau figma photoshop "
+    "nursing patient care pharmacy accounting finance audit payroll sales marketing "
+    "seo e-commerce logistics warehouse forklift teaching curriculum customer service"
+).split()
+
+ROLES = (
+    "Backend Engineer", "Frontend Developer", "Data Analyst", "Data Scientist",
+    "DevOps Engineer", "Registered Nurse", "Pharmacist", "Accountant", "Sales Associate",
+    "Marketing Specialist", "Warehouse Associate", "Teacher", "Customer Service Representative",
+)
+
+FILLER = (
+    "experienced team player responsible for delivering projects with strong "
+    "communication skills and attention to detail in fast paced environments"
+).split()
+
+# Generated long-tail vocabulary (rare terms make IDF matter)
+TAIL_WORDS = 5000
+
+# Rows per INSERT batch while seeding
+SEED_BATCH_SIZE = 5000
+
+
+class Corpus:
+    """Seeded text generator for job descriptions and resumes."""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.tail = [f'term{i}' for i in range(TAIL_WORDS)]
+        # Zipf-like weights: the i-th tail word is ~1/(i+1) as frequent
+        self.tail_weights = [1.0 / (i + 1) for i in range(TAIL_WORDS)]
+
+    def _words(self, n_skills, n_tail, n_filler):
+        rng = self.rng
+        words = rng.choices(SKILLS, k=n_skills)
+        words += rng.choices(self.tail, weights=self.tail_weights, k=n_tail)
+        words += rng.choices(FILLER, k=n_filler)
+        rng.shuffle(words)
+        return ' '.join(words)
+
+    def job(self):
+        """(role, description)"""
+        return self.rng.choice(ROLES), self._words(12, 20, 25)
+
+    def resume(self, words=250):
+        return self._words(words // 6, words // 3, words // 2)
+
+
+def make_pdf(pages):
+    """
+    Minimal multi-page PDF; `pages` is a list of page texts (lines split on \\n).
+    """
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None,
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for text in pages:
+        lines = ' '.join(
+            "(%s) '" % line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            for line in text.split('\n')
+        )
+        content = f'BT /F1 10 Tf 40 760 Td 12 TL {lines} ET'.encode()
+        objects.append(b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+        content_ref = len(objects)
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R '
+            b'/Resources << /Font << /F1 3 0 R >> >> >>' % content_ref
+        )
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids))
+
+    out = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return out
+
+
+def resume_pdf(corpus, pages=2, lines_per_page=40):
+    """A resume PDF of `pages` pages of generated text."""
+    return make_pdf([
+        '\n'.join(corpus.resume(words=12) for _ in range(lines_per_page))
+        for _ in range(pages)
+    ])
+
+
+def _insert(table, rows):
+    for start in range(0, len(rows), SEED_BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + SEED_BATCH_SIZE])
+
+
+def seed_database(scale, clusters=20, seed=0, progress=None):
+    """
+    Fill the current app's database with `scale` applications.
+
+    There are scale // 10 jobs (at least 10) and scale // 2 applicants (at
+    least 10) plus one admin. Rows go in through batched Core INSERTs with
+    term counts precomputed, like the routes would store them.
+
+    Returns:
+        dict: admin_id, user_ids, job_ids and the row counts
+    """
+    corpus = Corpus(seed)
+    rng = corpus.rng
+    version = tokenizer_version()
+    now = datetime.utcnow()
+    n_jobs, n_users = max(scale // 10, 10), max(scale // 2, 10)
+
+    _insert(User.__table__, [{
+        'last_name': 'Admin', 'first_name': 'Bench', 'email': 'admin@bench.local',
+        'password_hash': 'unused', 'is_admin': True, 'created_at': now
+    }] + [{
+        'last_name': f'User{i}', 'first_name': 'Bench', 'email': f'user{i}@bench.local',
+        'password_hash': 'unused', 'is_admin': False, 'created_at': now
+    } for i in range(n_users)])
+
+    jobs = []
+    for i in range(n_jobs):
+        role, description = corpus.job()
+        jobs.append({
+            'role': role, 'description': description, 'cluster_id': i % clusters,
+            'is_active': True, 'created_at': now,
+            'term_counts': json.dumps(count_terms(f'{role} {description}'), separators=(',', ':')),
+            'tokenizer': version,
+        })
+    _insert(Job.__table__, jobs)
+    db.session.commit()
+
+    admin_id = db.session.query(User.id).filter_by(email='admin@bench.local').scalar()
+    user_ids = [row.id for row in db.session.query(User.id).filter(User.id != admin_id).order_by(User.id)]
+    job_rows = db.session.query(Job.id, Job.cluster_id).order_by(Job.id).all()
+
+    batch = []
+    for i in range(scale):
+        job_id, cluster_id = job_rows[rng.randrange(n_jobs)]
+        text = corpus.resume()
+        batch.append({
+            'user_id': user_ids[i % n_users], 'job_id': job_id, 'cluster_id': cluster_id,
+            'submission_date': now, 'status': 'ready', 'resume_text': text,
+            'term_counts': json.dumps(count_terms(text), separators=(',', ':')),
+            'tokenizer': version,
+        })
+        if len(batch) == SEED_BATCH_SIZE:
+            _insert(Application.__table__, batch)
+            db.session.commit()
+            batch = []
+            if progress:
+                progress(i + 1, scale)
+    _insert(Application.__table__, batch)
+    db.session.commit()
+
+    return {
+        'admin_id': admin_id,
+        'user_ids': user_ids,
+        'job_ids': [job_id for job_id, _ in job_rows],
+        'applications': scale,
+        'jobs': n_jobs,
+        'users': n_users,
+    }
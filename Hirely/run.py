@@ -93,13 +93,25 @@ def check_databases(app):
 # -------------------------------
 # Routes
 # -------------------------------
+from sqlalchemy.orm import load_only
 from app.models import Job
+from app.utils.pagination import keyset_page, page_args
+
+INDEX_PAGE_SIZE = 50
 
 
 @app.route('/')
 def index():
-    jobs = db.session.query(Job).all()
-    return render_template('index.html', jobs=jobs)
+    # One keyset page of jobs; "More jobs" links to the next one
+    try:
+        limit, after = page_args(INDEX_PAGE_SIZE)
+    except ValueError:
+        return redirect('/')
+    jobs, next_cursor = keyset_page(
+        db.session.query(Job).options(load_only(Job.id, Job.role, Job.description)),
+        Job.id, limit, after
+    )
+    return render_template('index.html', jobs=jobs, next_cursor=next_cursor)
 
 
 @app.route('/register')
@@ -0,0 +1,68 @@
+from app import db
+from app.models import Application, IngestionTask, Job, ResumeBlob
+from app.utils.schema import upgrade_schema
+
+from conftest import apply, client_as, make_admin, make_user
+
+RESUMES = {
+    'ana': 'python flask sql docker kubernetes',
+    'ben': 'nursing patient care python',
+    'cy': 'sales marketing excel',
+}
+
+
+def _seed():
+    admin = make_admin()
+    users = {name: make_user(name) for name in RESUMES}
+    backend = Job(role='Backend Engineer', description='python flask sql docker', cluster_id=0)
+    nurse = Job(role='Nurse', description='patient care nursing', cluster_id=1)
+    sales = Job(role='Sales Associate', description='sales excel customers', cluster_id=2)
+    db.session.add_all([admin, backend, nurse, sales, *users.values()])
+    db.session.commit()
+    return admin.id, {name: user.id for name, user in users.items()}, backend.id, nurse.id
+
+
+def test_models_and_routes_on_each_backend(backend_app):
+    app = backend_app
+    with app.app_context():
+        admin_id, user_ids, backend_id, nurse_id = _seed()
+
+    for name, text in RESUMES.items():
+        response = apply(app, user_ids[name], backend_id, text)
+        assert response.status_code == 201, response.get_json()
+        assert response.get_json()['application']['status'] == 'ready'
+
+    # The same PDF again reuses the stored blob
+    assert apply(app, user_ids['ana'], nurse_id, RESUMES['ana']).status_code == 201
+    with app.app_context():
+        assert ResumeBlob.query.count() == len(RESUMES)
+        assert Application.query.filter_by(status='ready').count() == len(RESUMES) + 1
+        assert IngestionTask.query.filter_by(status='done').count() == len(RESUMES)
+
+    admin = client_as(app, admin_id)
+    shortlist = admin.get(f'/api/shortlist/{backend_id}?k=2')
+    assert shortlist.status_code == 200, shortlist.get_json()
+    assert shortlist.get_json()[0]['email'] == 'ana@example.com'
+    assert shortlist.get_json()[0]['username'] == 'Ana, Test'
+
+    ben = client_as(app, user_ids['ben'])
+    matches = ben.get('/api/matchmaking/?k=2')
+    assert matches.status_code == 200, matches.get_json()
+    assert [m['job_id'] for m in matches.get_json()][0] == nurse_id
+
+    listing = ben.get('/api/applications/user')
+    assert listing.status_code == 200
+    assert [a['job']['role'] for a in listing.get_json()] == ['Backend Engineer']
+    status = ben.get(f"/api/applications/{listing.get_json()[0]['id']}/status")
+    assert status.get_json()['status'] == 'ready'
+
+    assert admin.delete(f'/api/jobs/{nurse_id}').status_code == 200
+    assert nurse_id not in [job['id'] for job in app.test_client().get('/api/jobs/').get_json()]
+    # Streamed listing (a server-side cursor on PostgreSQL)
+    streamed = app.test_client().get('/api/jobs/?format=ndjson').get_data(as_text=True)
+    assert len(streamed.splitlines()) == 2
+    assert nurse_id not in [m['job_id'] for m in ben.get('/api/matchmaking/?k=2').get_json()]
+
+    # Re-running the in-place upgrade on a current schema is a no-op
+    with app.app_context():
+        upgrade_schema()
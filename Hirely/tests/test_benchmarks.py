@@ -0,0 +1,39 @@
+import json
+
+from benchmarks import bench
+from benchmarks.synthetic import Corpus, resume_pdf
+from app.utils.pdf_processor import extract_text_from_pdf
+
+
+def test_harness_runs_and_compares(tmp_path, capsys):
+    out = tmp_path / 'run.json'
+    args = ['run', '--scale', '120', '--clusters', '4', '--iterations', '10', '--warmup', '1',
+            '--workdir', str(tmp_path / 'work'), '--output', str(out)]
+    assert bench.main(args) == 0
+
+    report = json.loads(out.read_text())
+    assert set(report['results']) == set(bench.BENCHMARKS)
+    assert report['meta']['scale'] == 120
+    for name, stats in report['results'].items():
+        assert stats['errors'] == 0, name
+        assert stats['p50_ms'] <= stats['p95_ms'] <= stats['p99_ms'] <= stats['max_ms']
+        assert stats['throughput_per_s'] > 0 and stats['rss_peak_mb'] > 0
+
+    # A second run reuses the seeded database, left as it was by ingest
+    rerun = tmp_path / 'rerun.json'
+    assert bench.main(args[:-1] + [str(rerun), '--benchmarks', 'shortlist', 'ingest']) == 0
+    assert 'Reusing seeded database' in capsys.readouterr().err
+
+    rows = bench.compare(report, json.loads(rerun.read_text()))
+    assert {name for name, *_ in rows} == {'shortlist', 'ingest'}
+    assert bench.main(['compare', str(out), str(rerun)]) == 0
+
+
+def test_synthetic_corpus_is_reproducible(tmp_path):
+    assert Corpus(3).resume() == Corpus(3).resume()
+    assert Corpus(3).job() != Corpus(4).job()
+
+    path = tmp_path / 'resume.pdf'
+    path.write_bytes(resume_pdf(Corpus(0), pages=3, lines_per_page=5))
+    text = extract_text_from_pdf(str(path))
+    assert len(text.splitlines()) == 15
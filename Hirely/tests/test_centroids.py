@@ -0,0 +1,61 @@
+import os
+from types import SimpleNamespace
+
+import joblib
+import numpy as np
+import pytest
+
+from app.utils.centroids import Centroids, centroids_path_for, export_centroids, load_or_export
+
+
+def _reference_predict(centers, vectors):
+    # What KMeans.predict computes: the closest center by Euclidean distance
+    diff = vectors[:, np.newaxis, :].astype(np.float64) - centers[np.newaxis, :, :]
+    return np.argmin((diff ** 2).sum(axis=2), axis=1)
+
+
+def test_predict_matches_brute_force_nearest_center():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(12, 384)).astype(np.float32)
+    vectors = rng.normal(size=(200, 384)).astype(np.float32)
+    centroids = Centroids(centers)
+
+    labels = centroids.predict(vectors)
+    assert labels.tolist() == _reference_predict(centers, vectors).tolist()
+    # One row, a 1-D vector and the batch agree
+    assert centroids.predict(vectors[3:4]).tolist() == [labels[3]]
+    assert centroids.predict(vectors[3]).tolist() == [labels[3]]
+    assert centroids.predict(centers).tolist() == list(range(12))
+
+
+def test_rejects_mismatched_dimensions():
+    centroids = Centroids(np.eye(3, dtype=np.float32))
+    with pytest.raises(ValueError):
+        centroids.predict(np.zeros((1, 4)))
+    with pytest.raises(ValueError):
+        Centroids(np.zeros((0, 3)))
+
+
+def test_export_is_memory_mapped_and_reused(tmp_path):
+    model_path = str(tmp_path / 'kmeans_model.pkl')
+    centers = np.arange(12, dtype=np.float64).reshape(4, 3)
+    joblib.dump(SimpleNamespace(cluster_centers_=centers), model_path)
+
+    centroids = load_or_export(model_path)
+    exported = centroids_path_for(model_path)
+    assert exported.endswith('kmeans_model.centroids.npy') and os.path.exists(exported)
+    assert isinstance(centroids.centers, np.memmap) and centroids.centers.dtype == np.float32
+    assert centroids.predict(centers + 0.1).tolist() == [0, 1, 2, 3]
+
+    # The export is used as is while the pickle is unchanged (re-clustering
+    # writes new centroids there)...
+    export_centroids(SimpleNamespace(cluster_centers_=centers[::-1]), exported)
+    assert load_or_export(model_path).predict(centers).tolist() == [3, 2, 1, 0]
+
+    # ...and redone when the pickle's contents change, even if the new
+    # pickle carries an older modification time
+    joblib.dump(SimpleNamespace(cluster_centers_=centers[[1, 0, 2, 3]]), model_path)
+    stamp = os.path.getmtime(exported) - 1000
+    os.utime(model_path, (stamp, stamp))
+    assert load_or_export(model_path).predict(centers).tolist() == [1, 0, 2, 3]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
@@ -0,0 +1,229 @@
+import numpy as np
+
+from app import db, get_kmeans_model, registry
+from app.models import Application, Job
+from app.utils.centroids import load_centroids, save_centroids
+from app.utils.bm25_index import get_cluster_index
+from app.utils.clustering import (
+    assign, balance, bump_clustering_version, choose_k, minibatch_kmeans, silhouette_estimate
+)
+
+from conftest import FakeCollection, client_as, make_admin
+
+
+def _blobs(n_per_blob, n_blobs, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    means = rng.normal(scale=10.0, size=(n_blobs, dim))
+    vectors = np.concatenate([mean + rng.normal(size=(n_per_blob, dim)) for mean in means])
+    return vectors.astype(np.float32), np.repeat(np.arange(n_blobs), n_per_blob)
+
+
+def _same_partition(labels, truth):
+    pairs = set(zip(labels.tolist(), truth.tolist()))
+    return len(pairs) == len(set(labels.tolist())) == len(set(truth.tolist()))
+
+
+def _reference_silhouette(vectors, labels):
+    # Textbook definition, one point at a time
+    scores = []
+    for i, x in enumerate(vectors):
+        dist = np.sqrt(((vectors - x) ** 2).sum(axis=1))
+        own = labels == labels[i]
+        if own.sum() == 1:
+            scores.append(0.0)
+            continue
+        a = dist[own].sum() / (own.sum() - 1)
+        b = min(dist[labels == other].mean() for other in set(labels.tolist()) if other != labels[i])
+        scores.append((b - a) / max(a, b))
+    return float(np.mean(scores))
+
+
+def test_minibatch_kmeans_recovers_separated_clusters():
+    vectors, truth = _blobs(60, 4)
+    centers = minibatch_kmeans(vectors, 4, batch_size=64, seed=1)
+    assert centers.dtype == np.float32 and centers.shape == (4, 16)
+    assert _same_partition(assign(centers, vectors), truth)
+
+    # Warm-starting from the fitted centers keeps the cluster ids
+    again = minibatch_kmeans(vectors, 4, batch_size=64, init=centers, seed=2)
+    assert assign(again, vectors).tolist() == assign(centers, vectors).tolist()
+
+
+def test_silhouette_estimate_and_choice_of_k():
+    vectors, truth = _blobs(15, 3, dim=4)
+    labels = truth.copy()
+    labels[0] = 1
+    assert np.isclose(silhouette_estimate(vectors, labels), _reference_silhouette(vectors, labels))
+    assert silhouette_estimate(vectors, np.zeros(len(vectors), dtype=int)) == 0.0
+
+    # The estimate on a sample stays close to the exact score
+    big, big_truth = _blobs(400, 3, dim=4)
+    assert abs(silhouette_estimate(big, big_truth, sample_size=300) - silhouette_estimate(big, big_truth, 2000)) < 0.05
+
+    k, centers, scores = choose_k(big, range(2, 7), sample_size=300)
+    assert k == 3 and set(scores) == {2, 3, 4, 5, 6}
+    assert _same_partition(assign(centers, big), big_truth)
+
+
+def test_balance_report():
+    report = balance([0, 0, 0, 1, 3], 4)
+    assert report['sizes'] == [3, 1, 0, 1]
+    assert report['max'] == 3 and report['min'] == 0 and report['empty'] == 1
+    assert report['max_to_mean'] == 2.4
+
+
+def test_recluster_moves_jobs_applications_and_chroma(app, tmp_path, monkeypatch):
+    import app.utils.clustering as clustering
+    monkeypatch.setattr(clustering, 'CHROMA_PAGE_SIZE', 7)
+    app.config['KMEANS_CENTROIDS_PATH'] = str(tmp_path / 'centroids.npy')
+    jobs_collection, applications_collection = FakeCollection(), FakeCollection()
+    registry.register('jobs_collection', lambda: jobs_collection)
+    registry.register('applications_collection', lambda: applications_collection)
+
+    vectors, truth = _blobs(8, 3)
+    with app.app_context():
+        admin = make_admin()
+        jobs = [Job(role=f'Job {i}', description='python', cluster_id=0) for i in range(len(vectors))]
+        db.session.add_all([admin, *jobs])
+        db.session.flush()
+        applications = [Application(user_id=admin.id, job_id=job.id, cluster_id=0, resume_text='python')
+                        for job in jobs[::2]]
+        db.session.add_all(applications)
+        db.session.commit()
+        admin_id = admin.id
+        job_ids = [job.id for job in jobs]
+        jobs_collection.add([str(i) for i in job_ids], vectors.tolist(),
+                            [{'role': 'x', 'cluster_id': 0, 'is_active': True}] * len(job_ids))
+        applications_collection.add([str(a.id) for a in applications], [[0.0]] * len(applications),
+                                    [{'user_id': admin_id, 'cluster_id': 0}] * len(applications))
+    admin = client_as(app, admin_id)
+
+    before = admin.get('/api/system/clusters').get_json()
+    assert before['jobs']['sizes'] == [24]
+
+    dry = admin.post('/api/system/clusters/recluster', json={'k_max': 6, 'dry_run': True}).get_json()
+    assert dry['k'] == 3 and dry['after']['jobs']['sizes'] == [8, 8, 8]
+    assert admin.get('/api/system/clusters').get_json()['jobs']['sizes'] == [24]
+
+    report = admin.post('/api/system/clusters/recluster', json={'k_max': 6}).get_json()
+    assert report['k'] == 3 and report['jobs_moved'] == 16
+    assert report['before']['jobs']['max_to_mean'] == 1.0 and report['after']['jobs']['sizes'] == [8, 8, 8]
+    assert report['chroma_updated'] == {'jobs': 16, 'applications': report['applications_moved']}
+
+    with app.app_context():
+        clusters = dict(db.session.query(Job.id, Job.cluster_id))
+        labels = np.array([clusters[job_id] for job_id in job_ids])
+        assert _same_partition(labels, truth)
+        for application in Application.query.all():
+            assert application.cluster_id == clusters[application.job_id]
+            assert applications_collection.items[str(application.id)][1] == {
+                'user_id': admin_id, 'cluster_id': application.cluster_id}
+    for job_id in job_ids:
+        meta = jobs_collection.items[str(job_id)][1]
+        assert meta == {'role': 'x', 'cluster_id': clusters[job_id], 'is_active': True}
+
+    # New jobs are assigned with the exported centroids
+    centroids = load_centroids(app.config['KMEANS_CENTROIDS_PATH'])
+    assert centroids.predict(vectors).tolist() == labels.tolist()
+
+    # Shortlists use the new clusters
+    shortlist = admin.get(f'/api/shortlist/{job_ids[0]}?k=50').get_json()
+    with app.app_context():
+        same_cluster = {a.id for a in Application.query.filter_by(cluster_id=clusters[job_ids[0]])}
+    assert {row['application_id'] for row in shortlist} <= same_cluster
+
+    assert admin.post('/api/system/clusters/recluster', json={'k': 'three'}).status_code == 400
+    assert admin.post('/api/system/clusters/recluster', json={'k': 99}).status_code == 400
+
+
+def test_install_centroids_moves_jobs_to_trained_centers(app, tmp_path):
+    app.config['KMEANS_CENTROIDS_PATH'] = str(tmp_path / 'centroids.npy')
+    jobs_collection = FakeCollection()
+    registry.register('jobs_collection', lambda: jobs_collection)
+    registry.register('applications_collection', lambda: None)
+
+    vectors, truth = _blobs(8, 3)
+    with app.app_context():
+        jobs = [Job(role=f'Job {i}', description='python', cluster_id=0) for i in range(len(vectors))]
+        db.session.add_all(jobs)
+        db.session.commit()
+        job_ids = [job.id for job in jobs]
+    jobs_collection.add([str(i) for i in job_ids], vectors.tolist(),
+                        [{'role': 'x', 'cluster_id': 0, 'is_active': True}] * len(job_ids))
+    # A model trained offline, in its own cluster order
+    trained = minibatch_kmeans(vectors, 3, seed=1)
+    artifact = tmp_path / 'kmeans-test.npy'
+    save_centroids(trained, str(artifact))
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['system', 'install-centroids', str(tmp_path / 'other.npy')])
+    assert result.exit_code != 0
+    save_centroids(trained[:, :4], str(tmp_path / 'other.npy'))
+    result = runner.invoke(args=['system', 'install-centroids', str(tmp_path / 'other.npy')])
+    assert result.exit_code == 1 and 'do not fit' in result.output
+
+    result = runner.invoke(args=['system', 'install-centroids', str(artifact)])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        clusters = dict(db.session.query(Job.id, Job.cluster_id))
+    labels = [clusters[job_id] for job_id in job_ids]
+    assert labels == assign(trained, vectors).tolist() and _same_partition(np.array(labels), truth)
+    assert all(jobs_collection.items[str(i)][1]['cluster_id'] == clusters[i] for i in job_ids)
+    installed = load_centroids(app.config['KMEANS_CENTROIDS_PATH'])
+    assert np.array_equal(installed.centers, load_centroids(str(artifact)).centers)
+
+
+def test_workers_drop_cluster_state_replaced_by_another_process(app):
+    loads = []
+    registry.register('kmeans_model', lambda: loads.append(1) or object())
+    with app.app_context():
+        model, index = get_kmeans_model(), get_cluster_index(0)
+        assert get_kmeans_model() is model and get_cluster_index(0) is index
+
+        # Another worker re-clustered
+        bump_clustering_version()
+        assert get_cluster_index(0) is not index
+        assert get_kmeans_model() is not model and len(loads) == 2
+
+
+def test_backfill_vectors_sets_is_active_from_the_database(app):
+    jobs_collection = FakeCollection()
+    registry.register('jobs_collection', lambda: jobs_collection)
+    with app.app_context():
+        jobs = [Job(role=f'Job {i}', description='python', cluster_id=0, is_active=i != 1) for i in range(3)]
+        db.session.add_all(jobs)
+        db.session.commit()
+        job_ids = [job.id for job in jobs]
+    # Vectors written before the flag was mirrored in Chroma
+    jobs_collection.add([str(i) for i in job_ids], [[0.0]] * 3, [{'role': 'x', 'cluster_id': 0}] * 3)
+
+    result = app.test_cli_runner().invoke(args=['jobs', 'backfill-vectors'])
+    assert result.exit_code == 0 and 'Updated is_active on 3 of 3' in result.output
+    assert [jobs_collection.items[str(i)][1] for i in job_ids] == [
+        {'role': 'x', 'cluster_id': 0, 'is_active': active} for active in (True, False, True)]
+    assert 'on 0 of 3' in app.test_cli_runner().invoke(args=['jobs', 'backfill-vectors']).output
+
+
+def test_delete_job_deactivates_its_vector(app):
+    jobs_collection = FakeCollection()
+    registry.register('jobs_collection', lambda: jobs_collection)
+    with app.app_context():
+        admin = make_admin()
+        jobs = [Job(role=f'Job {i}', description='python') for i in range(2)]
+        db.session.add_all([admin, *jobs])
+        db.session.commit()
+        admin_id, job_ids = admin.id, [job.id for job in jobs]
+    jobs_collection.add([str(i) for i in job_ids], [[0.0]] * 2, [{'role': 'x', 'is_active': True}] * 2)
+    admin = client_as(app, admin_id)
+
+    # A job without a cluster id: Chroma rejects None metadata values
+    assert admin.delete(f'/api/jobs/{job_ids[0]}').status_code == 200
+    assert jobs_collection.items[str(job_ids[0])][1] == {'role': 'Job 0', 'is_active': False}
+
+    # The deactivation is committed before Chroma is updated
+    def unavailable(**kwargs):
+        raise RuntimeError('chroma is down')
+    jobs_collection.update = unavailable
+    assert admin.delete(f'/api/jobs/{job_ids[1]}').status_code == 200
+    with app.app_context():
+        assert db.session.get(Job, job_ids[1]).is_active is False
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import Application, IngestionTask, Job
+from app.utils.ingestion import (
+    IngestionWorkerPool, claim_next_task, claim_task, enqueue, process_task, requeue_stale_tasks, retry_delay
+)
+
+from conftest import client_as, make_pdf, make_user
+
+
+def _pending_application(app, tmp_path, payload):
+    path = tmp_path / 'upload.pdf'
+    path.write_bytes(payload)
+    with app.app_context():
+        user = make_user('ana')
+        job = Job(role='Backend Engineer', description='python', cluster_id=0)
+        db.session.add_all([user, job])
+        db.session.flush()
+        application = Application(user_id=user.id, job_id=job.id, cluster_id=0, status='pending')
+        db.session.add(application)
+        task = enqueue(application, str(path))
+        db.session.commit()
+        return user.id, application.id, task.id, path
+
+
+def test_enqueue_claim_and_process(app, tmp_path):
+    user_id, application_id, task_id, path = _pending_application(app, tmp_path, make_pdf('python flask developer'))
+    with app.app_context():
+        assert IngestionTask.query.one().status == 'queued'
+        assert claim_next_task() == task_id
+        # Claimed once only
+        assert not claim_task(task_id) and claim_next_task() is None
+        task = db.session.get(IngestionTask, task_id)
+        assert task.status == 'running' and task.attempts == 1 and task.heartbeat_at is not None
+
+        process_task(task_id)
+        assert db.session.get(IngestionTask, task_id).status == 'done'
+        application = db.session.get(Application, application_id)
+        assert application.status == 'ready' and 'python' in application.resume_text
+    assert not path.exists()
+
+    status = client_as(app, user_id).get(f'/api/applications/{application_id}/status').get_json()
+    assert status == {'application_id': application_id, 'status': 'ready', 'attempts': 1, 'error': None}
+
+
+def test_failed_tasks_back_off_then_fail(app, tmp_path):
+    user_id, application_id, task_id, path = _pending_application(app, tmp_path, b'not a pdf')
+    with app.app_context():
+        assert claim_task(task_id)
+        process_task(task_id, max_attempts=2, backoff=60)
+        task = db.session.get(IngestionTask, task_id)
+        assert task.status == 'queued' and task.error
+        assert task.available_at > datetime.utcnow() + timedelta(seconds=50)
+        # Not claimable before its backoff elapsed
+        assert claim_next_task() is None
+
+        task.available_at = datetime.utcnow()
+        db.session.commit()
+        assert claim_next_task() == task_id
+        process_task(task_id, max_attempts=2, backoff=60)
+        assert db.session.get(IngestionTask, task_id).status == 'failed'
+        assert db.session.get(Application, application_id).status == 'failed'
+    assert not path.exists()
+
+    status = client_as(app, user_id).get(f'/api/applications/{application_id}/status').get_json()
+    assert status['status'] == 'failed' and status['attempts'] == 2 and status['error']
+    assert [retry_delay(n, 5) for n in (1, 2, 3)] == [5, 10, 20]
+
+
+def test_monitor_renews_leases_and_requeues_stale_tasks(app, tmp_path):
+    _, _, task_id, _ = _pending_application(app, tmp_path, make_pdf('python'))
+    pool = IngestionWorkerPool(app, workers=0, stale_seconds=60, backoff=0)
+    with app.app_context():
+        assert claim_task(task_id)
+        task = db.session.get(IngestionTask, task_id)
+        task.started_at = task.heartbeat_at = datetime.utcnow() - timedelta(seconds=120)
+        db.session.commit()
+
+    # A task still running in this process keeps its lease...
+    pool._running.add(task_id)
+    pool.maintain()
+    with app.app_context():
+        assert db.session.get(IngestionTask, task_id).status == 'running'
+        assert requeue_stale_tasks(60) == 0
+
+    # ...and is re-queued once nobody renews it
+    pool._running.clear()
+    with app.app_context():
+        task = db.session.get(IngestionTask, task_id)
+        task.heartbeat_at = datetime.utcnow() - timedelta(seconds=120)
+        db.session.commit()
+    pool.maintain()
+    with app.app_context():
+        task = db.session.get(IngestionTask, task_id)
+        assert task.status == 'queued' and 'heartbeat' in task.error
+        assert claim_next_task() == task_id
+
+
+def test_expired_leases_use_up_attempts(app, tmp_path):
+    # A document whose worker dies on every attempt never reaches process_task's except
+    _, application_id, task_id, path = _pending_application(app, tmp_path, make_pdf('python'))
+    with app.app_context():
+        for attempt in (1, 2):
+            task = db.session.get(IngestionTask, task_id)
+            task.available_at = None
+            db.session.commit()
+            assert claim_task(task_id)
+            task.heartbeat_at = datetime.utcnow() - timedelta(seconds=120)
+            db.session.commit()
+            assert requeue_stale_tasks(60, max_attempts=2, backoff=60) == 1
+
+            task = db.session.get(IngestionTask, task_id)
+            if attempt == 1:
+                assert task.status == 'queued' and task.available_at > datetime.utcnow()
+        assert task.status == 'failed' and task.attempts == 2
+        assert db.session.get(Application, application_id).status == 'failed'
+    assert not path.exists()
@@ -0,0 +1,109 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import Application, Job
+from app.utils.instrumentation import Histogram, render_metrics, span, timed
+
+from conftest import client_as, make_admin
+
+
+def _seed():
+    admin = make_admin()
+    job = Job(role='Backend Engineer', description='python flask sql', cluster_id=0)
+    db.session.add_all([admin, job])
+    db.session.flush()
+    for resume in ('python flask developer', 'nurse patient care', 'sales excel'):
+        db.session.add(Application(user_id=admin.id, job_id=job.id, cluster_id=0, resume_text=resume))
+    db.session.commit()
+    return admin.id, job.id
+
+
+def test_histogram_is_cumulative():
+    histogram = Histogram('test_seconds', 'Test.', buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, span='x')
+    lines = histogram.render()
+    assert 'test_seconds_bucket{span="x",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{span="x",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{span="x",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{span="x"} 3' in lines
+
+
+def test_timed_proxies_only_listed_methods():
+    class Model:
+        size = 3
+
+        def encode(self, text):
+            return text.upper()
+
+    model = timed(Model, 'fake', ('encode',))()
+    assert model.encode('a') == 'A' and model.size == 3
+    assert timed(lambda: None, 'fake', ('encode',))() is None
+    assert 'hirely_span_seconds_count{span="fake.encode"} 1' in render_metrics()
+
+
+def test_shortlist_spans_reach_metrics_and_server_timing(app):
+    with app.app_context():
+        admin_id, job_id = _seed()
+    admin = client_as(app, admin_id)
+
+    response = admin.get(f'/api/shortlist/{job_id}')
+    assert response.status_code == 200
+    timing = dict(entry.split(';dur=') for entry in response.headers['Server-Timing'].split(', '))
+    assert {'db', 'bm25.sync', 'bm25.score', 'serialize', 'total'} <= set(timing)
+    assert all(float(ms) >= 0 for ms in timing.values())
+
+    metrics = app.test_client().get('/metrics')
+    assert metrics.mimetype == 'text/plain'
+    body = metrics.get_data(as_text=True)
+    assert '# TYPE hirely_request_seconds histogram' in body
+    assert 'endpoint="shortlist.get_shortlist"' in body
+    for name in ('db', 'bm25.build', 'bm25.score'):
+        assert f'hirely_span_seconds_count{{span="{name}"}}' in body
+    assert 'hirely_bm25_documents{index="cluster:0"} 3' in body
+    assert 'hirely_result_cache_events_total{event="misses"}' in body
+
+
+def test_span_outside_request_only_feeds_histogram(app):
+    with span('offline.test'):
+        pass
+    assert 'hirely_span_seconds_count{span="offline.test"} 1' in render_metrics()
+
+
+def test_profiler_writes_folded_stacks(tmp_path, monkeypatch):
+    from instance.config import Config
+    from conftest import _make_app
+
+    profiles = tmp_path / 'profiles'
+    monkeypatch.setattr(Config, 'PROFILE_REQUESTS', 1.0)
+    monkeypatch.setattr(Config, 'PROFILE_DIR', str(profiles))
+    monkeypatch.setattr(Config, 'PROFILE_INTERVAL_MS', 1)
+    app = _make_app(monkeypatch, f"sqlite:///{tmp_path / 'test.db'}", tmp_path)
+    with app.app_context():
+        admin_id, job_id = _seed()
+
+    response = client_as(app, admin_id).get(f'/api/shortlist/{job_id}')
+    name = response.headers['X-Profile']
+    assert name.endswith('.folded') and 'shortlist.get_shortlist' in name
+    for line in (profiles / name).read_text().splitlines():
+        stack, samples = line.rsplit(' ', 1)
+        assert int(samples) > 0 and ';' in stack
+    assert 'X-Profile' not in app.test_client().get('/metrics').headers
+
+
+def test_failed_statements_are_timed_without_leaking(app):
+    def db_count():
+        line = next(line for line in render_metrics().splitlines() if line.startswith('hirely_span_seconds_count{span="db"}'))
+        return int(line.split()[-1])
+
+    with app.app_context():
+        before = db_count()
+        with db.engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text('SELECT * FROM no_such_table'))
+            conn.rollback()
+            conn.execute(text('SELECT 1'))
+            assert not any('started' in key for key in conn.info)
+        assert db_count() == before + 2
@@ -0,0 +1,73 @@
+import io
+import json
+
+from app import db
+from app.models import Job
+from app.utils.job_import import MAX_BATCH_SIZE
+
+from conftest import FakeCollection, client_as, make_admin, register_fakes
+
+
+def _admin(app, collection):
+    register_fakes(jobs_collection=collection)
+    with app.app_context():
+        admin = make_admin()
+        db.session.add(admin)
+        db.session.commit()
+        return client_as(app, admin.id)
+
+
+def _jsonl(*records):
+    return '\n'.join(r if isinstance(r, str) else json.dumps(r) for r in records).encode()
+
+
+def test_bulk_import_batches_and_rejects(app):
+    collection = FakeCollection()
+    admin = _admin(app, collection)
+    body = _jsonl({'role': 'Nurse', 'description': 'ward care'}, 'not json', {'role': 'Chef'},
+                  {'Role': 'Analyst', 'Job_Description': 'sql excel'}, [1, 2],
+                  {'role': 'Engineer', 'description': 'python'})
+    response = admin.post('/api/jobs/bulk?batch_size=2', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 201
+    report = response.get_json()['report']
+    assert report['imported'] == 3 and report['batches'] == 3 and report['vector_errors'] == []
+    assert [row['line'] for row in report['rejected']] == [2, 3, 5]
+    with app.app_context():
+        jobs = Job.query.order_by(Job.id).all()
+        assert [job.role for job in jobs] == ['Nurse', 'Analyst', 'Engineer']
+        assert collection.ids == [str(job.id) for job in jobs]
+
+    csv_body = b'Role,Job_Description\nAccountant,ledgers\n'
+    response = admin.post('/api/jobs/bulk', data={'file': (io.BytesIO(csv_body), 'jobs.csv')},
+                          content_type='multipart/form-data')
+    assert response.get_json()['report']['imported'] == 1
+
+    for batch_size in (0, MAX_BATCH_SIZE + 1):
+        assert admin.post(f'/api/jobs/bulk?batch_size={batch_size}', data=body).status_code == 400
+
+
+def test_error_midway_returns_the_partial_report(app):
+    admin = _admin(app, FakeCollection())
+    # Large enough that the bad bytes are decoded after the first batches
+    body = _jsonl(*[{'role': f'Role {i}', 'description': 'text'} for i in range(2000)]) + b'\n\xff\xfe bad bytes\n'
+    response = admin.post('/api/jobs/bulk?batch_size=500', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 500
+    payload = response.get_json()
+    assert 'decode' in payload['error']
+    report = payload['report']
+    assert report['imported'] >= 500 and report['imported'] % 500 == 0
+    assert report['last_line'] == report['imported']
+    with app.app_context():
+        assert Job.query.count() == report['imported']
+
+
+def test_failed_vector_writes_are_reported(app):
+    collection = FakeCollection(fail_on_add=1)
+    admin = _admin(app, collection)
+    body = _jsonl(*[{'role': f'Role {i}', 'description': 'text'} for i in range(3)])
+    report = admin.post('/api/jobs/bulk?batch_size=2', data=body).get_json()['report']
+    assert report['imported'] == 3
+    with app.app_context():
+        ids = [job.id for job in Job.query.order_by(Job.id)]
+    assert report['vector_errors'] == [{'job_ids': ids[:2], 'error': 'chroma is down'}]
+    assert collection.ids == [str(ids[2])]
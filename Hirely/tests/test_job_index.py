@@ -0,0 +1,154 @@
+import random
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+from app.utils.bm25_index import BM25Index, job_document
+from app.utils.tokenizer import count_terms, tokenize
+
+WORDS = (
+    "python java sql flask react docker kubernetes aws machine learning data "
+    "analyst nurse sales marketing excel finance accounting design figma"
+).split()
+
+
+def make_jobs(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            'id': job_id,
+            'role': rng.choice(WORDS).title(),
+            'description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(10, 60))),
+        }
+        for job_id in range(1, n + 1)
+    ]
+
+
+def rebuild_ranking(jobs, resume_text, k=3):
+    """The per-request ranking get_job_matches used to compute."""
+    corpus = [tokenize(job_document(job['role'], job['description'])) for job in jobs]
+    scores = BM25Okapi(corpus).get_scores(tokenize(resume_text))
+    top = np.argsort(scores)[::-1][:k]
+    return [(jobs[i]['id'], scores[i]) for i in top]
+
+
+def index_ranking(index, resume_text, k=3):
+    scores = index.get_scores(tokenize(resume_text))
+    top = np.argsort(scores)[::-1][:k]
+    return [(index.doc_ids[i], scores[i]) for i in top]
+
+
+def test_patched_job_index_matches_rebuild():
+    rng = random.Random(1)
+    jobs = make_jobs(40)
+    index = BM25Index()
+    for job in jobs:
+        index.add_document(job['id'], tokenize(job_document(job['role'], job['description'])))
+
+    active = list(jobs)
+    next_id = len(jobs) + 1
+    for step in range(30):
+        # Interleave add_job / delete_job patches with ranking checks
+        if step % 3 == 0:
+            removed = active.pop(rng.randrange(len(active)))
+            index.remove_document(removed['id'])
+        else:
+            job = make_jobs(1, seed=step)[0]
+            job['id'] = next_id
+            next_id += 1
+            active.append(job)
+            index.add_document(job['id'], tokenize(job_document(job['role'], job['description'])))
+
+        resume_text = ' '.join(rng.choice(WORDS) for _ in range(80))
+        expected = rebuild_ranking(active, resume_text)
+        got = index_ranking(index, resume_text)
+
+        # Same top scores; tied jobs may come back in a different order, so
+        # compare each returned job against its score in the full rebuild
+        assert np.allclose([s for _, s in got], [s for _, s in expected])
+        rebuilt = rebuild_ranking(active, resume_text, k=len(active))
+        rebuilt_scores = dict(rebuilt)
+        for job_id, score in got:
+            assert np.isclose(rebuilt_scores[job_id], score)
+
+
+def test_full_scores_match_bm25okapi_after_removals():
+    jobs = make_jobs(25, seed=7)
+    index = BM25Index()
+    for job in jobs:
+        index.add_document(job['id'], tokenize(job_document(job['role'], job['description'])))
+    for job_id in (3, 25, 11):
+        index.remove_document(job_id)
+    active = [job for job in jobs if job['id'] not in (3, 25, 11)]
+
+    query = tokenize("python sql data analyst excel python")
+    bm25 = BM25Okapi([tokenize(job_document(j['role'], j['description'])) for j in active])
+    expected = dict(zip((j['id'] for j in active), bm25.get_scores(query)))
+    got = dict(zip(index.doc_ids, index.get_scores(query)))
+
+    assert set(got) == set(expected)
+    assert np.allclose([got[i] for i in expected], list(expected.values()))
+    assert index.version == len(jobs) + 3
+
+
+def test_stored_term_counts_score_like_token_lists():
+    jobs = make_jobs(20, seed=3)
+    from_tokens = BM25Index()
+    from_counts = BM25Index()
+    for job in jobs:
+        text = job_document(job['role'], job['description'])
+        from_tokens.add_document(job['id'], tokenize(text))
+        from_counts.add_document(job['id'], count_terms(text))
+
+    query = "Python SQL, data analyst; excel python"
+    assert np.allclose(from_counts.get_scores(count_terms(query)), from_tokens.get_scores(tokenize(query)))
+
+
+def test_explain_contributions_add_up_to_score():
+    jobs = make_jobs(30, seed=5)
+    index = BM25Index()
+    for job in jobs:
+        index.add_document(job['id'], count_terms(job_document(job['role'], job['description'])))
+    index.remove_document(4)
+
+    query = count_terms("python python sql data analyst excel figma unknownterm")
+    scores = dict(zip(index.doc_ids, index.get_scores(query)))
+    for doc_id in index.doc_ids:
+        contributions = index.explain(doc_id, query, limit=None)
+        assert np.isclose(sum(weight for _, weight in contributions), scores[doc_id])
+        assert contributions == sorted(contributions, key=lambda pair: (-pair[1], pair[0]))
+        assert {term for term, _ in contributions} <= set(query)
+        assert index.explain(doc_id, query, limit=2) == contributions[:2]
+
+    assert index.explain(4, query) == []
+    assert index.explain(jobs[0]['id'], {}) == []
+
+
+def test_batched_changes_and_vocab_compaction_match_bm25okapi(monkeypatch):
+    import app.utils.bm25_index as bm25_index
+    monkeypatch.setattr(bm25_index, 'VOCAB_COMPACT_MIN', 1)
+    monkeypatch.setattr(bm25_index, 'VOCAB_COMPACT_RATIO', 0.1)
+    rng = random.Random(2)
+    index = BM25Index()
+    docs = {}
+    for doc_id in range(1, 31):
+        docs[doc_id] = tokenize(' '.join(rng.choice(WORDS) for _ in range(20)) + f' rare{doc_id}')
+        index.add_document(doc_id, docs[doc_id])
+    query = tokenize("python sql data rare3 rare31 nurse")
+    index.get_scores(query)
+
+    # Several removals and additions between two queries
+    for doc_id in (3, 30, 7, 1, 12, 5, 18, 22, 9, 14, 26, 2, 16, 20, 24, 28):
+        index.remove_document(doc_id)
+        del docs[doc_id]
+    for doc_id in (31, 32):
+        docs[doc_id] = tokenize(f'python sql rare{doc_id}')
+        index.add_document(doc_id, docs[doc_id])
+
+    got = dict(zip(index.doc_ids, index.get_scores(query)))
+    expected = dict(zip(docs, BM25Okapi(list(docs.values())).get_scores(query)))
+    assert set(got) == set(expected)
+    assert np.allclose([got[i] for i in expected], list(expected.values()))
+    # Terms of removed documents left the vocabulary
+    assert 'rare3' not in index.vocab and len(index.terms) == len(index.df) == len(index.vocab)
+    assert index.explain(31, query, limit=1)[0][0] == 'rare31'
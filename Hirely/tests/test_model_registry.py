@@ -0,0 +1,43 @@
+import time
+
+from app import db
+from app.utils.model_registry import ModelRegistry
+
+from conftest import client_as, make_admin, make_user
+
+
+def test_failed_loads_are_retried_after_a_backoff():
+    registry = ModelRegistry(retry_seconds=0.05, max_retry_seconds=0.1)
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise RuntimeError('not yet')
+        return 'model'
+
+    registry.register('model', flaky)
+    assert registry.get('model') is None
+    # Within the backoff the failure is served from memory
+    assert registry.get('model') is None and len(attempts) == 1
+    stats = registry.stats()['model']
+    assert not stats['loaded'] and stats['error'] == 'not yet' and stats['failures'] == 1
+    time.sleep(0.06)
+    assert registry.get('model') is None and len(attempts) == 2
+
+    # An explicit warm-up does not wait for the (now doubled) backoff
+    registry.warm_up(['model'])
+    assert registry.get('model') == 'model' and len(attempts) == 3
+    assert registry.stats()['model']['error'] is None and registry.stats()['model']['failures'] == 0
+
+
+def test_model_status_is_admin_only(app):
+    with app.app_context():
+        user, admin = make_user('ana'), make_admin()
+        db.session.add_all([user, admin])
+        db.session.commit()
+        user_id, admin_id = user.id, admin.id
+
+    assert app.test_client().get('/api/system/models').status_code == 401
+    assert client_as(app, user_id).get('/api/system/models').status_code == 403
+    assert 'sentence_model' in client_as(app, admin_id).get('/api/system/models').get_json()
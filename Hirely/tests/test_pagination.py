@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from app import db
+from app.models import Application, Job
+from app.utils.pagination import decode_cursor, encode_cursor
+
+from conftest import client_as, make_user
+
+
+def _seed(n_jobs=23):
+    user = make_user('ana')
+    jobs = [Job(role=f'Job {i}', description='python flask', cluster_id=0, is_active=i % 5 != 0)
+            for i in range(n_jobs)]
+    db.session.add_all([user, *jobs])
+    db.session.flush()
+    for job in jobs[:7]:
+        db.session.add(Application(user_id=user.id, job_id=job.id, cluster_id=0,
+                                   resume_text='python', status='ready'))
+    db.session.commit()
+    return user.id, [job.id for job in jobs if job.is_active]
+
+
+def _follow(client, url):
+    """Collect every page by following the Link headers."""
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, response.get_json()
+        pages.append(response.get_json())
+        link = response.headers.get('Link')
+        url = link[1:link.index('>')] if link else None
+    return pages
+
+
+def test_jobs_are_paged_by_cursor(app):
+    with app.app_context():
+        _, active_ids = _seed()
+    client = app.test_client()
+
+    pages = _follow(client, '/api/jobs/?limit=5')
+    assert [len(page) for page in pages] == [5, 5, 5, 3]
+    assert [job['id'] for page in pages for job in page] == active_ids
+
+    # A new job shows up at the end without shifting earlier pages
+    first = client.get('/api/jobs/?limit=5')
+    with app.app_context():
+        db.session.add(Job(role='Late', description='x', cluster_id=0))
+        db.session.commit()
+    second = client.get('/api/jobs/?limit=5&cursor=' + first.headers['X-Next-Cursor'])
+    assert second.get_json() == pages[1]
+
+    # Without a limit the default page holds every job here
+    response = client.get('/api/jobs/')
+    assert len(response.get_json()) == len(active_ids) + 1
+    assert 'Link' not in response.headers
+
+
+def test_jobs_stream_as_ndjson(app):
+    with app.app_context():
+        _, active_ids = _seed()
+    client = app.test_client()
+
+    response = client.get('/api/jobs/?format=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['id'] for row in rows] == active_ids
+
+    # Accept header, resuming after a cursor
+    response = client.get(f'/api/jobs/?cursor={encode_cursor(active_ids[9])}',
+                          headers={'Accept': 'application/x-ndjson'})
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['id'] for row in rows] == active_ids[10:]
+
+
+def test_user_applications_are_paged_and_streamed(app):
+    with app.app_context():
+        user_id, _ = _seed()
+    client = client_as(app, user_id)
+
+    pages = _follow(client, '/api/applications/user?limit=3')
+    assert [len(page) for page in pages] == [3, 3, 1]
+    ids = [application['id'] for page in pages for application in page]
+    assert ids == sorted(ids)
+    assert all(application['job']['role'] for page in pages for application in page)
+
+    response = client.get('/api/applications/user?format=ndjson')
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['id'] for row in rows] == ids
+    assert rows[0]['job'] == pages[0][0]['job']
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=abc', 'cursor=not-a-cursor', 'cursor=' + encode_cursor('1')[:-1]])
+def test_bad_page_arguments_are_rejected(app, query):
+    assert app.test_client().get(f'/api/jobs/?{query}').status_code == 400
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(12345)) == 12345
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor('12'))
@@ -0,0 +1,71 @@
+import io
+import threading
+import time
+
+import pytest
+
+from app.utils import pdf_processor
+from app.utils.pdf_processor import extract_text_from_pdf
+from benchmarks.synthetic import make_pdf
+
+
+def _pdf(tmp_path, n_pages, name='doc.pdf'):
+    path = tmp_path / name
+    path.write_bytes(make_pdf([f'page {i}' for i in range(n_pages)]))
+    return str(path)
+
+
+def _pages(text):
+    return [int(number) for word, number in zip(*[iter(text.split())] * 2)]
+
+
+@pytest.mark.parametrize('inline_max_bytes', [pdf_processor.INLINE_MAX_BYTES, 0])
+def test_page_limit(tmp_path, inline_max_bytes):
+    # Counted in this process for a small file, by the pool worker otherwise
+    path = _pdf(tmp_path, 5)
+    with pytest.raises(ValueError, match='PDF has 5 pages; the limit is 4'):
+        extract_text_from_pdf(path, max_pages=4, inline_max_bytes=inline_max_bytes)
+    assert _pages(extract_text_from_pdf(path, max_pages=5, inline_max_bytes=inline_max_bytes)) == list(range(5))
+
+
+def test_small_documents_skip_the_pool(tmp_path, monkeypatch):
+    def no_pool():
+        raise AssertionError('small documents are extracted in-process')
+    monkeypatch.setattr(pdf_processor, '_get_pool', no_pool)
+    assert _pages(extract_text_from_pdf(_pdf(tmp_path, 3))) == [0, 1, 2]
+
+
+def test_parallel_ranges_keep_page_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_processor, 'PARALLEL_WORKERS', 2)
+    path = _pdf(tmp_path, 23)
+    assert _pages(extract_text_from_pdf(path, parallel_min_pages=4, inline_max_bytes=0)) == list(range(23))
+    # A stream not backed by a file is spooled to disk first
+    with open(path, 'rb') as f:
+        stream = io.BytesIO(f.read())
+    assert _pages(extract_text_from_pdf(stream, parallel_min_pages=4, inline_max_bytes=0)) == list(range(23))
+
+
+@pytest.mark.parametrize('inline_max_bytes', [pdf_processor.INLINE_MAX_BYTES, 0])
+def test_timeout(tmp_path, inline_max_bytes):
+    with pytest.raises(ValueError, match='time budget'):
+        extract_text_from_pdf(_pdf(tmp_path, 30), timeout=0, inline_max_bytes=inline_max_bytes)
+
+
+def test_stuck_document_does_not_cut_other_extractions_short(tmp_path):
+    pool = pdf_processor._get_pool()
+    stuck = pool.submit(time.sleep, 60)
+    results = []
+    other = threading.Thread(
+        target=lambda: results.append(extract_text_from_pdf(_pdf(tmp_path, 3), inline_max_bytes=0))
+    )
+    other.start()
+    time.sleep(0.2)
+
+    # Giving up on the stuck page retires the pool for new documents only
+    pool.abandon([stuck])
+    assert pdf_processor._get_pool() is not pool
+    other.join(30)
+    assert _pages(results[0]) == [0, 1, 2]
+    # ...and its worker is killed once the other document is done
+    assert stuck.exception(timeout=30) is not None
+    assert _pages(extract_text_from_pdf(_pdf(tmp_path, 2, 'after.pdf'), inline_max_bytes=0)) == [0, 1]
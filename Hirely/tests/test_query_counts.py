@@ -0,0 +1,74 @@
+import pytest
+
+from app import db
+from app.models import Application, Job, User
+from app.utils.bm25_index import reset_indexes
+from app.utils.query_counter import assert_max_queries, count_queries
+from app.utils.result_cache import get_cache
+
+from conftest import client_as, make_admin, make_user
+
+
+def _seed(n_applications):
+    admin = make_admin()
+    db.session.add(admin)
+
+    # Every application gets its own job, and odd-numbered ones their own
+    # applicant, so per-row lookups cannot be served from the identity map
+    users = [make_user(f'user{i}') for i in range(n_applications)]
+    jobs = [
+        Job(role=f'Engineer {i}', description='python flask sql docker', cluster_id=0)
+        for i in range(n_applications)
+    ]
+    db.session.add_all(users + jobs)
+    db.session.flush()
+
+    for i in range(n_applications):
+        db.session.add(Application(
+            user_id=users[i].id if i % 2 else users[0].id,
+            job_id=jobs[i].id,
+            cluster_id=0,
+            # Only a third of the resumes mention docker, so they score above zero
+            resume_text=f"python flask sql {'docker' if i % 3 == 0 else 'java'} resume {i}"
+        ))
+    db.session.commit()
+    return admin.id, users[0].id, jobs[0].id
+
+
+def _queries_for(app, n_applications, user, url):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        admin_id, user_id, job_id = _seed(n_applications)
+    reset_indexes()
+
+    # Requests run outside the seeding context so they start with an empty session
+    client = client_as(app, admin_id if user == 'admin' else user_id)
+    url = url.format(job_id=job_id)
+    client.get(url)  # build the in-memory index outside the measured request
+    get_cache().clear()  # ...but measure a ranked response, not a cached one
+    with app.app_context():
+        engine = db.engine
+    with count_queries(engine) as counter:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.get_json()) > 1
+    return counter.count
+
+
+@pytest.mark.parametrize('user, url', [
+    ('admin', '/api/shortlist/{job_id}?k=50'),
+    ('applicant', '/api/applications/user'),
+])
+def test_query_count_does_not_grow_with_rows(app, user, url):
+    small = _queries_for(app, 5, user, url)
+    large = _queries_for(app, 60, user, url)
+    assert small == large
+
+
+def test_assert_max_queries_reports_statements(app):
+    with app.app_context():
+        with pytest.raises(AssertionError, match='at most 1 queries, got 2'):
+            with assert_max_queries(db.engine, 1):
+                User.query.count()
+                Job.query.count()
@@ -0,0 +1,16 @@
+import numpy as np
+
+from app.utils.ranking import top_k
+
+
+def test_top_k_matches_full_argsort():
+    rng = np.random.default_rng(0)
+    scores = rng.normal(size=1000)
+    for k in (1, 3, 5, 50, 1000, 5000):
+        expected = np.argsort(scores)[::-1][:k]
+        assert list(top_k(scores, k)) == list(expected)
+
+
+def test_top_k_handles_empty_and_zero():
+    assert len(top_k(np.zeros(0), 5)) == 0
+    assert len(top_k(np.ones(4), 0)) == 0
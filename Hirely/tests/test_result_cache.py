@@ -0,0 +1,267 @@
+import sqlite3
+
+from app import db
+from app.models import Job
+from app.routes import matchmaking, shortlist
+from app.utils.bm25_index import BM25Index
+from app.utils import result_cache
+from app.utils.result_cache import ResultCache, SQLiteTier, get_cache
+
+from conftest import FakeCollection, apply, client_as, make_admin, make_user, register_fakes
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    stats = cache.stats()
+    assert stats['size'] == 2
+    assert stats['evictions'] == 1
+    assert (stats['hits'], stats['misses']) == (3, 1)
+    assert stats['hit_rate'] == 0.75
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = ResultCache(ttl=10, clock=clock)
+    cache.set('a', [1])
+    clock.now = 9.9
+    assert cache.get('a') == [1]
+    clock.now = 10.0
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+    assert len(cache) == 0
+
+
+def test_invalidate_drops_tagged_entries_only():
+    cache = ResultCache()
+    cache.set('u1', 'x', tags=('jobs', 'user:1'))
+    cache.set('u2', 'y', tags=('jobs', 'user:2'))
+    cache.set('s1', 'z', tags=('job:1', 'cluster:0'))
+
+    assert cache.invalidate('user:1') == 1
+    assert cache.get('u1') is None and cache.get('u2') == 'y'
+    assert cache.invalidate('jobs', 'job:1') == 2
+    assert len(cache) == 0
+    assert ResultCache(max_entries=0).get('u1') is None
+
+
+def test_persistent_tier_is_shared_and_invalidated(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    first = ResultCache(path=path)
+    first.set('k', [{'job_id': 1, 'score': 1.5}], tags=('jobs',))
+    first.set('other', [2], tags=('user:2',))
+
+    # Another worker (or a restart) reads it back and promotes it in memory
+    second = ResultCache(path=path)
+    assert second.get('k') == [{'job_id': 1, 'score': 1.5}]
+    assert second.stats()['persistent_hits'] == 1
+    assert second.get('k') == [{'job_id': 1, 'score': 1.5}]
+    assert second.stats()['hits'] == 1
+
+    # An invalidation in one process removes the row for everyone, and the
+    # promoted copy keeps its tags
+    second.invalidate('jobs')
+    assert len(second) == 0
+    first.invalidate('jobs')
+    assert ResultCache(path=path).get('k') is None
+    assert second.stats()['persistent']['size'] == 1
+
+
+def test_persistent_tier_stats_are_read_only(tmp_path, monkeypatch):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = ResultCache(path=path)
+    cache.set('live', 1)
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("INSERT INTO cache_entries (key, value, expires_at) VALUES ('expired', '0', 0)")
+
+    # Another process holds the write lock
+    writer.execute('BEGIN IMMEDIATE')
+    cache.persistent.close()
+    cache.persistent = SQLiteTier(path, busy_timeout=0.1)
+    assert cache.stats()['persistent']['size'] == 1
+    assert cache.stats()['persistent_errors'] == 0
+    # A locked file does not fail clear()
+    cache.clear()
+    assert cache.stats()['persistent_errors'] == 1
+    writer.execute('ROLLBACK')
+
+    # Expired rows are purged by writes, at most every PURGE_INTERVAL_SECONDS
+    monkeypatch.setattr(result_cache, 'PURGE_INTERVAL_SECONDS', 0)
+    cache.set('other', 2)
+    assert writer.execute('SELECT COUNT(*) FROM cache_entries WHERE expires_at = 0').fetchone()[0] == 1
+    cache._next_purge = 0.0
+    cache.set('other', 2)
+    assert writer.execute('SELECT key FROM cache_entries ORDER BY key').fetchall() == [('live',), ('other',)]
+    writer.close()
+
+
+def test_index_signature_identifies_document_set():
+    a, b = BM25Index(), BM25Index()
+    for doc_id in (1, 2, 3):
+        a.add_document(doc_id, ['python'])
+    for doc_id in (3, 4, 1, 2):
+        b.add_document(doc_id, ['python'])
+    b.remove_document(4)
+
+    assert a.signature == b.signature
+    assert a.version != b.version
+    a.remove_document(2)
+    assert a.signature != b.signature
+
+
+def _seed(app):
+    with app.app_context():
+        admin = make_admin()
+        users = [make_user(name) for name in ('ana', 'ben')]
+        backend = Job(role='Backend Engineer', description='python flask sql docker', cluster_id=0)
+        nurse = Job(role='Nurse', description='patient care nursing', cluster_id=0)
+        sales = Job(role='Sales Associate', description='sales excel customers', cluster_id=1)
+        db.session.add_all([admin, backend, nurse, sales, *users])
+        db.session.commit()
+        return admin.id, [user.id for user in users], backend.id, nurse.id
+
+
+def _apply(app, user_id, job_id, text):
+    response = apply(app, user_id, job_id, text)
+    assert response.status_code == 201, response.get_json()
+
+
+def _count_ranks(monkeypatch, module):
+    calls = []
+    original = module.rank
+
+    def rank(*args):
+        calls.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(module, 'rank', rank)
+    return calls
+
+
+def test_matches_are_cached_until_their_inputs_change(app, monkeypatch):
+    admin_id, (ana_id, ben_id), backend_id, nurse_id = _seed(app)
+    _apply(app, ana_id, backend_id, 'python flask developer')
+    ranks = _count_ranks(monkeypatch, matchmaking)
+    ana = client_as(app, ana_id)
+
+    first = ana.get('/api/matchmaking/?k=2').get_json()
+    assert ana.get('/api/matchmaking/?k=2').get_json() == first
+    assert len(ranks) == 1
+    assert first[0]['job_id'] == backend_id
+
+    # Another user's application leaves ana's matches cached
+    _apply(app, ben_id, nurse_id, 'nursing patient care')
+    ana.get('/api/matchmaking/?k=2')
+    assert len(ranks) == 1
+
+    # A new latest application is ranked afresh
+    _apply(app, ana_id, nurse_id, 'patient care nursing')
+    assert ana.get('/api/matchmaking/?k=2').get_json()[0]['job_id'] == nurse_id
+    assert len(ranks) == 2
+
+    # add_job and delete_job change the candidate jobs
+    register_fakes(jobs_collection=FakeCollection())
+    admin = client_as(app, admin_id)
+    assert len(ana.get('/api/matchmaking/?k=10').get_json()) == 3
+    added = admin.post('/api/jobs/', json={'role': 'Nurse Lead', 'description': 'ward rota'})
+    assert added.status_code == 201, added.get_json()
+    new_id = added.get_json()['job']['id']
+    assert new_id in [m['job_id'] for m in ana.get('/api/matchmaking/?k=10').get_json()]
+    assert len(ranks) == 4
+
+    assert admin.delete(f'/api/jobs/{new_id}').status_code == 200
+    assert new_id not in [m['job_id'] for m in ana.get('/api/matchmaking/?k=10').get_json()]
+    assert len(ranks) == 5
+
+    stats = admin.get('/api/system/cache').get_json()
+    assert stats['hits'] == 2
+    assert stats['invalidations'] >= 2
+
+
+def test_shortlists_are_cached_until_the_cluster_changes(app, monkeypatch):
+    admin_id, (ana_id, ben_id), backend_id, _ = _seed(app)
+    _apply(app, ana_id, backend_id, 'python flask developer')
+    ranks = _count_ranks(monkeypatch, shortlist)
+    admin = client_as(app, admin_id)
+
+    first = admin.get(f'/api/shortlist/{backend_id}')
+    assert admin.get(f'/api/shortlist/{backend_id}').get_json() == first.get_json()
+    assert len(ranks) == 1
+    assert admin.get(f'/api/shortlist/{backend_id}?k=1').status_code == 200
+    assert len(ranks) == 2
+
+    _apply(app, ben_id, backend_id, 'python sql docker')
+    assert len(admin.get(f'/api/shortlist/{backend_id}').get_json()) == 2
+    assert len(ranks) == 3
+
+    # Entries of the cluster were dropped, not just bypassed
+    assert len(get_cache()) == 1
+    assert admin.delete('/api/system/cache').status_code == 200
+    assert admin.get('/api/system/cache').get_json()['size'] == 0
+
+
+def test_semantic_shortlists_skip_the_bm25_index_and_are_cached(app, monkeypatch):
+    admin_id, (ana_id, ben_id), backend_id, _ = _seed(app)
+    _apply(app, ana_id, backend_id, 'python flask developer')
+    with app.app_context():
+        from app.models import Application
+        application_ids = [a.id for a in Application.query.all()]
+    vectors = FakeCollection(application_ids)
+    register_fakes(jobs_collection=FakeCollection(), applications_collection=vectors)
+
+    def no_index(cluster_id):
+        raise AssertionError('semantic shortlists do not need the BM25 index')
+    monkeypatch.setattr(shortlist, 'get_cluster_index', no_index)
+    calls = []
+    original = shortlist.nearest
+    monkeypatch.setattr(shortlist, 'nearest', lambda *args, **kwargs: calls.append(args) or original(*args, **kwargs))
+    admin = client_as(app, admin_id)
+
+    first = admin.get(f'/api/shortlist/{backend_id}?mode=semantic').get_json()
+    assert [row['application_id'] for row in first] == application_ids
+    assert admin.get(f'/api/shortlist/{backend_id}?mode=semantic').get_json() == first
+    assert len(calls) == 1
+
+    # A newly indexed application changes the key
+    vectors.add(['1000000'], [[0.0]], [{}])
+    admin.get(f'/api/shortlist/{backend_id}?mode=semantic')
+    assert len(calls) == 2
+
+
+def test_semantic_matches_skip_the_bm25_index_and_are_cached(app, monkeypatch):
+    _, (ana_id, _), backend_id, nurse_id = _seed(app)
+    _apply(app, ana_id, backend_id, 'python flask developer')
+    jobs = FakeCollection([backend_id, nurse_id])
+    register_fakes(jobs_collection=jobs, applications_collection=FakeCollection())
+
+    def no_index():
+        raise AssertionError('semantic matches do not need the BM25 index')
+    monkeypatch.setattr(matchmaking, 'get_job_index', no_index)
+    calls = []
+    original = matchmaking.nearest
+    monkeypatch.setattr(matchmaking, 'nearest', lambda *args, **kwargs: calls.append(args) or original(*args, **kwargs))
+    ana = client_as(app, ana_id)
+
+    first = ana.get('/api/matchmaking/?mode=semantic&k=5').get_json()
+    assert [row['job_id'] for row in first] == [backend_id, nurse_id]
+    assert ana.get('/api/matchmaking/?mode=semantic&k=5').get_json() == first
+    assert len(calls) == 1
+
+    # A new job vector changes the key
+    jobs.add(['1000000'], [[0.0]], [{}])
+    ana.get('/api/matchmaking/?mode=semantic&k=5')
+    assert len(calls) == 2
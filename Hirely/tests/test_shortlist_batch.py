@@ -0,0 +1,100 @@
+import numpy as np
+
+from app import db
+from app.models import Application, Job
+from app.utils.bm25_index import BM25Index
+from app.utils.query_counter import count_queries
+from app.utils.ranking import rank, rank_many
+from app.utils.result_cache import get_cache
+from app.utils.tokenizer import count_terms
+
+from conftest import client_as, make_admin, make_user
+
+WORDS = "python java sql flask react docker nurse patient care sales excel figma".split()
+
+
+def test_rank_many_matches_rank_per_query():
+    rng = np.random.default_rng(0)
+    index = BM25Index()
+    for doc_id in range(1, 41):
+        index.add_document(doc_id, list(rng.choice(WORDS, size=rng.integers(3, 15))))
+    index.remove_document(7)
+    queries = [count_terms(' '.join(rng.choice(WORDS, size=6))) for _ in range(9)]
+    queries.append({'unknownterm': 2})
+
+    batched = rank_many(index, queries, 5)
+    for query, ranked in zip(queries, batched):
+        single = rank(index, query, 5)
+        assert np.allclose([s for _, s in ranked], [s for _, s in single])
+        scores = dict(zip(index.doc_ids, index.get_scores(query)))
+        assert all(np.isclose(scores[doc_id], score) for doc_id, score in ranked)
+    assert rank_many(BM25Index(), queries, 5) == [[] for _ in queries]
+
+
+def _seed(n_jobs, clusters=3):
+    admin = make_admin()
+    applicant = make_user('ana')
+    jobs = [
+        Job(role=f'Job {i}', description=' '.join(WORDS[i % 7:i % 7 + 4]), cluster_id=i % clusters)
+        for i in range(n_jobs)
+    ]
+    db.session.add_all([admin, applicant, *jobs])
+    db.session.flush()
+    for i in range(12):
+        db.session.add(Application(
+            user_id=applicant.id, job_id=jobs[i % n_jobs].id, cluster_id=i % clusters,
+            resume_text=' '.join(WORDS[i % 9:i % 9 + 3]) + f' resume {i}'
+        ))
+    db.session.commit()
+    return admin.id, [job.id for job in jobs]
+
+
+def test_batch_matches_individual_shortlists(app):
+    with app.app_context():
+        admin_id, job_ids = _seed(9)
+        job_ids = job_ids[:6]
+    admin = client_as(app, admin_id)
+
+    response = admin.post('/api/shortlist/batch', json={'job_ids': job_ids + [999, job_ids[0]], 'k': 3})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['missing'] == [999]
+    assert [entry['job_id'] for entry in body['shortlists']] == job_ids
+
+    get_cache().clear()
+    for entry in body['shortlists']:
+        single = admin.get(f"/api/shortlist/{entry['job_id']}?k=3").get_json()
+        assert [r['application_id'] for r in entry['shortlist']] == [r['application_id'] for r in single]
+        assert np.allclose([r['score'] for r in entry['shortlist']], [r['score'] for r in single])
+
+
+def test_batch_queries_grow_with_clusters_not_jobs(app):
+    with app.app_context():
+        admin_id, job_ids = _seed(30)
+        engine = db.engine
+    admin = client_as(app, admin_id)
+    admin.post('/api/shortlist/batch', json={'job_ids': job_ids})  # build the indexes
+
+    counts = []
+    for n_jobs in (3, 30):
+        get_cache().clear()
+        with count_queries(engine) as counter:
+            response = admin.post('/api/shortlist/batch', json={'job_ids': job_ids[:n_jobs]})
+        assert response.status_code == 200
+        assert len(response.get_json()['shortlists']) == n_jobs
+        counts.append(counter.count)
+    assert counts[0] == counts[1]
+
+    # A repeated batch is answered from the per-job cache
+    stats = get_cache().stats()
+    admin.post('/api/shortlist/batch', json={'job_ids': job_ids})
+    assert get_cache().stats()['hits'] - stats['hits'] == len(job_ids)
+
+
+def test_batch_validates_input(app):
+    with app.app_context():
+        admin_id, _ = _seed(3)
+    admin = client_as(app, admin_id)
+    for body in ({}, {'job_ids': []}, {'job_ids': ['1']}, {'job_ids': [1], 'k': 0},
+                 {'job_ids': list(range(1, 200))}):
+        assert admin.post('/api/shortlist/batch', json=body).status_code == 400
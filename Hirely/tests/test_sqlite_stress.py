@@ -0,0 +1,66 @@
+import io
+import threading
+
+from app import db
+from app.models import Application, Job
+
+from conftest import client_as, make_admin, make_pdf, make_user
+
+THREADS = 8
+APPLICATIONS_PER_THREAD = 6
+
+
+def test_concurrent_applications_and_reads(app):
+    """
+    Writers and readers hammer the default SQLite setup (file database, WAL,
+    pooled connections) from many threads. An in-memory database cannot
+    stand in here: Flask-SQLAlchemy pins it to a single StaticPool
+    connection, so concurrent sessions would share one transaction.
+    """
+    with app.app_context():
+        admin = make_admin()
+        users = [make_user(f'user{i}') for i in range(THREADS)]
+        job = Job(role='Backend Engineer', description='python flask sql docker', cluster_id=0)
+        db.session.add_all([admin, job, *users])
+        db.session.commit()
+        admin_id, job_id, user_ids = admin.id, job.id, [user.id for user in users]
+
+    errors = []
+    start = threading.Barrier(THREADS * 2)
+
+    def writer(n):
+        client = client_as(app, user_ids[n])
+        start.wait()
+        for i in range(APPLICATIONS_PER_THREAD):
+            response = client.post('/api/applications/', data={
+                'job_id': str(job_id),
+                'resume': (io.BytesIO(make_pdf(f'python flask resume {n} {i}')), 'resume.pdf')
+            }, content_type='multipart/form-data')
+            if response.status_code != 201:
+                errors.append(('apply', response.status_code, response.get_json()))
+
+    def reader(n):
+        admin_client = client_as(app, admin_id)
+        user_client = client_as(app, user_ids[n])
+        start.wait()
+        for _ in range(APPLICATIONS_PER_THREAD):
+            for client, url in ((admin_client, f'/api/shortlist/{job_id}?k=5'),
+                                (user_client, '/api/applications/user')):
+                response = client.get(url)
+                # 404 = nothing shortlisted yet
+                if response.status_code not in (200, 404):
+                    errors.append((url, response.status_code, response.get_json()))
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(THREADS)]
+    threads += [threading.Thread(target=reader, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with app.app_context():
+        assert Application.query.filter_by(status='ready').count() == THREADS * APPLICATIONS_PER_THREAD
+
+    shortlist = client_as(app, admin_id).get(f'/api/shortlist/{job_id}?k=100')
+    assert len(shortlist.get_json()) == THREADS * APPLICATIONS_PER_THREAD
@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+from app import db
+from app import models
+from app.models import Application, Job, ResumeBlob
+from app.utils import bm25_index
+from app.utils.bm25_index import refresh_term_counts
+
+from conftest import apply, client_as, make_admin, make_user
+
+
+def _seed(app):
+    with app.app_context():
+        admin = make_admin()
+        ana = make_user('ana')
+        backend = Job(role='Backend Engineer', description='Python, Flask and SQL; Docker.', cluster_id=0)
+        nurse = Job(role='Nurse', description='Patient care.', cluster_id=1)
+        db.session.add_all([admin, ana, backend, nurse])
+        db.session.commit()
+        ids = admin.id, ana.id, backend.id, nurse.id
+
+    response = apply(app, ids[1], ids[2], 'PYTHON developer, Flask & Docker.')
+    assert response.status_code == 201
+    return ids
+
+
+def _refuse(text):
+    raise AssertionError('stored text was re-tokenized')
+
+
+def test_counts_are_persisted_at_write_time(app):
+    _, _, backend_id, _ = _seed(app)
+    with app.app_context():
+        blob = ResumeBlob.query.one()
+        assert blob.term_counts == {'python': 1, 'developer': 1, 'flask': 1, 'docker': 1}
+        # Jobs created outside the routes are filled in by the refresh
+        assert db.session.get(Job, backend_id).term_counts is None
+        assert refresh_term_counts() == 2
+        assert db.session.get(Job, backend_id).term_counts == {
+            'backend': 1, 'engineer': 1, 'python': 1, 'flask': 1, 'sql': 1, 'docker': 1
+        }
+        assert refresh_term_counts() == 0
+
+
+def test_shortlist_queries_with_the_description_only(app):
+    admin_id, ana_id, backend_id, _ = _seed(app)
+    with app.app_context():
+        refresh_term_counts()
+        job = db.session.get(Job, backend_id)
+        assert job.shortlist_terms() == {'python': 1, 'flask': 1, 'sql': 1, 'docker': 1}
+        # A resume matching the role words only
+        other = make_user('bo')
+        db.session.add(other)
+        db.session.flush()
+        db.session.add_all([
+            Application(user_id=other.id, job_id=backend_id, cluster_id=0, resume_text='Backend engineer'),
+            Application(user_id=other.id, job_id=backend_id, cluster_id=0, resume_text='Ward rounds'),
+        ])
+        db.session.commit()
+        other_id = other.id
+
+    admin = client_as(app, admin_id)
+    shortlist = admin.get(f'/api/shortlist/{backend_id}?k=5').get_json()
+    scores = {row['user_id']: row['score'] for row in shortlist}
+    assert scores[ana_id] > 0 and scores[other_id] == 0
+    batch = admin.post('/api/shortlist/batch', json={'job_ids': [backend_id], 'k': 5}).get_json()
+    assert batch['shortlists'][0]['shortlist'] == shortlist
+
+
+def test_queries_never_retokenize_stored_text(app, monkeypatch):
+    admin_id, ana_id, backend_id, _ = _seed(app)
+    with app.app_context():
+        refresh_term_counts()
+
+    monkeypatch.setattr(bm25_index, 'count_terms', _refuse)
+    monkeypatch.setattr(models, 'count_terms', _refuse)
+
+    admin, ana = client_as(app, admin_id), client_as(app, ana_id)
+    shortlist = admin.get(f'/api/shortlist/{backend_id}')
+    assert shortlist.status_code == 200, shortlist.get_json()
+    matches = ana.get('/api/matchmaking/?k=2')
+    assert matches.status_code == 200, matches.get_json()
+    assert matches.get_json()[0]['job_id'] == backend_id
+
+    # Explanations come from the ranking index: they add up to the ranked score
+    top = shortlist.get_json()[0]
+    explain = admin.get(f"/api/shortlist/explain/{top['application_id']}").get_json()
+    assert explain['matching_terms'] == ['docker', 'flask', 'python']
+    assert explain['score'] == pytest.approx(top['score'])
+    assert [w['term'] for w in explain['term_weights']] == explain['matching_terms']
+
+    explain = ana.get(f'/api/matchmaking/explain/{backend_id}').get_json()
+    assert explain['matching_terms'] == ['docker', 'flask', 'python']
+    assert explain['score'] == pytest.approx(matches.get_json()[0]['score'])
+
+
+def test_counts_from_another_pipeline_are_refreshed(app):
+    _seed(app)
+    with app.app_context():
+        refresh_term_counts()
+        legacy = Application(user_id=1, job_id=1, cluster_id=0, resume_text='Python SQL')
+        db.session.add(legacy)
+        blob = ResumeBlob.query.one()
+        blob.term_counts_json = json.dumps({'PYTHON': 1})
+        blob.tokenizer = 'split'
+        db.session.commit()
+
+        assert blob.term_counts is None
+        assert refresh_term_counts() == 1
+        assert blob.term_counts == {'python': 1, 'developer': 1, 'flask': 1, 'docker': 1}
+        assert legacy.term_counts == {'python': 1, 'sql': 1}
@@ -0,0 +1,38 @@
+import pytest
+
+from app.utils import tokenizer
+from app.utils.tokenizer import count_terms, stem, tokenize
+
+
+@pytest.fixture
+def stemming():
+    tokenizer.configure(stemming=True)
+    yield
+    tokenizer.configure(stemming=False)
+
+
+def test_tokenize_normalizes_case_punctuation_and_stopwords():
+    text = 'Senior C++/C# developer. Node.js, Python 3.5; e-commerce & REST APIs (AWS) for the team.'
+    assert tokenize(text) == [
+        'senior', 'c++', 'c#', 'developer', 'node.js', 'python', '3.5',
+        'e-commerce', 'rest', 'apis', 'aws', 'team'
+    ]
+    assert tokenize(None) == []
+
+
+def test_count_terms():
+    assert count_terms('Python, python and SQL') == {'python': 2, 'sql': 1}
+
+
+@pytest.mark.parametrize('word, expected', [
+    ('running', 'run'), ('studies', 'study'), ('caring', 'care'), ('nurses', 'nurs'),
+    ('nursing', 'nurs'), ('analysis', 'analysis'), ('c++', 'c++'), ('aws', 'aws'),
+])
+def test_stem(word, expected):
+    assert stem(word) == expected
+
+
+def test_stemming_changes_the_pipeline_version(stemming):
+    assert tokenize('Managed managing teams') == ['manag', 'manag', 'team']
+    assert tokenizer.tokenizer_version().endswith('+stem')
+
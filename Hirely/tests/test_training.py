@@ -0,0 +1,86 @@
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from app.utils.centroids import load_centroids
+from training import train
+
+ROLES = ('Registered Nurse', 'Backend Engineer', 'Accountant')
+
+
+class FakeEncoder:
+    """Texts of the same role land near the same point."""
+
+    def __init__(self):
+        self.calls = 0
+        rng = np.random.default_rng(0)
+        self.means = {role: rng.normal(scale=10.0, size=8) for role in ROLES}
+
+    def encode(self, texts, **kwargs):
+        self.calls += 1
+        return np.array([
+            self.means[next(role for role in ROLES if text.startswith(role))] + np.random.default_rng(i).normal(size=8)
+            for i, text in enumerate(texts)
+        ])
+
+
+def _write_csv(path, rows_per_role):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Role', 'Job_Description'])
+        for i in range(rows_per_role):
+            for role in ROLES:
+                writer.writerow([role, f'duties {i}'])
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    fake = FakeEncoder()
+    monkeypatch.setattr(train, 'load_encoder', lambda name: fake)
+    monkeypatch.setattr(train, 'ENCODE_BATCH_SIZE', 16)
+    return fake
+
+
+def test_trains_versioned_model_without_installing_it(tmp_path, encoder, capsys):
+    dataset = tmp_path / 'train.csv'
+    _write_csv(dataset, 30)
+    args = [str(dataset), '--k-min', '2', '--k-max', '6', '--workers', '2', '--sample-size', '50',
+            '--cache-dir', str(tmp_path / 'cache'), '--output-dir', str(tmp_path / 'models'),
+            '--report', str(tmp_path / 'report.json')]
+    assert train.main(args) == 0
+    out, err = capsys.readouterr()
+    assert 'Selected k=3' in out
+
+    report = json.loads((tmp_path / 'report.json').read_text())
+    assert report['selected']['k'] == 3 and report['rows'] == 90 and report['train_rows'] == 72
+    assert [metrics['k'] for metrics in report['candidates']] == [2, 3, 4, 5, 6]
+    assert report['selected']['test_silhouette'] > 0.5
+    artifact = load_centroids(report['artifact'])
+    assert artifact.n_clusters == 3
+    # Installing is the migration's job (flask system install-centroids)
+    assert f"install-centroids {report['artifact']}" in err
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['cache', 'models', 'report.json', 'train.csv']
+
+    # Every role's jobs share a cluster
+    labels = artifact.predict(np.array([encoder.means[role] for role in ROLES]))
+    assert len(set(labels.tolist())) == 3
+
+    # A second run reuses the cached embeddings
+    calls = encoder.calls
+    assert train.main(args[:-2] + ['--k', '3']) == 0
+    assert encoder.calls == calls
+    assert 'Using cached embeddings' in capsys.readouterr().err
+
+
+def test_cache_is_keyed_by_dataset_contents(tmp_path, encoder):
+    dataset = tmp_path / 'train.csv'
+    _write_csv(dataset, 4)
+    first, embeddings = train.cached_embeddings(str(dataset), cache_dir=str(tmp_path), log=lambda m: None)
+    assert isinstance(embeddings, np.memmap) and embeddings.shape == (12, 8)
+
+    _write_csv(dataset, 5)
+    second, embeddings = train.cached_embeddings(str(dataset), cache_dir=str(tmp_path), log=lambda m: None)
+    assert first != second and embeddings.shape == (15, 8)
+    assert not list(tmp_path.glob('*.tmp'))
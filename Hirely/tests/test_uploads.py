@@ -0,0 +1,121 @@
+import hashlib
+import io
+import os
+import tracemalloc
+
+import pytest
+
+from app import db
+from app.models import Job, ResumeBlob
+from app.utils.pdf_processor import extract_text_from_pdf
+from app.utils.uploads import STAGING_DIR
+
+from conftest import client_as, make_pdf, make_user
+
+BOUNDARY = 'hirelyboundary'
+
+
+def _staged(app):
+    staging = os.path.join(app.config['UPLOAD_FOLDER'], STAGING_DIR)
+    return os.listdir(staging) if os.path.isdir(staging) else []
+
+
+def test_application_upload_is_hashed_while_received(app):
+    with app.app_context():
+        user = make_user('ana')
+        job = Job(role='Backend Engineer', description='python', cluster_id=0)
+        db.session.add_all([user, job])
+        db.session.commit()
+        user_id, job_id = user.id, job.id
+
+    pdf = make_pdf('python flask developer')
+    response = client_as(app, user_id).post('/api/applications/', data={
+        'job_id': str(job_id), 'resume': (io.BytesIO(pdf), 'resume.pdf')
+    }, content_type='multipart/form-data')
+    assert response.status_code == 201, response.get_json()
+    with app.app_context():
+        assert ResumeBlob.query.one().sha256 == hashlib.sha256(pdf).hexdigest()
+    assert _staged(app) == []
+
+    # A rejected request does not leave its staged upload behind
+    response = client_as(app, user_id).post('/api/applications/', data={
+        'resume': (io.BytesIO(pdf), 'resume.pdf')
+    }, content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert _staged(app) == []
+
+
+def test_duplicate_upload_is_ready_even_if_indexing_fails(app, monkeypatch):
+    import app.routes.applications as applications
+
+    with app.app_context():
+        user = make_user('ana')
+        job = Job(role='Backend Engineer', description='python', cluster_id=0)
+        db.session.add_all([user, job])
+        db.session.commit()
+        user_id, job_id = user.id, job.id
+
+    client = client_as(app, user_id)
+    pdf = make_pdf('python flask developer')
+    apply = lambda: client.post('/api/applications/', data={
+        'job_id': str(job_id), 'resume': (io.BytesIO(pdf), 'resume.pdf')
+    }, content_type='multipart/form-data')
+    assert apply().status_code == 201
+
+    def broken(application):
+        raise RuntimeError('vector store unavailable')
+    monkeypatch.setattr(applications, 'index_application', broken)
+    response = apply()
+    assert response.status_code == 201
+    assert response.get_json()['application']['status'] == 'ready'
+
+
+def _multipart_file(path, payload_size):
+    """Write a multipart register form with a payload_size-byte resume to disk."""
+    chunk = os.urandom(1 << 16)
+    digest = hashlib.sha256()
+    with open(path, 'wb') as f:
+        for name, value in (('last_name', 'Big'), ('first_name', 'Upload'),
+                            ('email', 'big@example.com'), ('password', 'secret')):
+            f.write(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                    f'{value}\r\n'.encode())
+        f.write(f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="resume"; '
+                f'filename="big.pdf"\r\nContent-Type: application/pdf\r\n\r\n'.encode())
+        for _ in range(payload_size // len(chunk)):
+            f.write(chunk)
+            digest.update(chunk)
+        f.write(f'\r\n--{BOUNDARY}--\r\n'.encode())
+    return digest.hexdigest()
+
+
+def test_upload_memory_does_not_grow_with_file_size(app, tmp_path):
+    size = 12 * 1024 * 1024
+    body_path = tmp_path / 'body.bin'
+    expected = _multipart_file(body_path, size)
+    client = app.test_client()
+
+    with open(body_path, 'rb') as body:
+        tracemalloc.start()
+        response = client.post('/auth/register', input_stream=body,
+                                content_length=os.path.getsize(body_path),
+                                content_type=f'multipart/form-data; boundary={BOUNDARY}')
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    assert response.status_code == 201, response.get_json()
+    # Bounded by the parser and copy buffers, not by the 12 MB file
+    assert peak < size / 16
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], 'big.pdf'), 'rb') as f:
+        assert hashlib.file_digest(f, 'sha256').hexdigest() == expected
+    assert _staged(app) == []
+
+
+def test_pdf_is_read_from_disk_through_a_memory_map(tmp_path):
+    path = tmp_path / 'resume.pdf'
+    path.write_bytes(make_pdf('line one\nline two'))
+    assert extract_text_from_pdf(str(path)).split() == ['line', 'one', 'line', 'two']
+
+    empty = tmp_path / 'empty.pdf'
+    empty.write_bytes(b'')
+    with pytest.raises(ValueError, match='Error processing PDF'):
+        extract_text_from_pdf(str(empty))
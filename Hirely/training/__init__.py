@@ -0,0 +1 @@
+"""Headless k-means training (see training.train)."""
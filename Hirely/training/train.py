@@ -0,0 +1,270 @@
+"""
+Train the job cluster model from a CSV, without the notebook.
+
+    python -m training.train resume_screening_train.csv
+    python -m training.train jobs.csv --k-min 4 --k-max 30 --workers 8
+    python -m training.train jobs.csv --k 12
+
+Run from the Hirely directory. Job texts are built like the app builds them
+(role + description, CSV columns as accepted by the bulk job import) and
+encoded once with the sentence model: the embeddings are cached as a .npy
+keyed by the dataset's SHA-256, the model name and the row limit, and
+memory-mapped on later runs, so retraining never re-encodes an unchanged
+dataset. Rows are stored in a fixed shuffled order, which makes the
+train/test split two contiguous, zero-copy slices.
+
+Every candidate k is fitted with mini-batch k-means (app.utils.clustering)
+in a pool of worker processes that share the memory-mapped embeddings, and
+scored by a silhouette estimate on a bounded sample of the training rows
+and of the held-out rows. The best k (or --k) is written as a versioned
+artifact, data/models/kmeans-<version>.npy plus a .json with its metrics.
+
+The artifact is not installed: stored jobs and applications carry cluster
+ids of the current centroids, and new centroids number their clusters
+differently. Install it with the migration that moves them over, from the
+Hirely directory of the deployment:
+
+    flask system install-centroids data/models/kmeans-<version>.npy
+
+which re-assigns every job and application to the new centroids, updates
+their Chroma metadata and only then replaces KMEANS_CENTROIDS_PATH.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+PROJECT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from app.utils.bm25_index import job_document  # noqa: E402
+from app.utils.centroids import CENTROIDS_DTYPE, save_centroids  # noqa: E402
+from app.utils.clustering import (  # noqa: E402
+    DEFAULT_BATCH_SIZE, DEFAULT_K_MAX, DEFAULT_K_MIN, DEFAULT_MAX_ITER, SILHOUETTE_SAMPLE,
+    assign, balance, inertia, minibatch_kmeans, silhouette_estimate,
+)
+from app.utils.ingestion import file_sha256  # noqa: E402
+from app.utils.job_import import read_records  # noqa: E402
+
+DEFAULT_MODEL_NAME = 'all-MiniLM-L6-v2'
+DEFAULT_CACHE_DIR = os.path.join(PROJECT_ROOT, 'data', 'embeddings')
+DEFAULT_OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'data', 'models')
+
+# Texts per encode() call while filling the cache
+ENCODE_BATCH_SIZE = 256
+
+# Fixed row order of cached embeddings (changing it invalidates every cache)
+SHUFFLE_SEED = 42
+
+ARTIFACT_FORMAT = 1
+
+
+def read_texts(path, limit=None):
+    """Job texts of a training CSV, in file order (rows missing a field are skipped)."""
+    texts = []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for _, role, description, error in read_records(f, 'csv'):
+            if error is None and role and description:
+                texts.append(job_document(role, description))
+                if limit and len(texts) == limit:
+                    break
+    return texts
+
+
+def load_encoder(model_name):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def cache_path(cache_dir, dataset_sha256, model_name, limit=None):
+    model = model_name.replace('/', '--')
+    return os.path.join(cache_dir, f"{dataset_sha256[:16]}-{model}-{limit or 'all'}.npy")
+
+
+def cached_embeddings(csv_path, model_name=DEFAULT_MODEL_NAME, cache_dir=DEFAULT_CACHE_DIR, limit=None,
+                      dataset_sha256=None, log=print):
+    """
+    Memory-mapped embeddings of the CSV's job texts, encoding them on a miss.
+
+    The cache is filled batch by batch through a memory-mapped .npy and
+    renamed into place when complete, so an interrupted run leaves no
+    partial cache behind.
+
+    Returns:
+        tuple: (path of the cache file, read-only (n, dim) float32 memmap)
+    """
+    path = cache_path(cache_dir, dataset_sha256 or file_sha256(csv_path), model_name, limit)
+    if os.path.exists(path):
+        log(f'Using cached embeddings {path}')
+        return path, np.load(path, mmap_mode='r')
+
+    texts = read_texts(csv_path, limit)
+    if len(texts) < 2:
+        raise ValueError(f'{csv_path} has {len(texts)} usable rows; need role and description columns')
+    order = np.random.default_rng(SHUFFLE_SEED).permutation(len(texts))
+
+    encoder = load_encoder(model_name)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    started = time.perf_counter()
+    out = None
+    for start in range(0, len(texts), ENCODE_BATCH_SIZE):
+        rows = order[start:start + ENCODE_BATCH_SIZE]
+        vectors = np.asarray(encoder.encode([texts[i] for i in rows], batch_size=ENCODE_BATCH_SIZE),
+                             dtype=CENTROIDS_DTYPE)
+        if out is None:
+            out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=CENTROIDS_DTYPE,
+                                            shape=(len(texts), vectors.shape[1]))
+        out[start:start + len(rows)] = vectors
+        log(f'Encoded {start + len(rows)}/{len(texts)} texts')
+    out.flush()
+    del out
+    os.replace(tmp_path, path)
+    log(f'Encoded {len(texts)} texts in {time.perf_counter() - started:.1f}s -> {path}')
+    return path, np.load(path, mmap_mode='r')
+
+
+def evaluate_k(path, k, n_train, sample_size=SILHOUETTE_SAMPLE, batch_size=DEFAULT_BATCH_SIZE,
+               max_iter=DEFAULT_MAX_ITER, seed=0):
+    """
+    Fit k clusters on the first n_train cached rows and score them.
+
+    Runs in a worker process; the embeddings are opened by path so every
+    worker maps the same pages instead of receiving a copy.
+
+    Returns:
+        tuple: (metrics dict, (k, dim) centers)
+    """
+    embeddings = np.load(path, mmap_mode='r')
+    train, test = embeddings[:n_train], embeddings[n_train:]
+    started = time.perf_counter()
+    centers = minibatch_kmeans(train, k, batch_size=batch_size, max_iter=max_iter, seed=seed)
+    train_labels = assign(centers, train)
+    metrics = {
+        'k': k,
+        'silhouette': round(silhouette_estimate(train, train_labels, sample_size, seed), 4),
+        'test_silhouette': (round(silhouette_estimate(test, assign(centers, test), sample_size, seed), 4)
+                            if len(test) > k else None),
+        'inertia': round(inertia(centers, train), 2),
+        'max_to_mean': balance(train_labels, k)['max_to_mean'],
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+    return metrics, centers
+
+
+def evaluate_all(path, candidates, n_train, workers=None, **kwargs):
+    """evaluate_k() for every candidate, across `workers` processes."""
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(candidates) == 1:
+        return [evaluate_k(path, k, n_train, **kwargs) for k in candidates]
+    with ProcessPoolExecutor(max_workers=min(workers, len(candidates))) as pool:
+        futures = [pool.submit(evaluate_k, path, k, n_train, **kwargs) for k in candidates]
+        return [future.result() for future in futures]
+
+
+def write_artifact(centers, metadata, output_dir=DEFAULT_OUTPUT_DIR):
+    """
+    Save versioned centroids and their metadata.
+
+    Returns:
+        tuple: (.npy path, .json path)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, f"kmeans-{metadata['version']}")
+    save_centroids(centers, f'{base}.npy')
+    with open(f'{base}.json', 'w') as f:
+        json.dump(metadata, f, indent=2)
+    return f'{base}.npy', f'{base}.json'
+
+
+def train(args, log=print):
+    """Encode (or reuse cached embeddings), evaluate k and write the model."""
+    started = time.perf_counter()
+    dataset_sha256 = file_sha256(args.csv)
+    path, embeddings = cached_embeddings(args.csv, args.model, args.cache_dir, args.limit,
+                                         dataset_sha256=dataset_sha256, log=log)
+    n = len(embeddings)
+    n_train = n - int(n * args.test_fraction)
+    if args.k:
+        candidates = [args.k]
+    else:
+        candidates = list(range(max(args.k_min, 2), min(args.k_max, n_train - 1) + 1))
+    if not candidates or candidates[-1] >= n_train:
+        raise ValueError(f'No k to try with {n_train} training rows')
+
+    log(f'Evaluating k={candidates[0]}..{candidates[-1]} on {n_train} rows ({n - n_train} held out)')
+    results = evaluate_all(
+        path, candidates, n_train, workers=args.workers, sample_size=args.sample_size,
+        batch_size=args.batch_size, max_iter=args.max_iter, seed=args.seed
+    )
+    best_metrics, best_centers = max(results, key=lambda result: result[0]['silhouette'])
+
+    metadata = {
+        'format': ARTIFACT_FORMAT,
+        'version': f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-k{best_metrics['k']}-{dataset_sha256[:8]}",
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'dataset': os.path.basename(args.csv),
+        'dataset_sha256': dataset_sha256,
+        'model_name': args.model,
+        'rows': n,
+        'train_rows': n_train,
+        'dim': int(best_centers.shape[1]),
+        'seed': args.seed,
+        'selected': best_metrics,
+        'candidates': [metrics for metrics, _ in results],
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+    npy_path, json_path = write_artifact(best_centers, metadata, args.output_dir)
+    log(f'Wrote {npy_path}')
+    log(f'Install it with: flask system install-centroids {npy_path}')
+    metadata['artifact'] = npy_path
+    return metadata
+
+
+def _print_candidates(metadata):
+    print(f"{'k':>4}{'silhouette':>12}{'test':>10}{'inertia':>14}{'max/mean':>10}{'seconds':>9}")
+    for metrics in metadata['candidates']:
+        test = metrics['test_silhouette']
+        print(f"{metrics['k']:>4}{metrics['silhouette']:>12.4f}{test if test is not None else '-':>10}"
+              f"{metrics['inertia']:>14.1f}{metrics['max_to_mean']:>10.2f}{metrics['seconds']:>9.2f}")
+    print(f"Selected k={metadata['selected']['k']} ({metadata['version']}) in {metadata['seconds']:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m training.train', description=__doc__.split('\n\n')[0])
+    parser.add_argument('csv', help='training CSV with Role and Job_Description columns')
+    parser.add_argument('--k', type=int, help='train this k instead of choosing one')
+    parser.add_argument('--k-min', type=int, default=DEFAULT_K_MIN)
+    parser.add_argument('--k-max', type=int, default=DEFAULT_K_MAX)
+    parser.add_argument('--workers', type=int, help='processes evaluating k values (default: all cores)')
+    parser.add_argument('--sample-size', type=int, default=SILHOUETTE_SAMPLE,
+                        help='rows in each silhouette estimate')
+    parser.add_argument('--test-fraction', type=float, default=0.2, help='rows held out for scoring')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--max-iter', type=int, default=DEFAULT_MAX_ITER)
+    parser.add_argument('--limit', type=int, help='use only the first N rows of the CSV')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--model', default=os.environ.get('SENTENCE_MODEL_NAME', DEFAULT_MODEL_NAME))
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--report', help='also write the metadata JSON here')
+
+    args = parser.parse_args(argv)
+    if not 0 <= args.test_fraction < 1:
+        parser.error('--test-fraction must be in [0, 1)')
+    metadata = train(args, log=lambda message: print(message, file=sys.stderr))
+    _print_candidates(metadata)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(metadata, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())